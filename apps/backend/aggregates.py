@@ -0,0 +1,125 @@
+"""
+Monthly aggregate cubes for the dashboard endpoints.
+
+The ETL rebuilds one summary table per dataset after every load
+(`refresh_aggregates`) and the routers ask `source()` which table should
+answer a request: the cube when every active filter is one of its
+dimensions, the raw table otherwise. Cube measures keep the raw column
+names, so the same `func.sum(M.col)` expression works on either table.
+"""
+from sqlalchemy import func, select, insert, delete, inspect
+from sqlalchemy.orm import Session
+import models
+
+# raw model -> (cube model, dimensions, summed measures, non-null counters)
+CUBES = {
+    models.Production: (
+        models.ProductionMonthly,
+        ("anio", "mes", "departamento", "campo", "operadora"),
+        ("produccion_mensual",),
+        ("produccion_mensual",),
+    ),
+    models.Royalty: (
+        models.RoyaltyMonthly,
+        ("anio", "mes", "departamento", "campo", "tipo_hidrocarburo"),
+        ("valor_liquidado", "volumen_regalia", "precio_usd"),
+        ("precio_usd",),
+    ),
+    models.Demand: (
+        models.DemandMonthly,
+        ("anio", "mes", "sector", "region", "escenario"),
+        ("demanda",),
+        ("demanda",),
+    ),
+}
+
+def cube_select(raw):
+    """SELECT that produces the cube rows for `raw` (used by the refresh)."""
+    cube, dims, sums, counters = CUBES[raw]
+    dim_cols = [getattr(raw, d) for d in dims]
+    return select(
+        *dim_cols,
+        *[func.sum(getattr(raw, m)) for m in sums],
+        *[func.count(getattr(raw, c)) for c in counters],
+        func.count(),
+    ).group_by(*dim_cols)
+
+def cube_columns(raw):
+    cube, dims, sums, counters = CUBES[raw]
+    return [*dims, *sums, *[f"{c}_n" for c in counters], "registros"]
+
+def refresh_aggregates(db: Session):
+    """
+    Rebuilds every cube from its raw table in a single transaction.
+    Returns {table_name: rows} for logging; on error the transaction is
+    rolled back (the previous cubes stay) and the exception propagates.
+    """
+    print("\n📊 Reconstruyendo tablas agregadas...")
+    counts = {}
+    try:
+        for raw, (cube, *_rest) in CUBES.items():
+            db.execute(delete(cube))
+            db.execute(insert(cube).from_select(cube_columns(raw), cube_select(raw)))
+            counts[cube.__tablename__] = db.query(func.count(cube.id)).scalar()
+            print(f"   ✓ {cube.__tablename__}: {counts[cube.__tablename__]:,} filas")
+        db.commit()
+    except Exception as e:
+        print(f"   ❌ Error reconstruyendo agregados: {e}")
+        db.rollback()
+        raise
+    return counts
+
+def ensure_cube_schema(bind):
+    """
+    Recreates (empty) every cube table whose columns on disk differ from its
+    model, e.g. after a new counter was added. Cubes only hold derived data:
+    until the ETL rebuilds them, source() answers from the raw tables.
+    Returns the names of the recreated tables.
+    """
+    from etl.state import clear_state
+    recreated = []
+    for cube, *_rest in CUBES.values():
+        table = cube.__table__
+        if not inspect(bind).has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspect(bind).get_columns(table.name)}
+        if existing != {column.name for column in table.columns}:
+            table.drop(bind)
+            table.create(bind)
+            recreated.append(table.name)
+    if recreated:
+        # The next ETL run must rebuild them even if no source changed
+        clear_state("aggregates.sources", bind=bind)
+        print(f"   ♻️  Cubos recreados por cambio de esquema: {', '.join(recreated)}")
+    return recreated
+
+def _dimension(name):
+    # anio_min / anio_max filter the 'anio' dimension
+    for suffix in ("_min", "_max"):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+def source(db: Session, raw, **filters):
+    """
+    Returns the model to aggregate over: the cube for `raw` when all
+    non-empty filters are cube dimensions and the cube has been built,
+    otherwise `raw` itself.
+    """
+    cube, dims, _sums, _counters = CUBES[raw]
+    active = {_dimension(k) for k, v in filters.items() if v is not None}
+    if not active.issubset(dims):
+        return raw
+    if db.query(cube.id).first() is None:
+        return raw
+    return cube
+
+def is_cube(M):
+    return M in (cube for cube, *_rest in CUBES.values())
+
+def avg(M, column):
+    """AVG(column) over either a raw table or its cube."""
+    if not is_cube(M):
+        return func.avg(getattr(M, column))
+    # AVG skips NULLs: divide by the non-null counter, never by registros
+    return func.sum(getattr(M, column)) / func.sum(getattr(M, f"{column}_n"))
@@ -0,0 +1,154 @@
+"""
+Benchmark: caché de respuestas por proceso vs compartida (SQLite) con varios
+workers de uvicorn, reproduciendo una mezcla de tráfico de los dashboards.
+
+Cada petición abre una conexión nueva, así que el kernel las reparte entre
+los workers como lo harían navegadores distintos. Se reporta la tasa de
+aciertos (cabecera X-Cache) y las latencias p50/p99 de cada backend.
+
+Uso:
+    python bench_cache.py [--db-dir DIR] [--requests 2000] [--clients 16] [--workers 4]
+
+`--db-dir` es el directorio que contiene data.db (por defecto el actual).
+"""
+import argparse
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# (peso, ruta, parámetros posibles) de lo que piden las vistas del frontend
+TRAFFIC = [
+    (10, "/api/production/kpis", ["departamento"]),
+    (10, "/api/production/trend", ["departamento", "anio_min"]),
+    (6, "/api/production/ranking", ["type", "anio_min"]),
+    (6, "/api/production/map", ["anio_min"]),
+    (4, "/api/production/filters", []),
+    (8, "/api/royalties/kpis", ["departamento"]),
+    (8, "/api/royalties/trend", ["departamento", "anio_min"]),
+    (4, "/api/royalties/map", []),
+    (4, "/api/royalties/distribution", ["anio_min"]),
+    (4, "/api/royalties/ranking", []),
+    (4, "/api/royalties/filters", []),
+    (3, "/api/demand/kpis", []),
+    (3, "/api/demand/trend", []),
+    (3, "/api/demand/sectors", []),
+    (3, "/api/demand/scenarios", []),
+    (3, "/api/demand/region", []),
+    (3, "/api/stats/kpis", []),
+    (3, "/api/stats/production-vs-royalties", []),
+]
+
+REQUIRED = {"type"}
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def zipf_choice(rng, values):
+    # Pocos valores concentran la mayoría de las visitas, como en los filtros reales
+    weights = [1 / (i + 1) for i in range(len(values))]
+    return rng.choices(values, weights)[0]
+
+def build_requests(n, departamentos, seed=7):
+    rng = random.Random(seed)
+    options = {
+        "departamento": departamentos or ["Meta"],
+        "anio_min": [str(year) for year in range(2020, 2010, -1)],
+        "type": ["campo", "operadora"],
+    }
+    weights = [w for w, _, _ in TRAFFIC]
+    plan = []
+    for _ in range(n):
+        _, path, params = rng.choices(TRAFFIC, weights)[0]
+        query = {p: zipf_choice(rng, options[p]) for p in params if p in REQUIRED or rng.random() < 0.7}
+        plan.append((path, query))
+    return plan
+
+def start_server(db_dir, workers, cache_path):
+    port = free_port()
+    env = dict(os.environ, SIMGN_CACHE_PATH=cache_path)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", BACKEND_DIR,
+         "--workers", str(workers), "--port", str(port), "--log-level", "warning"],
+        cwd=db_dir, env=env,
+    )
+    base = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        try:
+            if httpx.get(base + "/api/health", timeout=1).status_code == 200:
+                return process, base
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("uvicorn no arrancó")
+
+def replay(base, plan, clients):
+    local = threading.local()
+
+    def one(item):
+        path, query = item
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = httpx.Client(base_url=base, timeout=120)
+        start = time.perf_counter()
+        response = client.get(path, params=query, headers={"Connection": "close"})
+        elapsed = time.perf_counter() - start
+        return elapsed, response.headers.get("x-cache") == "HIT", response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(one, plan))
+    return results, time.perf_counter() - started
+
+def report(label, results, wall):
+    latencies = sorted(r[0] for r in results)
+    hits = sum(1 for r in results if r[1])
+    errors = sum(1 for r in results if r[2] != 200)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"   {label:<22} aciertos {hits / len(results):>6.1%}  "
+          f"p50 {statistics.median(latencies) * 1000:>7.1f} ms  p99 {p99 * 1000:>8.1f} ms  "
+          f"{len(results) / wall:>7.1f} req/s  errores {errors}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-dir", default=".")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        process, base = start_server(args.db_dir, 1, "")
+        try:
+            departamentos = httpx.get(base + "/api/production/filters", timeout=120).json()["departamentos"]
+        finally:
+            process.terminate()
+            process.wait()
+        plan = build_requests(args.requests, departamentos)
+        print(f"\n📊 {args.requests:,} peticiones, {args.clients} clientes, {args.workers} workers")
+
+        for label, cache_path in (("memoria por proceso", ""),
+                                  ("SQLite compartida", os.path.join(tmp, "cache.db"))):
+            process, base = start_server(args.db_dir, args.workers, cache_path)
+            try:
+                results, wall = replay(base, plan, args.clients)
+            finally:
+                process.terminate()
+                process.wait()
+            report(label, results, wall)
+
+if __name__ == "__main__":
+    main()
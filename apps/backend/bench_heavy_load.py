@@ -0,0 +1,95 @@
+"""
+Prueba de carga: latencia de los endpoints livianos mientras hay muchas
+agregaciones pesadas en curso.
+
+Arranca uvicorn (un worker) sobre la base de `--db-dir`, mide /health y un
+widget servido por los cubos sin carga y luego con `--heavy` clientes
+pidiendo sin parar /stats/* y /demand/balance. Cada petición lleva un
+parámetro único para saltarse la caché de respuestas.
+
+Uso:
+    python bench_heavy_load.py [--db-dir DIR] [--heavy 64] [--seconds 10]
+"""
+import argparse
+import itertools
+import os
+import statistics
+import threading
+import time
+
+import httpx
+
+from bench_cache import start_server
+
+HEAVY = ["/api/stats/regional-balance", "/api/stats/kpis",
+         "/api/stats/production-vs-royalties", "/api/demand/balance"]
+LIGHT = ["/api/health", "/api/production/kpis"]
+
+counter = itertools.count()
+
+def unique(path):
+    return f"{path}?nocache={next(counter)}"
+
+def probe(base, seconds):
+    """Latencias de los endpoints livianos, de a una petición por vez."""
+    latencies = {path: [] for path in LIGHT}
+    deadline = time.perf_counter() + seconds
+    with httpx.Client(base_url=base, timeout=120) as client:
+        while time.perf_counter() < deadline:
+            for path in LIGHT:
+                start = time.perf_counter()
+                client.get(unique(path))
+                latencies[path].append(time.perf_counter() - start)
+            time.sleep(0.05)
+    return latencies
+
+def hammer(base, stop, done, statuses):
+    with httpx.Client(base_url=base, timeout=300) as client:
+        for i in itertools.count():
+            if stop.is_set():
+                return
+            response = client.get(unique(HEAVY[i % len(HEAVY)]))
+            statuses.append(response.status_code)
+            if response.status_code == 503:
+                time.sleep(float(response.headers.get("retry-after", 1)))
+            else:
+                done.append(1)
+
+def summary(label, latencies):
+    for path, values in latencies.items():
+        values.sort()
+        p99 = values[min(len(values) - 1, int(len(values) * 0.99))]
+        print(f"   {label:<18} {path:<24} p50 {statistics.median(values) * 1000:>8.1f} ms  "
+              f"p99 {p99 * 1000:>8.1f} ms  max {values[-1] * 1000:>8.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-dir", default=".")
+    parser.add_argument("--heavy", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    process, base = start_server(os.path.abspath(args.db_dir), 1, "")
+    try:
+        print(f"\n📊 endpoints livianos, sin carga y con {args.heavy} clientes pesados")
+        summary("sin carga", probe(base, args.seconds / 2))
+
+        stop = threading.Event()
+        done, statuses = [], []
+        threads = [threading.Thread(target=hammer, args=(base, stop, done, statuses), daemon=True)
+                   for _ in range(args.heavy)]
+        for thread in threads:
+            thread.start()
+        time.sleep(1)  # que las pesadas llenen la cola
+        summary("con carga", probe(base, args.seconds))
+        stop.set()
+        for thread in threads:
+            thread.join()
+        busy = sum(1 for status in statuses if status == 503)
+        print(f"   pesadas completadas: {len(done)} ({busy} respondieron 503)")
+    finally:
+        process.terminate()
+        process.wait()
+
+if __name__ == "__main__":
+    main()
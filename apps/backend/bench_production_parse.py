@@ -0,0 +1,113 @@
+"""
+Benchmark: transformación pivoteada -> formato largo de las hojas de producción.
+
+Compara el recorrido celda a celda original con parse_production_sheet
+(vectorizado) sobre un libro sintético de 20 hojas y 10 años, y verifica que
+ambos producen exactamente los mismos registros.
+
+Uso:
+    python bench_production_parse.py [hojas] [años] [operadoras]
+"""
+import re
+import sys
+import time
+import tempfile
+import os
+
+import numpy as np
+import pandas as pd
+
+from etl.production import MONTH_ABBR, parse_production_sheet, parse_production_excel_multi_sheet
+
+def synthetic_sheet(years, operators, rng):
+    """Hoja con el formato de MinEnergía: títulos, fila de años, fila de meses y datos."""
+    width = 3 + 12 * len(years)
+    title = ["Producción fiscalizada de petróleo por campo"] + [""] * (width - 1)
+    year_row = ["", "", "Año"] + [f"Año {y}" if m == 0 else "" for y in years for m in range(12)]
+    month_row = ["", "", "Operadora"] + [abbr.capitalize() for _ in years for abbr in MONTH_ABBR]
+    rows = [title, [""] * width, year_row, month_row]
+    for i in range(operators):
+        values = rng.gamma(2.0, 500.0, 12 * len(years)).round(2)
+        values[rng.random(values.size) < 0.15] = 0  # meses sin producción
+        rows.append(["", "", f"OPERADORA {i}"] + list(values))
+    rows.append(["", "", "", "Total"] + [""] * (width - 4))
+    return pd.DataFrame(rows)
+
+def legacy_parse_sheet(df, campo):
+    """Recorrido celda a celda tal como estaba antes de la vectorización."""
+    records = []
+    year_row_idx = None
+    for idx in range(min(15, len(df))):
+        row_str = df.iloc[idx].astype(str)
+        if any('año' in str(val).lower() for val in row_str):
+            year_row_idx = idx
+            break
+    if year_row_idx is None:
+        return pd.DataFrame()
+
+    month_row_idx = year_row_idx + 1
+    year_row = df.iloc[year_row_idx]
+    month_row = df.iloc[month_row_idx]
+    col_to_year_month = {}
+    current_year = None
+    for col_idx in range(len(year_row)):
+        year_match = re.search(r'20\d{2}', str(year_row.iloc[col_idx]))
+        if year_match:
+            current_year = int(year_match.group())
+        month_val = str(month_row.iloc[col_idx]).lower()
+        month = next((num for abbr, num in MONTH_ABBR.items() if abbr in month_val), None)
+        if current_year and month:
+            col_to_year_month[col_idx] = (current_year, month)
+
+    for row_idx in range(month_row_idx + 1, len(df)):
+        row = df.iloc[row_idx]
+        operadora = str(row.iloc[2]) if len(row) > 2 else None
+        if not operadora or operadora == 'nan' or pd.isna(operadora):
+            continue
+        for col_idx, (year, month) in col_to_year_month.items():
+            try:
+                produccion = float(row.iloc[col_idx])
+                if produccion > 0:
+                    records.append({
+                        'campo': campo, 'operadora': operadora,
+                        'anio': year, 'mes': month, 'produccion_mensual': produccion
+                    })
+            except:
+                continue
+    return pd.DataFrame(records)
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def run(sheets=20, n_years=10, operators=40):
+    rng = np.random.default_rng(42)
+    years = list(range(2015, 2015 + n_years))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "produccion_sintetica.xlsx")
+        with pd.ExcelWriter(path) as writer:
+            for i in range(sheets):
+                synthetic_sheet(years, operators, rng).to_excel(
+                    writer, sheet_name=f"{i}-CAMPO {i}", header=False, index=False)
+
+        print(f"📊 Libro sintético: {sheets} hojas x {n_years} años x {operators} operadoras")
+        frames = pd.read_excel(path, sheet_name=None, header=None)
+
+        legacy, t_legacy = timed(lambda: pd.concat(
+            [legacy_parse_sheet(df, name) for name, df in frames.items()], ignore_index=True))
+        vector, t_vector = timed(lambda: pd.concat(
+            [parse_production_sheet(df, name) for name, df in frames.items()], ignore_index=True))
+
+        pd.testing.assert_frame_equal(legacy, vector, check_dtype=False)
+        print(f"   Celda a celda   {len(legacy):>8,} registros  {t_legacy*1000:>9.1f} ms")
+        print(f"   Vectorizado     {len(vector):>8,} registros  {t_vector*1000:>9.1f} ms")
+        print(f"   ⚡ Transformación {t_legacy / t_vector:.1f}x más rápida")
+
+        _, t_total = timed(lambda: parse_production_excel_multi_sheet(path))
+        print(f"   Lectura + transformación del libro completo: {t_total:.2f} s")
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:4]]
+    run(*args)
@@ -0,0 +1,61 @@
+"""
+Benchmark: lectura ORM vs ruta rápida Core (queries.py) sobre la base local.
+
+Uso:
+    python bench_read_paths.py [filas]
+"""
+import sys
+import time
+import tracemalloc
+from sqlalchemy import select
+from database import SessionLocal
+import models
+import queries
+
+def measure(label, fn):
+    start = time.perf_counter()
+    rows = fn()
+    elapsed = time.perf_counter() - start
+    # Memoria en una segunda pasada: tracemalloc distorsiona los tiempos
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"   {label:<28} {rows:>8,} filas  {elapsed*1000:>9.1f} ms  pico {peak/1e6:>7.1f} MB")
+    return elapsed
+
+def run(limit):
+    for model in (models.Royalty, models.Production, models.Demand):
+        print(f"\n📊 {model.__tablename__} (limit={limit:,})")
+
+        def orm():
+            db = SessionLocal()
+            try:
+                items = db.query(model).order_by(model.id).limit(limit).all()
+                return len([{c.name: getattr(o, c.name) for c in model.__table__.columns} for o in items])
+            finally:
+                db.close()
+
+        def core():
+            db = SessionLocal()
+            try:
+                statement = select(*model.__table__.columns).order_by(model.id).limit(limit)
+                return len(queries.fetch_dicts(db, statement))
+            finally:
+                db.close()
+
+        def core_stream():
+            db = SessionLocal()
+            try:
+                statement = select(*model.__table__.columns).order_by(model.id).limit(limit)
+                return sum(len(rows) for rows in queries.iter_batches(db, statement))
+            finally:
+                db.close()
+
+        t_orm = measure("ORM (objetos + identity map)", orm)
+        t_core = measure("Core (dicts)", core)
+        measure("Core (tuplas en lotes)", core_stream)
+        print(f"   ⚡ Core es {t_orm / t_core:.1f}x más rápido que ORM")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,44 @@
+"""
+Benchmark: extracción de regalías secuencial vs concurrente.
+
+Usa el servidor Socrata falso de test_royalties_sync.py con latencia
+artificial por petición, mide ambas extracciones y verifica que traen las
+mismas filas.
+
+Uso:
+    python bench_royalties_extract.py [filas] [latencia_ms] [conexiones]
+"""
+import sys
+import time
+
+import etl.royalties as royalties
+from test_royalties_sync import FakeSocrata, serve, socrata_row
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def run(rows=2000, latency_ms=50, concurrency=8):
+    FakeSocrata.rows = [socrata_row(i, f"2024-01-01T00:00:{i % 60:02d}.000Z") for i in range(rows)]
+    FakeSocrata.latency = latency_ms / 1000
+    server, url = serve()
+    old_page = royalties.PAGE_SIZE
+    royalties.PAGE_SIZE = 100
+    try:
+        print(f"📊 {rows:,} filas en páginas de {royalties.PAGE_SIZE}, {latency_ms} ms por petición")
+        sequential, t_sequential = timed(lambda: royalties.extract_royalties(url))
+        FakeSocrata.reset()
+        concurrent, t_concurrent = timed(lambda: royalties.extract_royalties_concurrent(url, concurrency=concurrency))
+    finally:
+        royalties.PAGE_SIZE = old_page
+        server.shutdown()
+
+    assert list(concurrent[":id"]) == list(sequential[":id"])
+    print(f"   Secuencial      {t_sequential:>7.2f} s")
+    print(f"   Concurrente     {t_concurrent:>7.2f} s  (pico de {FakeSocrata.peak} peticiones en vuelo)")
+    print(f"   ⚡ Extracción {t_sequential / t_concurrent:.1f}x más rápida")
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:4]]
+    run(*args)
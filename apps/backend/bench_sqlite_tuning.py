@@ -0,0 +1,118 @@
+"""
+Benchmark: lecturas concurrentes de la API mientras el ETL recarga una tabla.
+
+Compara la configuración anterior (create_engine sin pragmas, journal de
+rollback) con la de database.create_sqlite_engine (WAL, mmap, caché de
+páginas, synchronous=NORMAL y pool de lectura `mode=ro`). Un proceso
+escritor recarga `production` con bulk_load en bucle y varios hilos lectores
+ejecutan consultas de dashboard; se reportan lecturas/s, p50/p99 y errores.
+
+Uso:
+    python bench_sqlite_tuning.py [--db data.db] [--seconds 10] [--readers 8] [--rows 200000]
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+
+QUERIES = [
+    "SELECT departamento, sum(produccion_mensual) FROM production WHERE anio >= 2015 GROUP BY departamento",
+    "SELECT anio, mes, sum(produccion_mensual) FROM production GROUP BY anio, mes",
+    "SELECT count(*), sum(produccion_mensual) FROM production WHERE campo = 'CAMPO 3'",
+    "SELECT id, campo, anio, mes, produccion_mensual FROM production ORDER BY id LIMIT 100",
+]
+
+def build_engine(path, tuned, read_only=False):
+    if tuned:
+        from database import create_sqlite_engine
+        return create_sqlite_engine(path, read_only=read_only)
+    return create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+
+def writer(path, tuned, rows, stop, loads, errors):
+    from models import Production
+    from etl.bulk import bulk_load
+    engine = build_engine(path, tuned)
+    data = pd.read_sql(f"SELECT * FROM production LIMIT {rows}", engine).drop(columns=["id"])
+    while not stop.is_set():
+        try:
+            bulk_load(Production, data, bind=engine)
+            loads.value += 1
+        except Exception:
+            errors.value += 1
+    engine.dispose()
+
+def reader(engine, stop, latencies, errors):
+    i = 0
+    with engine.connect() as conn:
+        while not stop.is_set():
+            sql = QUERIES[i % len(QUERIES)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                conn.exec_driver_sql(sql).fetchall()
+                latencies.append(time.perf_counter() - start)
+            except OperationalError:
+                errors.append(sql)
+                conn.rollback()
+
+def run(label, source, tuned, seconds, readers, rows):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "data.db")
+        # Copia consistente aunque el origen esté en WAL con páginas sin volcar
+        with sqlite3.connect(source) as src, sqlite3.connect(path) as dst:
+            src.backup(dst)
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode = " + ("WAL" if tuned else "DELETE"))
+        conn.close()
+
+        context = multiprocessing.get_context("spawn")
+        stop_writer = context.Event()
+        loads = context.Value("i", 0)
+        write_errors = context.Value("i", 0)
+        process = context.Process(target=writer, args=(path, tuned, rows, stop_writer, loads, write_errors))
+        process.start()
+        time.sleep(2)  # el escritor lee su lote y empieza a cargar
+
+        engine = build_engine(path, tuned, read_only=True)
+        stop = threading.Event()
+        latencies, errors = [], []
+        threads = [threading.Thread(target=reader, args=(engine, stop, latencies, errors)) for _ in range(readers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        stop_writer.set()
+        process.join()
+        engine.dispose()
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)] if latencies else 0
+    p50 = statistics.median(latencies) if latencies else 0
+    print(f"   {label:<26} {len(latencies) / seconds:>8.1f} lecturas/s  p50 {p50 * 1000:>7.1f} ms  "
+          f"p99 {p99 * 1000:>8.1f} ms  errores {len(errors):>4}  cargas {loads.value} "
+          f"(fallidas {write_errors.value})")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="data.db")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    print(f"\n📊 {args.readers} lectores durante {args.seconds:.0f}s con recargas de {args.rows:,} filas")
+    run("rollback journal (antes)", args.db, False, args.seconds, args.readers, args.rows)
+    run("WAL + pool mode=ro", args.db, True, args.seconds, args.readers, args.rows)
+
+if __name__ == "__main__":
+    main()
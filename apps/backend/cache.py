@@ -0,0 +1,412 @@
+"""
+Response cache for the read endpoints.
+
+`ResponseCache` is an ASGI middleware that stores complete GET responses
+keyed on route + normalized query string + the dataset generation. The ETL
+bumps the generation (etl_state 'dataset.generation') after every run that
+publishes data, so a reload invalidates everything at once without having
+to enumerate keys.
+
+Every cached response carries a strong ETag derived from the generation and
+the body, and a matching If-None-Match is answered with 304 Not Modified.
+
+Backends store bytes under string keys (get / set / clear / stats):
+
+- `MemoryCache`: per-process LRU bounded by a byte budget.
+- `SQLiteCache`: a local SQLite file in WAL mode shared by every worker
+  process on the host, with TTLs and size-bounded (approximate LRU) eviction.
+- `TieredCache`: a small MemoryCache in front of a shared backend.
+
+Set SIMGN_CACHE_PATH to share the cache between uvicorn/gunicorn workers.
+
+Backend and generation reads can touch SQLite, so the middleware runs them
+on a small dedicated pool (`CACHE_EXECUTOR`) and never on the event loop.
+"""
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode
+
+from sqlalchemy.exc import OperationalError
+
+from database import read_engine
+from etl.state import GENERATION_KEY, get_state
+
+DEFAULT_MAX_BYTES = int(os.getenv("SIMGN_CACHE_BYTES", 64 * 1024 * 1024))
+# Largest single response worth keeping (exports and big pages stream past)
+MAX_ENTRY_BYTES = int(os.getenv("SIMGN_CACHE_MAX_ENTRY_BYTES", 4 * 1024 * 1024))
+# How long a read of the dataset generation is reused before asking SQLite again
+GENERATION_CHECK_INTERVAL = 1.0
+# Shared on-disk backend (empty: per-process memory only)
+CACHE_PATH = os.getenv("SIMGN_CACHE_PATH", "")
+SHARED_MAX_BYTES = int(os.getenv("SIMGN_CACHE_SHARED_BYTES", 256 * 1024 * 1024))
+# Seconds a shared-cache statement waits for a busy writer: a cache that
+# cannot answer quickly is treated as a miss (or a skipped store)
+CACHE_BUSY_TIMEOUT = float(os.getenv("SIMGN_CACHE_BUSY_TIMEOUT", 0.05))
+CACHE_WORKERS = int(os.getenv("SIMGN_CACHE_WORKERS", 4))
+
+CACHE_EXECUTOR = ThreadPoolExecutor(max_workers=CACHE_WORKERS, thread_name_prefix="cache")
+
+async def run_blocking(fn, *args):
+    """Runs `fn(*args)` on the cache pool and returns its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(CACHE_EXECUTOR, functools.partial(fn, *args))
+
+class MemoryCache:
+    """Thread-safe LRU of bytes values with a total byte budget and optional TTL."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (expires_at or None, value)
+        self.size = 0
+        self.hits = self.misses = self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None or (entry[0] is not None and entry[0] < time.time()):
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (time.time() + ttl if ttl else None, value)
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        return {"entries": len(self.entries), "bytes": self.size, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions}
+
+    def _remove(self, key):
+        _, value = self.entries.pop(key)
+        self.size -= len(value)
+
+class SQLiteCache:
+    """
+    Key-value store in a SQLite file (WAL: readers never block the writer)
+    shared by all processes that open the same path.
+
+    Recency is tracked coarsely (`accessed_at` is rewritten at most once per
+    ACCESS_RESOLUTION seconds per key) so hits stay read-only most of the
+    time. Every EVICT_EVERY writes a process checks the total size and drops
+    expired entries, then the least recently used ones down to 90% of
+    `max_bytes`.
+    """
+    ACCESS_RESOLUTION = 30.0
+    EVICT_EVERY = 32
+
+    def __init__(self, path, max_bytes=SHARED_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = self.misses = self.evictions = 0
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+        self.connection().executescript("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_cache_accessed_at ON cache (accessed_at);
+        """)
+
+    def connection(self):
+        # sqlite3 connections are not shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=CACHE_BUSY_TIMEOUT, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self.connection()
+        try:
+            row = conn.execute(
+                "SELECT value, expires_at, accessed_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            row = None  # locked (e.g. a checkpoint): answer as a miss
+        now = time.time()
+        if row is None or (row[1] is not None and row[1] < now):
+            self.misses += 1
+            return None
+        if now - row[2] > self.ACCESS_RESOLUTION:
+            try:
+                conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            except sqlite3.OperationalError:
+                pass  # busy writer: recency is best effort
+        self.hits += 1
+        return row[0]
+
+    def set(self, key, value, ttl=None):
+        if len(value) > self.max_bytes:
+            return
+        now = time.time()
+        try:
+            self.connection().execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), now + ttl if ttl else None, now),
+            )
+        except sqlite3.OperationalError:
+            return  # a busy cache must never fail the request
+        with self._lock:
+            self._writes += 1
+            due = self._writes % self.EVICT_EVERY == 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        conn = self.connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+            total = conn.execute("SELECT coalesce(sum(size), 0) FROM cache").fetchone()[0]
+            if total > self.max_bytes:
+                target = int(self.max_bytes * 0.9)
+                removed = 0
+                keys = []
+                for key, size in conn.execute("SELECT key, size FROM cache ORDER BY accessed_at"):
+                    if total - removed <= target:
+                        break
+                    keys.append((key,))
+                    removed += size
+                conn.executemany("DELETE FROM cache WHERE key = ?", keys)
+                self.evictions += len(keys)
+            conn.execute("COMMIT")
+        except sqlite3.OperationalError:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+
+    def clear(self):
+        self.connection().execute("DELETE FROM cache")
+
+    def stats(self):
+        entries, size = self.connection().execute(
+            "SELECT count(*), coalesce(sum(size), 0) FROM cache"
+        ).fetchone()
+        return {"entries": entries, "bytes": size, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions}
+
+class TieredCache:
+    """Per-process MemoryCache in front of a shared backend; writes go to both."""
+
+    def __init__(self, local, shared):
+        self.local = local
+        self.shared = shared
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.local.set(key, value)
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.local.set(key, value, ttl)
+        self.shared.set(key, value, ttl)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def stats(self):
+        return {"local": self.local.stats(), "shared": self.shared.stats()}
+
+def build_backend(path=CACHE_PATH):
+    """MemoryCache, or a TieredCache over SQLiteCache when `path` is set."""
+    if not path:
+        return MemoryCache()
+    return TieredCache(MemoryCache(DEFAULT_MAX_BYTES // 4), SQLiteCache(path))
+
+_generation = {"value": None, "checked_at": 0.0}
+
+def current_generation():
+    """
+    Dataset generation published by the ETL, re-read at most once per
+    interval. Blocking: async callers go through `run_blocking`.
+    """
+    now = time.monotonic()
+    if now - _generation["checked_at"] >= GENERATION_CHECK_INTERVAL:
+        try:
+            value = get_state(GENERATION_KEY, bind=read_engine, default="0")
+        except OperationalError:
+            if _generation["value"] is None:
+                raise
+            value = _generation["value"]  # keep the last one we saw until the next check
+        _generation.update(value=value, checked_at=now)
+    return _generation["value"]
+
+def memoize(name, compute, ttl=None):
+    """
+    JSON-serialisable result of `compute()` for the current dataset
+    generation, shared by every worker through RESPONSE_CACHE. An ETL reload
+    changes the key, so stale results are never served.
+    """
+    key = f"{name}:{current_generation()}"
+    cached = RESPONSE_CACHE.get(key)
+    if cached is not None:
+        return json.loads(cached)
+    result = compute()
+    RESPONSE_CACHE.set(key, json.dumps(result).encode(), ttl=ttl)
+    return result
+
+def normalized_query(query_string):
+    """Query string with parameters sorted, so ?b=2&a=1 and ?a=1&b=2 share a key."""
+    return urlencode(sorted(parse_qsl(query_string, keep_blank_values=True)))
+
+def cache_key(path, query_string, generation, accept=""):
+    # Accept is part of the key: the data endpoints negotiate Arrow/Parquet on it
+    raw = f"{generation}\n{path}\n{normalized_query(query_string)}\n{accept}"
+    return "response:" + hashlib.sha256(raw.encode()).hexdigest()
+
+def make_etag(generation, body):
+    return f'"{generation}-{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+def pack(status, headers, body):
+    """Entry layout: JSON line with status and headers, then the raw body."""
+    meta = json.dumps({"status": status, "headers": headers}).encode()
+    return meta + b"\n" + body
+
+def unpack(entry):
+    meta, body = entry.split(b"\n", 1)
+    meta = json.loads(meta)
+    return meta["status"], meta["headers"], body
+
+class ResponseCache:
+    """
+    ASGI middleware caching GET responses under `prefix`. Add it before the
+    CORS middleware so per-origin headers are never stored.
+
+    Only complete 200 responses up to MAX_ENTRY_BYTES are stored; streamed
+    bodies (CSV export, Arrow) pass through untouched.
+    """
+
+    def __init__(self, app, backend=None, prefix="/api", exclude=(), max_entry_bytes=MAX_ENTRY_BYTES,
+                 generation=current_generation):
+        self.app = app
+        self.backend = backend if backend is not None else RESPONSE_CACHE
+        self.prefix = prefix
+        self.exclude = tuple(exclude)
+        self.max_entry_bytes = max_entry_bytes
+        self.generation = generation
+
+    def cacheable(self, scope):
+        path = scope["path"]
+        return (scope["type"] == "http" and scope["method"] == "GET"
+                and path.startswith(self.prefix) and not path.startswith(self.exclude))
+
+    async def __call__(self, scope, receive, send):
+        if not self.cacheable(scope):
+            await self.app(scope, receive, send)
+            return
+
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        generation, key, entry = await run_blocking(self.lookup, scope, headers.get("accept", ""))
+        if_none_match = headers.get("if-none-match")
+        if entry is not None:
+            status, stored_headers, body = unpack(entry)
+            await self.respond(send, status, stored_headers, body, if_none_match, "HIT")
+            return
+
+        start = {}
+        chunks = []
+        passthrough = False
+
+        async def capture(message):
+            nonlocal passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start.update(message)
+                response_headers = {k.lower() for k, _ in message.get("headers", [])}
+                if (message["status"] != 200 or b"etag" in response_headers
+                        or b"set-cookie" in response_headers):
+                    passthrough = True
+                    await send(message)
+                return
+            chunks.append(message.get("body", b""))
+            size = sum(len(chunk) for chunk in chunks)
+            if message.get("more_body") or size > self.max_entry_bytes:
+                # Streaming or too large: flush what we held and stop buffering
+                passthrough = True
+                await send(start)
+                await send({"type": "http.response.body", "body": b"".join(chunks),
+                            "more_body": message.get("more_body", False)})
+
+        await self.app(scope, receive, capture)
+        if passthrough or not start:
+            return
+
+        body = b"".join(chunks)
+        stored_headers = [
+            [k.decode("latin-1"), v.decode("latin-1")] for k, v in start.get("headers", [])
+            if k.lower() not in (b"content-length", b"date", b"server")
+        ]
+        stored_headers.append(["etag", make_etag(generation, body)])
+        if not any(k.lower() == "cache-control" for k, _ in stored_headers):
+            # Let browsers keep the body but revalidate it (cheap 304) on every use
+            stored_headers.append(["cache-control", "no-cache"])
+        await run_blocking(self.backend.set, key, pack(start["status"], stored_headers, body))
+        await self.respond(send, start["status"], stored_headers, body, if_none_match, "MISS")
+
+    def lookup(self, scope, accept):
+        """(generation, key, stored entry or None); may block on SQLite."""
+        generation = self.generation()
+        key = cache_key(scope["path"], scope["query_string"].decode("latin-1"), generation, accept)
+        return generation, key, self.backend.get(key)
+
+    async def respond(self, send, status, headers, body, if_none_match, outcome):
+        etag = next(v for k, v in headers if k == "etag")
+        if etag_matches(if_none_match, etag):
+            kept = [[k, v] for k, v in headers if k.lower() in ("etag", "cache-control", "vary")]
+            await send({"type": "http.response.start", "status": 304,
+                        "headers": encode_headers(kept + [["x-cache", outcome]])})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        full = headers + [["content-length", str(len(body))], ["x-cache", outcome]]
+        await send({"type": "http.response.start", "status": status, "headers": encode_headers(full)})
+        await send({"type": "http.response.body", "body": body})
+
+def encode_headers(headers):
+    return [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+
+RESPONSE_CACHE = build_backend()
@@ -0,0 +1,119 @@
+"""
+Columnar responses (Apache Arrow IPC stream / Parquet) for the bulk data
+endpoints. Rows are fetched from SQL in batches as plain tuples and turned
+into Arrow record batches, so no ORM objects are built and memory stays
+bounded by the batch size.
+
+pyarrow is optional: without it these formats answer 406.
+"""
+from typing import Optional
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Integer, Float, DateTime
+from sqlalchemy.orm import Session
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+PARQUET = "application/vnd.apache.parquet"
+
+MEDIA_TYPES = {"arrow": ARROW_STREAM, "parquet": PARQUET}
+EXTENSIONS = {"arrow": "arrows", "parquet": "parquet"}
+
+BATCH_SIZE = 50_000
+
+def negotiate(request: Request, format: Optional[str] = None) -> Optional[str]:
+    """
+    Returns 'arrow', 'parquet' or None (JSON/CSV as usual).
+    An explicit ?format= wins over the Accept header.
+    """
+    if format in MEDIA_TYPES:
+        return format
+    accept = request.headers.get("accept", "")
+    for fmt, media_type in MEDIA_TYPES.items():
+        if media_type in accept:
+            return fmt
+    return None
+
+def arrow_type(pa, sql_type):
+    if isinstance(sql_type, Integer):
+        return pa.int64()
+    if isinstance(sql_type, Float):
+        return pa.float64()
+    if isinstance(sql_type, DateTime):
+        return pa.timestamp("us")
+    return pa.string()
+
+def arrow_schema(pa, statement):
+    return pa.schema([
+        pa.field(column.name, arrow_type(pa, column.type))
+        for column in statement.selected_columns
+    ])
+
+class _ChunkSink:
+    """File-like sink that hands back whatever the writer produced since the last drain."""
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def _iter_columnar(db: Session, statements, fmt, batch_size):
+    import pyarrow as pa
+
+    schema = arrow_schema(pa, statements[0])
+    sink = _ChunkSink()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(sink, schema, compression="snappy")
+        write = writer.write_batch
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+        write = writer.write_batch
+
+    for statement in statements:
+        result = db.execute(statement.execution_options(yield_per=batch_size))
+        for rows in result.partitions():
+            columns = list(zip(*rows))
+            batch = pa.record_batch(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                schema=schema,
+            )
+            write(batch)
+            yield sink.drain()
+
+    writer.close()
+    yield sink.drain()
+
+def columnar_response(db: Session, statements, fmt: str, filename: str, headers=None, batch_size=BATCH_SIZE):
+    """
+    Streams the rows of `statements` (Core selects sharing one column layout)
+    as a single Arrow stream or Parquet file.
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise HTTPException(status_code=406, detail="Columnar formats require pyarrow on the server")
+
+    if not isinstance(statements, (list, tuple)):
+        statements = [statements]
+
+    return StreamingResponse(
+        _iter_columnar(db, statements, fmt, batch_size),
+        media_type=MEDIA_TYPES[fmt],
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}.{EXTENSIONS[fmt]}",
+            **(headers or {}),
+        },
+    )
@@ -0,0 +1,389 @@
+"""
+Composite payloads for the dashboard pages: every widget of a page from a
+single statement.
+
+Each builder puts the filtered rows of the page's source (cube or raw
+table, see `aggregates.source`) in a MATERIALIZED CTE and computes every
+widget aggregate over it as one branch of a UNION ALL, tagged with the
+widget name. A page load becomes one request and one scan of the filtered
+rows instead of one of each per widget. The widget shapes match the
+individual endpoints, which stay for other callers.
+"""
+from sqlalchemy import case, desc, distinct, func, literal, select, union_all
+from sqlalchemy.orm import Session
+
+import aggregates
+import models
+
+# Royalties report departments in upper case without accents (DB -> frontend)
+DEPARTMENT_NAMES = {
+    'ANTIOQUIA': 'Antioquia',
+    'ARAUCA': 'Arauca',
+    'ATLANTICO': 'Atlántico',
+    'BOLIVAR': 'Bolívar',
+    'BOYACA': 'Boyacá',
+    'CALDAS': 'Caldas',
+    'CAQUETA': 'Caquetá',
+    'CASANARE': 'Casanare',
+    'CAUCA': 'Cauca',
+    'CESAR': 'Cesar',
+    'CHOCO': 'Chocó',
+    'CORDOBA': 'Córdoba',
+    'CUNDINAMARCA': 'Cundinamarca',
+    'GUAJIRA': 'La Guajira',
+    'GUAVIARE': 'Guaviare',
+    'HUILA': 'Huila',
+    'MAGDALENA': 'Magdalena',
+    'META': 'Meta',
+    'NARIÑO': 'Nariño',
+    'NORTE DE SANTANDER': 'Norte de Santander',
+    'PUTUMAYO': 'Putumayo',
+    'QUINDIO': 'Quindío',
+    'RISARALDA': 'Risaralda',
+    'SANTANDER': 'Santander',
+    'SUCRE': 'Sucre',
+    'TOLIMA': 'Tolima',
+    'VALLE DEL CAUCA': 'Valle del Cauca',
+    'VICHADA': 'Vichada',
+    'AMAZONAS': 'Amazonas',
+    'VAUPES': 'Vaupés',
+    'GUAINIA': 'Guainía',
+    'SAN ANDRES': 'San Andrés y Providencia'
+}
+
+# UPME demand regions -> departments they cover
+REGION_DEPARTMENTS = {
+    'Costa Atlántica': ['Atlántico', 'La Guajira', 'Magdalena'],
+    'Costa Interior': ['Bolívar', 'Cesar', 'Córdoba', 'Sucre'],
+    'Centro': ['Bogotá D.C.', 'Cundinamarca', 'Boyacá', 'Meta'],
+    'NorOccidente': ['Antioquia', 'Chocó'],
+    'SurOccidente': ['Valle del Cauca', 'Cauca', 'Nariño'],
+    'NorOriente': ['Santander', 'Norte de Santander', 'Arauca'],
+    'Tolima-Huila': ['Tolima', 'Huila'],
+    'CQR': ['Casanare'],
+    'Magdalena Medio': ['Santander'],
+}
+
+# Demand years from this one on are UPME projections
+PROJECTION_START_YEAR = 2024
+
+def department_name(name):
+    """Royalties department as shown on the map."""
+    return DEPARTMENT_NAMES.get(name) or DEPARTMENT_NAMES.get(name.upper()) or name.title()
+
+def spread_over_departments(region_totals):
+    """(region, value) pairs -> {department: value}, each region split evenly."""
+    by_department = {}
+    for region, value in region_totals:
+        departments = REGION_DEPARTMENTS.get(region, [])
+        if not departments:
+            continue
+        share = value / len(departments)
+        for department in departments:
+            by_department[department] = by_department.get(department, 0) + share
+    return by_department
+
+def supply_demand_balance(demand_by_year, production_by_year):
+    """
+    Yearly projected demand vs production (GBTUD). Years without production
+    reuse the last known year (flat projection).
+    """
+    years = sorted(set(demand_by_year) | set(production_by_year))
+    last_year = max(production_by_year) if production_by_year else 0
+    last_value = production_by_year.get(last_year, 0)
+    result = []
+    for year in years:
+        if year < PROJECTION_START_YEAR:
+            continue
+        demand = demand_by_year.get(year, 0)
+        production = production_by_year.get(year, last_value)
+        production_gbtud = (production / 365) if production > 0 else 0  # annual KPC -> daily
+        result.append({
+            "year": year,
+            "demand": demand,
+            "production": production_gbtud,
+            "deficit": demand - production_gbtud if demand > production_gbtud else 0
+        })
+    return result
+
+def apply_filters(statement, M, **filters):
+    """WHERE clauses for the dashboard filters (`*_min` / `*_max` are ranges)."""
+    for name, value in filters.items():
+        if not value:
+            continue
+        if name.endswith("_min"):
+            statement = statement.where(getattr(M, name[:-4]) >= value)
+        elif name.endswith("_max"):
+            statement = statement.where(getattr(M, name[:-4]) <= value)
+        else:
+            statement = statement.where(getattr(M, name) == value)
+    return statement
+
+
+# Widest widget row (the widget name column excluded)
+WIDTH = 5
+
+def counters(M, column):
+    """Columns AVG(column) needs besides the column itself: the stored non-null count on a cube."""
+    if not aggregates.is_cube(M):
+        return []
+    return [f"{column}_n"]
+
+def average(f, M, column):
+    """AVG(column) over the filtered rows of either a raw table or its cube."""
+    if not aggregates.is_cube(M):
+        return func.avg(f.c[column])
+    return func.sum(f.c[column]) / func.sum(f.c[counters(M, column)[0]])
+
+def filtered(M, columns, **filters):
+    """The filtered rows as a MATERIALIZED CTE: SQLite reads them once for every widget."""
+    statement = apply_filters(select(*[getattr(M, c) for c in columns]), M, **filters)
+    return statement.cte("filtered").prefix_with("MATERIALIZED")
+
+def widget(name, *columns):
+    """One branch of the compound SELECT: the widget name, then `columns` padded to WIDTH."""
+    columns = [*columns, *[literal(None)] * (WIDTH - len(columns))]
+    return select(literal(name).label("widget"), *[c.label(f"c{i}") for i, c in enumerate(columns)])
+
+def top(statement, limit):
+    # Compound members cannot carry their own ORDER BY / LIMIT, so wrap them
+    return select(*statement.order_by(desc("c1")).limit(limit).subquery().c)
+
+def run(db: Session, *branches):
+    """Executes the branches as one UNION ALL and returns {widget: [row, ...]}."""
+    results = {}
+    for row in db.execute(union_all(*branches)):
+        results.setdefault(row.widget, []).append(tuple(row)[1:])
+    return results
+
+def ranked(rows):
+    # ORDER BY total DESC as in SQLite (NULL totals last): UNION ALL keeps no order
+    ordered = sorted(rows, key=lambda row: (row[1] is not None, row[1] or 0), reverse=True)
+    return [{"name": name, "value": value} for name, value, *_ in ordered]
+
+def production_dashboard(db: Session, ranking_limit=15, **filters):
+    """KPIs, monthly trend, operator and field rankings and map for Production."""
+    M = aggregates.source(db, models.Production, **filters)
+    f = filtered(M, ["anio", "mes", "departamento", "campo", "operadora", "produccion_mensual",
+                     *counters(M, "produccion_mensual")], **filters)
+    total = func.sum(f.c.produccion_mensual)
+    rows = run(
+        db,
+        widget("kpis", total, func.count(distinct(f.c.campo)), func.count(distinct(f.c.operadora)),
+               average(f, M, "produccion_mensual")),
+        widget("trend", f.c.anio, f.c.mes, total).group_by(f.c.anio, f.c.mes),
+        top(widget("operadora", f.c.operadora, total).group_by(f.c.operadora), ranking_limit),
+        top(widget("campo", f.c.campo, total).group_by(f.c.campo), ranking_limit),
+        widget("map", f.c.departamento, total).group_by(f.c.departamento),
+    )
+
+    production, fields, operators, average_monthly, _ = rows["kpis"][0]
+    return {
+        "kpis": {
+            "totalProduction": production or 0,
+            "activeFields": fields or 0,
+            "activeOperators": operators or 0,
+            "averageMonthly": average_monthly or 0,
+        },
+        "trend": [{"year": anio, "month": mes, "total": value}
+                  for anio, mes, value, *_ in sorted(rows.get("trend", []))],
+        "ranking": {
+            "operadora": ranked(rows.get("operadora", [])),
+            "campo": ranked(rows.get("campo", [])),
+        },
+        "map": [{"department": name, "value": value} for name, value, *_ in rows.get("map", [])],
+    }
+
+def royalties_dashboard(db: Session, ranking_limit=20, **filters):
+    """KPIs, monthly trend, map, hydrocarbon distribution and field ranking for Royalties."""
+    M = aggregates.source(db, models.Royalty, **filters)
+    # Municipalities are not a cube dimension: counted on the raw table when the cube answers
+    f = filtered(M, ["anio", "mes", "departamento", "campo", "tipo_hidrocarburo",
+                     "valor_liquidado", "volumen_regalia", "precio_usd",
+                     *counters(M, "precio_usd"), *([] if aggregates.is_cube(M) else ["municipio"])], **filters)
+    if aggregates.is_cube(M):
+        R = models.Royalty
+        municipalities = apply_filters(widget("municipalities", func.count(distinct(R.municipio))), R, **filters)
+    else:
+        municipalities = widget("municipalities", func.count(distinct(f.c.municipio)))
+
+    value = func.sum(f.c.valor_liquidado)
+    volume = func.sum(f.c.volumen_regalia)
+    price = average(f, M, "precio_usd")
+    rows = run(
+        db,
+        widget("kpis", value, volume, price),
+        municipalities,
+        widget("trend", f.c.anio, f.c.mes, value, volume, price).group_by(f.c.anio, f.c.mes),
+        widget("map", f.c.departamento, value).group_by(f.c.departamento),
+        widget("distribution", f.c.tipo_hidrocarburo, value).group_by(f.c.tipo_hidrocarburo),
+        top(widget("ranking", f.c.campo, value).group_by(f.c.campo), ranking_limit),
+    )
+
+    total_amount, total_volume, avg_price, *_ = rows["kpis"][0]
+    return {
+        "kpis": {
+            "totalAmount": total_amount or 0,
+            "totalVolume": total_volume or 0,
+            "avgPriceUsd": avg_price or 0,
+            "municipalities": rows["municipalities"][0][0] or 0,
+        },
+        "trend": [{"year": anio, "month": mes, "valor": valor, "volumen": volumen, "precio": precio}
+                  for anio, mes, valor, volumen, precio in sorted(rows.get("trend", []))],
+        "map": [{"department": department_name(name), "value": total}
+                for name, total, *_ in rows.get("map", [])],
+        "distribution": [{"name": name, "value": total} for name, total, *_ in rows.get("distribution", [])],
+        "ranking": ranked(rows.get("ranking", [])),
+    }
+
+def demand_dashboard(db: Session):
+    """Every Demand widget (KPIs, trends, sector/region splits, scenarios, map, balance)."""
+    M = aggregates.source(db, models.Demand)
+    P = aggregates.source(db, models.Production)
+    f = filtered(M, ["anio", "mes", "sector", "region", "escenario", "demanda"])
+    total = func.sum(f.c.demanda)
+    projected = f.c.anio >= PROJECTION_START_YEAR
+    rows = run(
+        db,
+        widget("kpis", func.sum(case((~projected, f.c.demanda))), func.sum(case((projected, f.c.demanda)))),
+        widget("trend", f.c.anio, f.c.mes, total).group_by(f.c.anio, f.c.mes),
+        widget("sector", f.c.sector, total).group_by(f.c.sector),
+        widget("region", f.c.region, total).group_by(f.c.region),
+        widget("scenarios", f.c.anio, f.c.escenario, total)
+            .where(f.c.sector == 'Agregado').group_by(f.c.anio, f.c.escenario),
+        widget("sectors", f.c.anio, f.c.sector, total)
+            .where(f.c.escenario == 'Medio', f.c.sector != 'Agregado').group_by(f.c.anio, f.c.sector),
+        # Balance: high scenario, national total only so regions are not counted twice
+        widget("balance", f.c.anio, total)
+            .where(f.c.escenario == 'Alto', f.c.sector == 'Agregado', f.c.region == 'Nacional', projected)
+            .group_by(f.c.anio),
+        widget("production", P.anio, func.sum(P.produccion_mensual)).group_by(P.anio),
+    )
+
+    real, projected_total, *_ = rows["kpis"][0]
+    real, projected_total = real or 0, projected_total or 0
+    trend = []
+    for anio, mes, value, *_ in rows.get("trend", []):
+        is_projected = anio >= PROJECTION_START_YEAR
+        trend.append({
+            "name": f"{anio}-{str(mes).zfill(2)}",
+            "real": 0 if is_projected else value,
+            "projected": value if is_projected else 0,
+        })
+    trend.sort(key=lambda x: x["name"])
+
+    regions = [(name, value) for name, value, *_ in rows.get("region", []) if value and value > 0]
+    return {
+        "kpis": {
+            "totalReal": real,
+            "totalProjected": projected_total,
+            "deviation": ((real - projected_total) / projected_total) * 100 if projected_total > 0 else 0,
+        },
+        "trend": trend,
+        "sector": [{"name": name or "Desconocido", "value": value}
+                   for name, value, *_ in rows.get("sector", []) if value and value > 0],
+        "region": [{"name": name or "Desconocido", "value": value} for name, value in regions],
+        "scenarios": pivot_by_year(rows.get("scenarios", [])),
+        "sectors": pivot_by_year(rows.get("sectors", [])),
+        "map": [{"name": name, "value": value}
+                for name, value in spread_over_departments(regions).items()],
+        "balance": supply_demand_balance(
+            {anio: value for anio, value, *_ in rows.get("balance", [])},
+            {anio: value for anio, value, *_ in rows.get("production", [])},
+        ),
+    }
+
+def pivot_by_year(rows):
+    """(year, series, value) rows -> [{"year": year, series: value, ...}] sorted by year."""
+    by_year = {}
+    for year, series, value, *_ in rows:
+        by_year.setdefault(year, {"year": year})[series] = value
+    return sorted(by_year.values(), key=lambda row: row["year"])
+
+def report_year(production_by_year, royalties_by_year):
+    """
+    Year the strategic KPIs describe: the latest one with both production and
+    royalties reported (the latest production year if they never overlap).
+    """
+    both = [year for year, volume in production_by_year.items()
+            if (volume or 0) > 0 and (royalties_by_year.get(year) or 0) > 0]
+    return max(both or production_by_year or [None])
+
+def report_data(db: Session, year=None):
+    """
+    Strategic dashboard (/stats/*) and PDF executive report: KPIs, production
+    vs royalties by year, regional supply/demand balance and top operators.
+    One statement, each table read once. `year` picks the year the KPIs and
+    the balance describe (default: `report_year`).
+    """
+    P = aggregates.source(db, models.Production)
+    R = aggregates.source(db, models.Royalty)
+    D = aggregates.source(db, models.Demand)
+    rows = run(
+        db,
+        widget("production", P.anio, P.departamento, P.operadora, func.sum(P.produccion_mensual))
+            .group_by(P.anio, P.departamento, P.operadora),
+        widget("royalties", R.anio, func.sum(R.valor_liquidado)).group_by(R.anio),
+        # Baseline demand: medium scenario, per region (Nacional is the country total)
+        widget("demand", D.anio, D.region, func.sum(D.demanda))
+            .where(D.escenario == 'Medio', D.sector == 'Agregado').group_by(D.anio, D.region),
+    )
+
+    production_by_year, supply, operators = {}, {}, {}
+    for anio, departamento, operadora, volume, *_ in rows.get("production", []):
+        if volume is None:
+            continue
+        production_by_year[anio] = production_by_year.get(anio, 0) + volume
+        supply[anio, departamento] = supply.get((anio, departamento), 0) + volume
+        operators[operadora] = operators.get(operadora, 0) + volume
+    royalties_by_year = {anio: value or 0 for anio, value, *_ in rows.get("royalties", [])}
+    year = year or report_year(production_by_year, royalties_by_year)
+    demand = [(region, value or 0) for anio, region, value, *_ in rows.get("demand", []) if anio == year]
+
+    # KPIs for the report year
+    production_gbtud = production_by_year.get(year, 0) / 365  # KPC/year -> GBTUD (approx)
+    demand_total = sum(value for region, value in demand if region == 'Nacional')
+    kpis = {
+        "year": year,
+        "production_avg_gbtud": production_gbtud,
+        "royalties_annual_cop": royalties_by_year.get(year, 0),
+        "royalties_total_historical_cop": sum(royalties_by_year.values()),
+        "demand_avg_gbtud": demand_total,
+        "coverage_ratio": (production_gbtud / demand_total * 100) if demand_total > 0 else 0,
+    }
+
+    # Only years with both series, so future projections do not drop to zero
+    production_vs_royalties = [
+        {"year": anio, "production_vol": production_by_year[anio], "royalties_val": royalties_by_year[anio]}
+        for anio in sorted(set(production_by_year) & set(royalties_by_year))
+        if production_by_year[anio] > 0 and royalties_by_year[anio] > 0
+    ]
+
+    # Supply by department vs regional demand spread over its departments
+    supply_by_department = {department: volume / 365 for (anio, department), volume in supply.items() if anio == year}
+    demand_by_department = spread_over_departments(demand)
+    regional_balance = []
+    for department in set(supply_by_department) | set(demand_by_department):
+        s = supply_by_department.get(department, 0)
+        d = demand_by_department.get(department, 0)
+        regional_balance.append({
+            "department": department,
+            "supply": s,
+            "demand": d,
+            "balance": s - d,
+            "status": "Superávit" if s - d > 0 else "Déficit"
+        })
+    regional_balance.sort(key=lambda x: x["balance"], reverse=True)
+
+    # Top operators by share of all production
+    total_production = sum(production_by_year.values()) or 1
+    top_operators = [{"name": item["name"], "value": item["value"] / total_production * 100}
+                     for item in ranked(list(operators.items()))[:5]]
+
+    return {
+        "years": sorted(production_by_year),
+        "kpis": kpis,
+        "production_vs_royalties": production_vs_royalties,
+        "regional_balance": regional_balance,
+        "top_operators": top_operators,
+    }
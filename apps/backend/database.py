@@ -1,14 +1,78 @@
-from sqlalchemy import create_engine
+"""
+SQLite engines for the app.
+
+- `engine` / `SessionLocal`: read-write, used by the ETL and table setup.
+- `read_engine` / `ReadSessionLocal`: read-only pool (URI `mode=ro`) used by
+  the API, so a request can never take the write lock.
+
+Both apply the connection pragmas from `create_sqlite_engine` on every new
+connection. The writer switches the file to WAL, so API reads keep going
+while an ETL load is writing. Pragma values can be tuned with environment
+variables.
+"""
+import os
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./data.db"
+DATABASE_PATH = os.getenv("SIMGN_DB_PATH", "./data.db")
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
+
+# Applied to every connection (writer and readers)
+CONNECTION_PRAGMAS = {
+    "mmap_size": int(os.getenv("SIMGN_SQLITE_MMAP_BYTES", 256 * 1024 * 1024)),
+    "cache_size": -int(os.getenv("SIMGN_SQLITE_CACHE_KB", 64 * 1024)),  # negative = KiB
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+}
+# Writer only: persistent WAL journal, fsync at checkpoints instead of every commit
+WRITER_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+}
+READ_POOL_SIZE = int(os.getenv("SIMGN_READ_POOL_SIZE", 8))
+
+def create_sqlite_engine(path=DATABASE_PATH, read_only=False, pragmas=None, **kwargs):
+    """
+    Engine for the SQLite file at `path` with tuned pragmas.
+
+    read_only opens the file through a `mode=ro` URI: writes fail with
+    "attempt to write a readonly database". The file must already exist.
+    """
+    if read_only:
+        url = f"sqlite:///file:{os.path.abspath(path)}?mode=ro&uri=true"
+        kwargs.setdefault("pool_size", READ_POOL_SIZE)
+        kwargs.setdefault("max_overflow", READ_POOL_SIZE)
+    else:
+        url = f"sqlite:///{path}"
+    connect_args = {"check_same_thread": False, **kwargs.pop("connect_args", {})}
+    new_engine = create_engine(url, connect_args=connect_args, **kwargs)
+
+    if pragmas is None:
+        pragmas = dict(CONNECTION_PRAGMAS)
+        if read_only:
+            pragmas["query_only"] = "ON"
+        else:
+            pragmas.update(WRITER_PRAGMAS)
+
+    @event.listens_for(new_engine, "connect")
+    def apply_connection_pragmas(dbapi_connection, _record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+    return new_engine
+
+engine = create_sqlite_engine(DATABASE_PATH)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+read_engine = create_sqlite_engine(DATABASE_PATH, read_only=True)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
 Base = declarative_base()
 
 def get_db():
@@ -17,3 +81,11 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def get_read_db():
+    """Session on the read-only pool, for API routes."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -1,4 +1,36 @@
-from etl.pipeline import run_pipeline
+"""
+Ejecuta el pipeline ETL.
+
+    python -m etl                                  # todo
+    python -m etl --stages royalties demand        # solo esas fuentes (+ dependencias y cubos)
+    python -m etl --stages production --skip aggregates
+    python -m etl --full                           # recarga completa (ignora huellas y marcas)
+    python -m etl --list                           # etapas disponibles
+"""
+import argparse
+
+from etl.pipeline import run_pipeline, build_stages, REPORT_PATH
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m etl", description="Pipeline ETL de SIMGN")
+    parser.add_argument("--stages", nargs="+", metavar="ETAPA",
+                        help="etapas a ejecutar: nombre, fuente (p. ej. 'royalties') o comodín")
+    parser.add_argument("--skip", nargs="+", default=[], metavar="ETAPA", help="etapas a omitir")
+    parser.add_argument("--full", action="store_true", help="recarga completa: regalías sin incremental y archivos aunque no hayan cambiado")
+    parser.add_argument("--limit-files", type=int, default=0, help="archivos de producción (0 = todos)")
+    parser.add_argument("--workers", type=int, default=4, help="etapas en paralelo")
+    parser.add_argument("--report", default=REPORT_PATH, help="ruta del reporte JSON")
+    parser.add_argument("--list", action="store_true", help="lista las etapas y sale")
+    args = parser.parse_args()
+
+    if args.list:
+        for stage in build_stages():
+            deps = ", ".join(stage.deps + stage.after) or "-"
+            print(f"{stage.name:<24} {'escribe' if stage.writes else '':<8} después de: {deps}")
+        return
+
+    run_pipeline(stages=args.stages, skip=args.skip, incremental=not args.full,
+                 limit_files=args.limit_files, workers=args.workers, report_path=args.report)
 
 if __name__ == "__main__":
-    run_pipeline()
+    main()
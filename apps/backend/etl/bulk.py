@@ -0,0 +1,186 @@
+"""
+Carga masiva compartida por los tres ETL.
+
+Recibe datos columnares (un DataFrame o lotes Arrow) y los escribe con
+executemany sobre un INSERT preparado, en una sola transacción por carga y
+sin pasar por el unit of work del ORM. Durante la carga se aplican pragmas de
+SQLite pensados para escritura masiva y al terminar se restauran.
+
+Una recarga completa (replace=True) no toca la tabla viva: se carga en una
+tabla de staging y se publica con un intercambio atómico (ver etl/staging.py),
+así los lectores de la API nunca ven la tabla vacía ni esperan al ETL.
+"""
+import datetime
+
+import pandas as pd
+from sqlalchemy import Integer
+
+from database import engine
+from etl.staging import create_staging, build_indexes, swap_in, staging_name
+
+BATCH_SIZE = 50_000
+
+# Pragmas de carga: caché amplia y temporales en memoria. El journal queda en
+# disco (WAL o rollback journal) y synchronous en NORMAL: una carga
+# interrumpida, incluso por un corte del sistema, deja la base como estaba
+# porque todo va en una transacción. journal_mode=MEMORY o synchronous=OFF
+# serían algo más rápidos pero un corte a mitad podría corromper el archivo.
+BULK_PRAGMAS = {
+    "synchronous": "NORMAL",
+    "cache_size": -200_000,  # ~200 MB
+    "temp_store": "MEMORY",
+}
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"  # formato con el que SQLAlchemy guarda DateTime en SQLite
+
+def apply_pragmas(cursor, pragmas):
+    """Aplica `pragmas` y devuelve los valores anteriores para restaurarlos."""
+    previous = {}
+    for name, value in pragmas.items():
+        previous[name] = cursor.execute(f"PRAGMA {name}").fetchone()[0]
+        cursor.execute(f"PRAGMA {name} = {value}")
+    return previous
+
+def iter_frames(data):
+    """Normaliza DataFrame / Table / RecordBatch / iterable de lotes Arrow a DataFrames."""
+    if isinstance(data, pd.DataFrame):
+        yield data
+        return
+    if hasattr(data, "to_batches"):  # pyarrow.Table
+        data = data.to_batches()
+    elif hasattr(data, "to_pandas"):  # pyarrow.RecordBatch suelto
+        data = [data]
+    for batch in data:
+        yield batch if isinstance(batch, pd.DataFrame) else batch.to_pandas()
+
+def column_values(series, sql_type=None):
+    """Valores de una columna como objetos Python nativos, con None en lugar de NaN/NaT."""
+    if isinstance(sql_type, Integer) and pd.api.types.is_float_dtype(series):
+        # Enteros con huecos llegan como float: 2020.0 -> 2020
+        series = series.astype("Int64")
+    if pd.api.types.is_datetime64_any_dtype(series):
+        series = series.dt.strftime(DATETIME_FORMAT)
+    values = series.astype(object)
+    return values.where(series.notna(), None).tolist()
+
+def frame_rows(df, columns, defaults):
+    """Tuplas en el orden de `columns`; las columnas ausentes toman su valor por defecto."""
+    data = [
+        column_values(df[c.name], c.type) if c.name in df.columns else [defaults.get(c.name)] * len(df)
+        for c in columns
+    ]
+    return zip(*data)
+
+def insert_statement(table_name, columns):
+    return (f"INSERT INTO {table_name} ({', '.join(c.name for c in columns)}) "
+            f"VALUES ({', '.join('?' for _ in columns)})")
+
+def insert_frames(cursor, insert, frames, columns, defaults, batch_size):
+    """executemany de `insert` sobre cada trozo de cada DataFrame. Devuelve filas insertadas."""
+    inserted = 0
+    for df in frames:
+        for start in range(0, len(df), batch_size):
+            chunk = df.iloc[start:start + batch_size]
+            cursor.executemany(insert, frame_rows(chunk, columns, defaults))
+            inserted += len(chunk)
+    return inserted
+
+def load_defaults():
+    return {"fecha_carga": datetime.datetime.utcnow().strftime(DATETIME_FORMAT)}
+
+def bulk_load(model, data, replace=True, batch_size=BATCH_SIZE, bind=None):
+    """
+    Carga `data` en la tabla de `model` con executemany.
+
+    Args:
+        model: modelo SQLAlchemy destino (Production, Royalty, Demand, ...)
+        data: DataFrame, pyarrow.Table/RecordBatch o iterable de lotes
+        replace: recarga completa vía staging + intercambio; si es False se
+            agregan filas directamente a la tabla viva
+        batch_size: filas por executemany
+        bind: engine a usar (por defecto el de database.py)
+
+    Returns:
+        número de filas insertadas
+    """
+    table = model.__table__
+    columns = [c for c in table.columns if not c.primary_key]
+    insert = insert_statement(staging_name(table) if replace else table.name, columns)
+
+    raw = (bind or engine).raw_connection()
+    try:
+        cursor = raw.cursor()
+        previous = apply_pragmas(cursor, BULK_PRAGMAS)
+        try:
+            if replace:
+                create_staging(cursor, table)
+            inserted = insert_frames(cursor, insert, iter_frames(data), columns, load_defaults(), batch_size)
+            raw.commit()
+            if replace:
+                # Índices después de los datos: una sola pasada ordenada por índice
+                build_indexes(cursor, table)
+                raw.commit()
+                swap_in(cursor, table)
+                print(f"   🔁 {table.name}: nueva generación publicada ({inserted:,} filas)")
+        except BaseException:
+            raw.rollback()
+            raise
+        finally:
+            apply_pragmas(cursor, previous)
+    finally:
+        raw.close()
+    return inserted
+
+def bulk_upsert(model, data, key, batch_size=BATCH_SIZE, bind=None):
+    """
+    Upsert por clave natural sobre la tabla viva, en una transacción: las
+    filas de `data` cuya clave `key` (tupla de columnas) ya existe con otros
+    valores se borran y se vuelven a insertar, las de clave nueva se insertan
+    y las idénticas a lo guardado no se tocan. Si la clave se repite en
+    `data` gana la última fila.
+
+    Returns:
+        (filas reemplazadas, filas escritas: reemplazadas + nuevas)
+    """
+    table = model.__table__
+    columns = [c for c in table.columns if not c.primary_key]
+    key_columns = [table.c[name] for name in key]
+    frames = [df for df in iter_frames(data) if not df.empty]
+    if not frames:
+        return 0, 0
+    df = pd.concat(frames, ignore_index=True).drop_duplicates(subset=list(key), keep="last")
+    # Solo se comparan las columnas que trae `data` (fecha_carga y similares no)
+    compared = [c for c in columns if c.name in df.columns]
+
+    # IS en lugar de =: las claves y los valores con NULL también deben coincidir
+    same_key = " AND ".join(f"{name} IS ?" for name in key)
+    same_values = " AND ".join(f"{c.name} IS ?" for c in compared)
+    delete = f"DELETE FROM {table.name} WHERE {same_key} AND NOT ({same_values})"
+    insert = (f"INSERT INTO {table.name} ({', '.join(c.name for c in columns)}) "
+              f"SELECT {', '.join('?' for _ in columns)} "
+              f"WHERE NOT EXISTS (SELECT 1 FROM {table.name} WHERE {same_key})")
+    defaults = load_defaults()
+    raw = (bind or engine).raw_connection()
+    try:
+        cursor = raw.cursor()
+        previous = apply_pragmas(cursor, BULK_PRAGMAS)
+        try:
+            replaced = inserted = 0
+            for start in range(0, len(df), batch_size):
+                chunk = df.iloc[start:start + batch_size]
+                keys = list(frame_rows(chunk, key_columns, {}))
+                values = frame_rows(chunk, compared, {})
+                cursor.executemany(delete, (k + v for k, v in zip(keys, values)))
+                replaced += cursor.rowcount
+                # Tras el DELETE solo quedan las claves con filas idénticas
+                cursor.executemany(insert, (row + k for row, k in zip(frame_rows(chunk, columns, defaults), keys)))
+                inserted += cursor.rowcount
+            raw.commit()
+        except BaseException:
+            raw.rollback()
+            raise
+        finally:
+            apply_pragmas(cursor, previous)
+    finally:
+        raw.close()
+    return replaced, inserted
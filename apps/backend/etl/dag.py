@@ -0,0 +1,162 @@
+"""
+Ejecutor mínimo de un DAG de etapas para el pipeline ETL.
+
+- Cada etapa declara sus dependencias (`deps`): recibe sus resultados en un
+  dict {nombre: resultado} y no arranca hasta que todas terminen bien.
+- `after` solo ordena: la etapa espera a esas etapas si están en la
+  ejecución, pero no las arrastra ni falla si no están (p. ej. los cubos).
+- `triggered_by` arrastra la etapa cuando se elige alguna de esas etapas
+  (p. ej. cualquier carga arrastra la reconstrucción de cubos).
+- Las etapas independientes corren en paralelo en un pool de hilos; las que
+  escriben en la base (`writes=True`) pasan de a una por el candado del
+  escritor, porque SQLite admite un solo escritor.
+- Al final queda un reporte JSON con tiempo real, CPU, filas y bytes por etapa.
+"""
+import datetime
+import fnmatch
+import json
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import pandas as pd
+
+WRITER_LOCK = threading.Lock()
+
+class Stage:
+    def __init__(self, name, fn, deps=(), after=(), triggered_by=(), writes=False):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.after = tuple(after)
+        self.triggered_by = tuple(triggered_by)
+        self.writes = writes
+
+def measure(result):
+    """(filas, bytes) de un resultado de etapa: DataFrame, lista o número de filas."""
+    if isinstance(result, pd.DataFrame):
+        return len(result), int(result.memory_usage(deep=True).sum())
+    if isinstance(result, (list, tuple, dict)):
+        return len(result), None
+    if isinstance(result, int) and not isinstance(result, bool):
+        return result, None
+    return None, None
+
+def select_stages(stages, patterns=None, skip=()):
+    """
+    Etapas a ejecutar: las que coinciden con `patterns` (nombre exacto,
+    prefijo 'fuente' o comodín fnmatch) más sus dependencias y las etapas
+    que esas disparan (`triggered_by`), menos `skip`.
+    """
+    by_name = {stage.name: stage for stage in stages}
+
+    def matches(name, pattern):
+        return name == pattern or name.startswith(pattern + ".") or fnmatch.fnmatch(name, pattern)
+
+    chosen = {s.name for s in stages if not patterns or any(matches(s.name, p) for p in patterns)}
+    pending = list(chosen)
+    while pending:
+        name = pending.pop()
+        pulled = list(by_name[name].deps)
+        pulled += [s.name for s in stages if name in s.triggered_by]
+        for other in pulled:
+            if other not in chosen:
+                chosen.add(other)
+                pending.append(other)
+    chosen -= {s.name for s in stages if any(matches(s.name, p) for p in skip)}
+    return [stage for stage in stages if stage.name in chosen]
+
+def _run_stage(stage, inputs, started):
+    entry = {"name": stage.name, "start_s": round(time.perf_counter() - started, 3)}
+    lock = WRITER_LOCK if stage.writes else None
+    wall = time.perf_counter()
+    if lock:
+        lock.acquire()
+        entry["lock_wait_s"] = round(time.perf_counter() - wall, 3)
+    cpu = time.thread_time()
+    try:
+        result = stage.fn(inputs)
+        entry["status"] = "ok"
+        entry["rows"], entry["bytes"] = measure(result)
+        return result, entry
+    except Exception as e:
+        traceback.print_exc()
+        entry["status"] = "failed"
+        entry["error"] = str(e)[:500]
+        return None, entry
+    finally:
+        if lock:
+            lock.release()
+        # CPU del hilo de la etapa (los procesos hijos del parseo no se cuentan)
+        entry["cpu_s"] = round(time.thread_time() - cpu, 3)
+        entry["wall_s"] = round(time.perf_counter() - wall, 3)
+
+def run_dag(stages, workers=4, report_path=None):
+    """
+    Ejecuta `stages` respetando dependencias. Devuelve el reporte (dict) y,
+    si se indica `report_path`, lo escribe como JSON.
+    """
+    names = {stage.name for stage in stages}
+    waits_for = {s.name: set(s.deps) | (set(s.after) & names) for s in stages}
+    missing = {d for s in stages for d in s.deps if d not in names}
+    if missing:
+        raise ValueError(f"Dependencias fuera de la ejecución: {sorted(missing)}")
+
+    started_at = datetime.datetime.now().isoformat(timespec="seconds")
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    results, entries, done = {}, {}, set()
+    pending = {stage.name: stage for stage in stages}
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            progressed = False
+            for name, stage in list(pending.items()):
+                if not waits_for[name] <= done:
+                    continue
+                del pending[name]
+                progressed = True
+                failed = [d for d in stage.deps if entries[d]["status"] != "ok"]
+                if failed:
+                    entries[name] = {"name": name, "status": "skipped", "reason": f"falló {', '.join(failed)}"}
+                    done.add(name)
+                    continue
+                inputs = {dep: results[dep] for dep in stage.deps}
+                running[pool.submit(_run_stage, stage, inputs, started)] = name
+            if not running:
+                if not progressed:
+                    raise ValueError(f"Ciclo de dependencias entre: {sorted(pending)}")
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                results[name], entries[name] = future.result()
+                done.add(name)
+            # Liberar resultados que ya ninguna etapa pendiente necesita
+            needed = {dep for stage in pending.values() for dep in stage.deps}
+            for key in list(results):
+                if key not in needed:
+                    del results[key]
+
+    report = {
+        "started_at": started_at,
+        "wall_s": round(time.perf_counter() - started, 3),
+        "cpu_s": round(time.process_time() - cpu_started, 3),
+        "status": "ok" if all(e["status"] == "ok" for e in entries.values()) else "failed",
+        "stages": [entries[stage.name] for stage in stages],
+    }
+    if report_path:
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    print_report(report)
+    return report
+
+def print_report(report):
+    print(f"\n{'etapa':<24}{'estado':<9}{'real s':>9}{'cpu s':>9}{'filas':>12}{'MB':>9}")
+    for e in report["stages"]:
+        rows = f"{e['rows']:,}" if e.get("rows") is not None else "-"
+        mb = f"{e['bytes'] / 1e6:.1f}" if e.get("bytes") is not None else "-"
+        print(f"{e['name']:<24}{e['status']:<9}{e.get('wall_s', 0):>9.2f}{e.get('cpu_s', 0):>9.2f}{rows:>12}{mb:>9}")
+    print(f"Total: {report['wall_s']:.2f}s reales, {report['cpu_s']:.2f}s de CPU ({report['status']})")
@@ -1,13 +1,14 @@
 import pandas as pd
 import requests
 from bs4 import BeautifulSoup
-from sqlalchemy.orm import Session
 from models import Demand
-from database import SessionLocal
+from etl.bulk import bulk_load
+from etl.downloads import CACHE_DIR, ParsedCache, digest_of, fetch_all, fingerprint
 import datetime
-import io
+import openpyxl
+import shutil
+import tempfile
 import zipfile
-import re
 
 UPME_URL = "https://www1.upme.gov.co/DemandayEficiencia/Paginas/Proyeccion_Demanda_Gas_Natural.aspx"
 FALLBACK_URL = "https://docs.upme.gov.co/DemandayEficiencia/Documents/Anexo_Datos_Proyeccion_Demanda_Gas_Nat_2024.zip"
@@ -34,11 +35,24 @@ def get_demand_file_url():
         print(f"   ❌ Error general buscando URL: {e}")
         return None
 
+SCENARIO_KEYWORDS = [('bajo', 'Bajo'), ('alto', 'Alto'), ('medio', 'Medio'), ('hist', 'Histórico')]
+DEMAND_COLUMNS = ['anio', 'mes', 'sector', 'region', 'escenario', 'demanda']
+
+def scenario_for(variable):
+    """Escenario de una columna de la hoja de escenarios (primera palabra clave que aparece)"""
+    lower = variable.lower()
+    return next((name for keyword, name in SCENARIO_KEYWORDS if keyword in lower), variable)
+
 def process_sheet(df, sheet_type, file_sector="Agregado"):
     """
-    Transforma un DataFrame de una hoja específica al formato del modelo Demand.
+    Transforma un DataFrame de una hoja específica al formato del modelo Demand
+    (DataFrame tipado con DEMAND_COLUMNS, listo para la carga masiva).
+    
+    - SCENARIOS: cada columna es un escenario (Bajo/Alto/Medio/Histórico), región Nacional
+    - REGIONAL: cada columna es una región (escenario Medio, sector Agregado), sin 'Nacional'
+    - SECTORIAL: cada columna es un sector (escenario Medio, región Nacional)
     """
-    data = []
+    empty = pd.DataFrame(columns=DEMAND_COLUMNS)
     try:
         # Limpieza básica
         df.columns = [str(c).strip() for c in df.columns]
@@ -59,76 +73,156 @@ def process_sheet(df, sheet_type, file_sector="Agregado"):
             date_col = df.columns[0]
 
         # Renombrar para estandarizar
-        df.rename(columns={date_col: 'Fecha'}, inplace=True)
+        df = df.rename(columns={date_col: 'Fecha'})
         
-        # Filtrar filas sin fecha válida
-        df = df[pd.to_datetime(df['Fecha'], errors='coerce').notna()]
+        # Fechas convertidas una sola vez; filas sin fecha válida fuera
+        fechas = pd.to_datetime(df['Fecha'], errors='coerce')
+        df = df[fechas.notna()].assign(Fecha=fechas[fechas.notna()])
         
         # Melt (Unpivot)
         id_vars = ['Fecha']
         value_vars = [c for c in df.columns if c not in id_vars and 'Unnamed' not in c]
         
         melted = df.melt(id_vars=id_vars, value_vars=value_vars, var_name='Variable', value_name='Valor')
+        melted['Valor'] = pd.to_numeric(melted['Valor'], errors='coerce')
+        melted = melted[melted['Valor'].notna()]
+        
+        if sheet_type == 'REGIONAL':
+            # Skip 'Nacional' in Regional sheet to avoid duplication with SCENARIOS sheet
+            melted = melted[melted['Variable'].str.lower() != 'nacional']
+        
+        variables = melted['Variable'].astype(str)
+        out = pd.DataFrame({
+            'anio': melted['Fecha'].dt.year.astype('int16'),
+            'mes': melted['Fecha'].dt.month.astype('int8'),
+            'demanda': melted['Valor'].astype('float64'),
+        })
         
-        for _, row in melted.iterrows():
-            try:
-                fecha = pd.to_datetime(row['Fecha'])
-                valor = float(row['Valor'])
-                variable = str(row['Variable'])
+        if sheet_type == 'SCENARIOS':
+            out['region'] = "Nacional"
+            out['sector'] = file_sector
+            # Clasificación: un mapa por valor distinto de columna, aplicado con map
+            out['escenario'] = variables.map({v: scenario_for(v) for v in variables.unique()})
+        elif sheet_type == 'REGIONAL':
+            out['escenario'] = 'Medio'
+            out['sector'] = 'Agregado' # Asumimos que la hoja regional es demanda agregada
+            out['region'] = variables
+        elif sheet_type == 'SECTORIAL':
+            # Variable es el Sector
+            out['region'] = "Nacional"
+            out['sector'] = variables
+            out['escenario'] = 'Medio' # Asumimos Medio para desglose sectorial
+        
+        out = out.reindex(columns=DEMAND_COLUMNS)
+        for col in ('sector', 'region', 'escenario'):
+            out[col] = out[col].astype('category')
+        return out.reset_index(drop=True)
                 
-                if pd.isna(valor):
-                    continue
-
-                item = Demand(
-                    anio=fecha.year,
-                    mes=fecha.month,
-                    fecha_carga=datetime.datetime.now(datetime.timezone.utc),
-                    demanda=valor
-                )
+    except Exception as e:
+        print(f"     ❌ Error transformando hoja {sheet_type}: {e}")
+        
+    return empty
 
-                # Lógica específica por tipo de hoja
-                if sheet_type == 'SCENARIOS':
-                    item.region = "Nacional"
-                    item.sector = file_sector
-                    if 'bajo' in variable.lower(): item.escenario = 'Bajo'
-                    elif 'alto' in variable.lower(): item.escenario = 'Alto'
-                    elif 'medio' in variable.lower(): item.escenario = 'Medio'
-                    elif 'hist' in variable.lower(): item.escenario = 'Histórico'
-                    else: item.escenario = variable # Fallback
+# (tipo de hoja, criterio sobre el nombre de la hoja en minúsculas, fila de encabezado)
+DEMAND_SHEETS = [
+    ('SCENARIOS', lambda name: 'alto' in name and 'bajo' in name, 1),  # Esc Alto, Medio y Bajo
+    ('REGIONAL', lambda name: 'regional' in name, 3),                  # Esc Med Regional
+    ('SECTORIAL', lambda name: 'sectorial' in name, 3),                # Esc Med Sectorial
+]
+SPOOL_MAX_SIZE = 32 * 1024 * 1024  # por encima se vuelca a disco
+CHUNK_SIZE = 1024 * 1024
+# Subir al cambiar el parseo: invalida los resultados guardados en la caché
+PARSER_VERSION = 1
 
-                elif sheet_type == 'REGIONAL':
-                    # Skip 'Nacional' in Regional sheet to avoid duplication with SCENARIOS sheet
-                    if variable.lower() == 'nacional':
-                        continue
-                    item.escenario = 'Medio'
-                    item.sector = 'Agregado' # Asumimos que la hoja regional es demanda agregada
-                    item.region = variable
+def rows_to_frame(rows, header):
+    """
+    Filas de una hoja -> DataFrame con la fila `header` como encabezado, con
+    los mismos nombres que pd.read_excel (Unnamed: i, duplicados con .1, .2).
+    """
+    rows = list(rows)
+    while rows and all(v is None for v in rows[-1]):
+        rows.pop()
+    if len(rows) <= header:
+        return pd.DataFrame()
+    width = max(len(r) for r in rows)
+    rows = [tuple(r) + (None,) * (width - len(r)) for r in rows]
+    names, seen = [], {}
+    for i, value in enumerate(rows[header]):
+        name = f"Unnamed: {i}" if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return pd.DataFrame(rows[header + 1:], columns=names)
 
-                elif sheet_type == 'SECTORIAL':
-                    # Variable es el Sector
-                    item.region = "Nacional"
-                    item.sector = variable
-                    item.escenario = 'Medio' # Asumimos Medio para desglose sectorial
+def select_sheets(sheet_names):
+    """[(tipo, hoja, fila de encabezado)] para las hojas de demanda presentes"""
+    selected = []
+    for sheet_type, matches, header in DEMAND_SHEETS:
+        sheet = next((s for s in sheet_names if matches(s.lower())), None)
+        if sheet:
+            selected.append((sheet_type, sheet, header))
+    return selected
 
-                data.append(item)
-            except Exception as e:
-                continue
-                
-    except Exception as e:
-        print(f"     ❌ Error transformando hoja {sheet_type}: {e}")
-        
-    return data
+def read_demand_workbook(f, file_name=".xlsx"):
+    """
+    Lee las tres hojas de demanda de un libro abierto una sola vez.
+    .xlsx: openpyxl en modo solo lectura (las filas se leen en streaming).
+    """
+    frames = []
+    if file_name.lower().endswith('.xls'):
+        xl = pd.ExcelFile(f)
+        for sheet_type, sheet, header in select_sheets(xl.sheet_names):
+            print(f"     - Procesando {sheet_type}: {sheet}")
+            frames.append(process_sheet(xl.parse(sheet, header=header), sheet_type))
+        return frames
+    
+    wb = openpyxl.load_workbook(f, read_only=True, data_only=True)
+    try:
+        for sheet_type, sheet, header in select_sheets(wb.sheetnames):
+            print(f"     - Procesando {sheet_type}: {sheet}")
+            ws = wb[sheet]
+            # En solo lectura openpyxl confía en la dimensión guardada en el
+            # libro, que algunos generadores dejan mal: se lee la hoja completa
+            ws.reset_dimensions()
+            df = rows_to_frame(ws.iter_rows(values_only=True), header)
+            frames.append(process_sheet(df, sheet_type))
+    finally:
+        wb.close()
+    return frames
 
-def extract_demand():
+def extract_demand(cache_dir=CACHE_DIR):
+    """
+    Descarga el ZIP de la UPME a la caché de descargas (con revalidación
+    condicional) y lee sus libros. Si el ZIP no cambió, devuelve el resultado
+    ya parseado; la huella queda en `df.attrs['fingerprint']`.
+    """
     url = get_demand_file_url()
-    if not url: return []
+    if not url: return pd.DataFrame()
     
     print(f"📥 Descargando datos de Demanda desde {url}...")
-    all_data = []
+    path = fetch_all([url], workers=1, cache_dir=cache_dir, verify=False).get(url)
+    if not path: return pd.DataFrame()
+    
+    digest = digest_of(path)
+    parsed_cache = ParsedCache("demand", PARSER_VERSION, cache_dir)
+    data = parsed_cache.get(digest)
+    if data is not None:
+        print("   ♻️  ZIP sin cambios: se reutiliza el resultado ya parseado")
+    else:
+        data = read_demand_zip(path)
+        if not data.empty:
+            parsed_cache.put(digest, data)
+    data.attrs['fingerprint'] = fingerprint([f"{url} {digest}"], PARSER_VERSION)
+    return data
+
+def read_demand_zip(path):
+    frames = []
     
     try:
-        response = requests.get(url, timeout=60, verify=False)
-        with zipfile.ZipFile(io.BytesIO(response.content)) as z:
+        with zipfile.ZipFile(path) as z:
             excel_files = [f for f in z.namelist() if (f.endswith('.xlsx') or f.endswith('.xls'))]
             
             # Priorizar archivo Agregada
@@ -140,72 +234,39 @@ def extract_demand():
                 if not file_name: continue
                 
                 print(f"   📄 Procesando archivo principal: {file_name}")
-                with z.open(file_name) as f:
-                    xl = pd.ExcelFile(f)
-                    
-                    # 1. Procesar Escenarios (Alto, Medio, Bajo)
-                    sheet_scenarios = next((s for s in xl.sheet_names if 'alto' in s.lower() and 'bajo' in s.lower()), None)
-                    if sheet_scenarios:
-                        print(f"     - Procesando Escenarios: {sheet_scenarios}")
-                        # Header en fila 1 (0-indexed) contiene los nombres de escenarios
-                        df = pd.read_excel(f, sheet_name=sheet_scenarios, header=1)
-                        all_data.extend(process_sheet(df, 'SCENARIOS'))
-
-                    # 2. Procesar Regional (Esc Med Regional)
-                    sheet_regional = next((s for s in xl.sheet_names if 'regional' in s.lower()), None)
-                    if sheet_regional:
-                        print(f"     - Procesando Regional: {sheet_regional}")
-                        df = pd.read_excel(f, sheet_name=sheet_regional, header=3)
-                        all_data.extend(process_sheet(df, 'REGIONAL'))
-
-                    # 3. Procesar Sectorial (Esc Med Sectorial)
-                    sheet_sectorial = next((s for s in xl.sheet_names if 'sectorial' in s.lower()), None)
-                    if sheet_sectorial:
-                        print(f"     - Procesando Sectorial: {sheet_sectorial}")
-                        df = pd.read_excel(f, sheet_name=sheet_sectorial, header=3)
-                        all_data.extend(process_sheet(df, 'SECTORIAL'))
+                # El libro es a su vez un ZIP: se copia a un archivo con seek
+                # barato en lugar de hacer seek sobre el miembro comprimido
+                with z.open(file_name) as member, tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as book:
+                    shutil.copyfileobj(member, book, CHUNK_SIZE)
+                    book.seek(0)
+                    frames.extend(read_demand_workbook(book, file_name))
                         
     except Exception as e:
         print(f"   ❌ Error extrayendo demanda: {e}")
         
-    return all_data
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
 
-def load_demand(data: list, db: Session):
+def load_demand(data: pd.DataFrame):
     print(f"💾 Cargando {len(data):,} registros de Demanda...")
     try:
-        deleted = db.query(Demand).delete()
-        print(f"   🗑️  Eliminados {deleted} registros antiguos")
-        
-        batch_size = 5000
-        for i in range(0, len(data), batch_size):
-            batch = data[i:i+batch_size]
-            db.add_all(batch)
-            db.commit()
-            print(f"   ... lote {i//batch_size + 1} cargado")
-            
-        print("   ✅ Carga completada exitosamente")
+        inserted = bulk_load(Demand, data)
+        print(f"   ✅ Carga completada exitosamente ({inserted:,} filas)")
+        return inserted
     except Exception as e:
         print(f"   ❌ Error cargando demanda: {e}")
-        db.rollback()
+        return None
 
 def run_demand_etl():
+    """
+    ETL de demanda fuera del pipeline completo: corre sus etapas del DAG
+    (recarga forzada), con lo que también se reconstruyen los cubos y se
+    publica una nueva generación de datos.
+    """
+    from etl.pipeline import run_pipeline
     print("\n" + "="*70)
     print("  🚀 ETL DE DEMANDA (REDEFINIDO)")
     print("="*70)
-    
-    # Ensure tables exist
-    from database import engine, Base
-    Base.metadata.create_all(bind=engine)
-    
-    data = extract_demand()
-    if data:
-        db = SessionLocal()
-        load_demand(data, db)
-        db.close()
-    else:
-        print("   ⚠️ No hay datos para cargar.")
-    
-    print("="*70 + "\n")
+    return run_pipeline(stages=["demand"], incremental=False)
 
 if __name__ == "__main__":
     run_demand_etl()
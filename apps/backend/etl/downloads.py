@@ -0,0 +1,273 @@
+"""
+Etapa de descarga concurrente para el ETL.
+
+- Pool acotado de hilos que comparten una sesión HTTP con conexiones
+  reutilizables y reintentos con backoff exponencial.
+- Caché local direccionada por contenido: cada archivo se guarda como
+  <sha256><ext> y un manifiesto url -> {hash, tamaño, ETag, Last-Modified}
+  permite reanudar una ejecución interrumpida sin volver a descargar.
+- Pasado REVALIDATE_AFTER desde la última verificación, cada URL se vuelve
+  a pedir con If-None-Match / If-Modified-Since: un 304 reutiliza el archivo.
+- Los resultados ya parseados se guardan por hash de archivo (ParsedCache):
+  un archivo que no cambió no se vuelve a parsear.
+- Las extracciones que corren a la vez en el DAG comparten una sola
+  DownloadCache por directorio (`DownloadCache.shared`): un solo candado
+  para el manifiesto y ninguna borra las descargas en curso de la otra.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+CACHE_DIR = os.getenv("SIMGN_DOWNLOAD_CACHE", "downloads")
+INDEX_FILE = "index.json"
+PARSED_DIR = "parsed"
+# Segundos durante los que una URL verificada se reutiliza sin consultar al servidor
+REVALIDATE_AFTER = int(os.getenv("SIMGN_DOWNLOAD_REVALIDATE_AFTER", 6 * 3600))
+DEFAULT_WORKERS = 6
+CHUNK_SIZE = 1024 * 1024
+# Los .part anteriores a este proceso son restos de ejecuciones interrumpidas
+RUN_STARTED = time.time()
+
+def build_session(workers=DEFAULT_WORKERS, retries=3, backoff=1.0):
+    """Sesión con pool de conexiones del tamaño del pool de hilos y reintentos."""
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET", "HEAD"),
+    )
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+class DownloadCache:
+    """Caché en disco direccionada por contenido con manifiesto url -> sha256 y validadores HTTP."""
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, cache_dir=CACHE_DIR):
+        """Instancia única del proceso para `cache_dir`."""
+        key = os.path.abspath(cache_dir)
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(cache_dir)
+            return cls._instances[key]
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, INDEX_FILE)
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index = self._read_index()
+        # Restos de descargas interrumpidas: solo los anteriores a este
+        # proceso, nunca una descarga en curso
+        for name in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, name)
+            if name.endswith(".part") and os.path.getmtime(path) < RUN_STARTED:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def _read_index(self):
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_entry(self, url, entry):
+        """
+        Registra `entry` para `url` sobre el índice en disco (las entradas
+        que otro proceso escribió mientras tanto se conservan) y lo reescribe.
+        Se llama con el candado tomado.
+        """
+        merged = self._read_index()
+        merged[url] = entry
+        self.index = merged
+        # Escritura atómica: un corte a mitad nunca deja un índice corrupto
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(merged, f, indent=1)
+        os.replace(tmp, self.index_path)
+
+    def path_for(self, digest, ext=""):
+        return os.path.join(self.cache_dir, digest + ext)
+
+    def lookup(self, url):
+        """Ruta en caché para `url`, o None si no está (o el archivo desapareció)."""
+        entry = self.index.get(url)
+        if not entry:
+            return None
+        path = self.path_for(entry["sha256"], entry.get("ext", ""))
+        if os.path.exists(path) and os.path.getsize(path) == entry["size"]:
+            return path
+        return None
+
+    def is_fresh(self, url, max_age=REVALIDATE_AFTER):
+        """True si la URL se verificó hace menos de `max_age` segundos."""
+        return time.time() - self.index.get(url, {}).get("checked_at", 0) < max_age
+
+    def validators(self, url):
+        """Cabeceras para una petición condicional a partir del manifiesto."""
+        entry = self.index.get(url, {})
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def touch(self, url):
+        """Registra que el servidor confirmó (304) que la URL no cambió."""
+        with self._lock:
+            self._save_entry(url, {**self.index[url], "checked_at": time.time()})
+
+    def store(self, url, response):
+        """Guarda el cuerpo de `response` en streaming y lo registra en el índice."""
+        ext = os.path.splitext(urlparse(url).path)[1].lower()
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+            path = self.path_for(digest.hexdigest(), ext)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+        with self._lock:
+            self._save_entry(url, {
+                "sha256": digest.hexdigest(),
+                "size": size,
+                "ext": ext,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "checked_at": time.time(),
+            })
+        return path
+
+def digest_of(path):
+    """Hash de contenido de un archivo de la caché (está en su nombre)."""
+    return os.path.splitext(os.path.basename(path))[0]
+
+def fetch(url, cache, session, timeout=120):
+    """
+    Descarga `url` a la caché, o la revalida con una petición condicional si
+    ya está. Devuelve (ruta local, True si el contenido se descargó).
+    """
+    cached = cache.lookup(url)
+    headers = cache.validators(url) if cached else {}
+    with session.get(url, timeout=timeout, stream=True, headers=headers) as response:
+        if response.status_code == 304 and cached:
+            cache.touch(url)
+            return cached, False
+        response.raise_for_status()
+        return cache.store(url, response), True
+
+def fetch_all(urls, workers=DEFAULT_WORKERS, cache_dir=CACHE_DIR, timeout=120, session=None,
+              revalidate_after=REVALIDATE_AFTER, verify=True):
+    """
+    Descarga `urls` en paralelo con un pool de `workers` hilos. Las URLs en
+    caché verificadas hace menos de `revalidate_after` segundos no tocan la
+    red; las demás se revalidan con ETag / Last-Modified.
+
+    Returns:
+        dict url -> ruta local (None si la descarga falló)
+    """
+    cache = DownloadCache.shared(cache_dir)
+    session = session or build_session(workers)
+    session.verify = verify
+    results = {}
+    reused = unchanged = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for url in urls:
+            cached = cache.lookup(url)
+            if cached and cache.is_fresh(url, revalidate_after):
+                results[url] = cached
+                reused += 1
+            else:
+                futures[pool.submit(fetch, url, cache, session, timeout)] = url
+
+        for future in as_completed(futures):
+            url = futures[future]
+            name = url.split('/')[-1][:70]
+            try:
+                results[url], changed = future.result()
+                if changed:
+                    print(f"  📥 {name} ✓")
+                else:
+                    unchanged += 1
+            except Exception as e:
+                results[url] = None
+                print(f"  📥 {name} ✗ Error: {str(e)[:50]}")
+
+    failed = sum(1 for url in futures.values() if not results[url])
+    downloaded = len(futures) - failed - unchanged
+    print(f"   📦 {downloaded} descargados, {unchanged} sin cambios (304), "
+          f"{reused} reutilizados de la caché, {failed} fallidos ({cache.cache_dir})")
+    return results
+
+class ParsedCache:
+    """
+    Resultados de parseo (DataFrames) guardados como Parquet por hash del
+    archivo de origen y versión del parser: cambiar el parser invalida todo.
+    """
+
+    def __init__(self, namespace, version, cache_dir=CACHE_DIR):
+        self.directory = os.path.join(cache_dir, PARSED_DIR, namespace)
+        self.version = version
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path_for(self, digest):
+        return os.path.join(self.directory, f"{digest}.v{self.version}.parquet")
+
+    def get(self, digest):
+        path = self.path_for(digest)
+        if not os.path.exists(path):
+            return None
+        try:
+            return pd.read_parquet(path)
+        except Exception:
+            return None
+
+    def put(self, digest, df):
+        # Escritura atómica, igual que el manifiesto
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            df.to_parquet(tmp, index=False)
+            os.replace(tmp, self.path_for(digest))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+def fingerprint(digests, version):
+    """Huella de un conjunto de archivos de origen: cambia si cambia cualquiera."""
+    h = hashlib.sha256(f"v{version}".encode())
+    for digest in sorted(digests):
+        h.update(digest.encode())
+    return h.hexdigest()
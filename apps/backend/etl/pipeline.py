@@ -1,27 +1,171 @@
-from etl.royalties import run_royalties_etl
-from etl.production import run_production_etl_multi
-from etl.demand import run_demand_etl
+from etl import royalties, production, demand
+from etl.dag import Stage, select_stages, run_dag
+from etl.state import get_state, set_state, bump_generation
+from database import SessionLocal, engine, Base
+from sqlalchemy.orm import Session
+from aggregates import ensure_cube_schema, refresh_aggregates
+import os
 import time
 import traceback
 
-def run_pipeline():
+import pandas as pd
+
+REPORT_PATH = os.getenv("SIMGN_ETL_REPORT", "etl_report.json")
+# Claves de etl_state de las que dependen los cubos agregados
+CUBE_SOURCES = ("royalties.updated_at", "production.fingerprint", "demand.fingerprint")
+
+def _unchanged(name, raw, force=False):
+    """True si los archivos de origen de `name` son los de la última carga."""
+    mark = raw.attrs.get("fingerprint")
+    return not force and mark is not None and get_state(f"{name}.fingerprint") == mark
+
+def _load(name, loader, data):
+    """Carga `data` salvo que la extracción venga vacía (nunca vaciar la tabla)."""
+    if data is None or data.empty:
+        print(f"   ⚠️ {name}: sin datos, se conserva la tabla actual")
+        return 0
+    inserted = loader(data)
+    if inserted is None:
+        raise RuntimeError(f"{name}: falló la carga")
+    return inserted
+
+def _load_source(name, loader, raw, data, force=False):
+    """Carga una fuente por archivos salvo que no haya cambiado; luego guarda su huella."""
+    if _unchanged(name, raw, force):
+        print(f"   ♻️  {name}: archivos sin cambios, se conserva la tabla actual")
+        return 0
+    inserted = _load(name, loader, data)
+    if inserted and raw.attrs.get("fingerprint"):
+        set_state(f"{name}.fingerprint", raw.attrs["fingerprint"])
+    return inserted
+
+def _refresh_cubes(force=False):
+    def refresh(_inputs):
+        sources = "|".join(str(get_state(key, default="")) for key in CUBE_SOURCES)
+        if not force and get_state("aggregates.sources") == sources:
+            print("   ♻️  cubos: fuentes sin cambios, no se reconstruyen")
+            return 0
+        with SessionLocal() as db:
+            rows = sum(refresh_aggregates(db).values())
+        # Solo tras reconstruir: si falla, la etapa queda fallida y se reintenta la próxima vez
+        set_state("aggregates.sources", sources)
+        return rows
+    return refresh
+
+def build_stages(incremental=True, limit_files=0):
+    """
+    Etapas del pipeline. Las tres fuentes no comparten nada hasta la carga,
+    así que extracción y transformación corren en paralelo; las cargas y la
+    reconstrucción de cubos escriben en la base y van de a una.
+
+    Una fuente cuyos archivos no cambiaron desde la última carga (misma
+    huella en etl_state) no se transforma ni se recarga; `incremental=False`
+    fuerza la recarga de todo.
+    """
+    force = not incremental
+
+    def production_transform(inputs):
+        raw = inputs["production.extract"]
+        if _unchanged("production", raw, force):
+            return pd.DataFrame()
+        return production.transform_production(raw)
+
+    def royalties_extract(_inputs):
+        since = royalties.royalties_since(incremental)
+        df = royalties.extract_royalties_concurrent(since=since)
+        df.attrs["since"] = since
+        return df
+
+    def royalties_load(inputs):
+        raw = inputs["royalties.extract"]
+        data = inputs["royalties.transform"]
+        if data.empty:
+            print("   ⚠️ royalties: sin cambios" if raw.attrs.get("since") else "   ⚠️ royalties: sin datos")
+            return 0
+        return royalties.publish_royalties(raw, data, raw.attrs.get("since"))
+
+    loads = ("royalties.load", "production.load", "demand.load")
+    return [
+        Stage("royalties.extract", royalties_extract),
+        Stage("royalties.transform", lambda i: royalties.transform_royalties(i["royalties.extract"]),
+              deps=["royalties.extract"]),
+        Stage("royalties.load", royalties_load,
+              deps=["royalties.extract", "royalties.transform"], writes=True),
+
+        Stage("production.extract", lambda i: production.extract_production(limit_files=limit_files)),
+        Stage("production.transform", production_transform, deps=["production.extract"]),
+        Stage("production.load",
+              lambda i: _load_source("production", production.load_production,
+                                     i["production.extract"], i["production.transform"], force),
+              deps=["production.extract", "production.transform"], writes=True),
+
+        # extract_demand ya entrega el frame transformado (process_sheet por hoja)
+        Stage("demand.extract", lambda i: demand.extract_demand()),
+        Stage("demand.load",
+              lambda i: _load_source("demand", demand.load_demand, i["demand.extract"], i["demand.extract"], force),
+              deps=["demand.extract"], writes=True),
+
+        # Cubos agregados para los dashboards: cualquier carga los arrastra y
+        # corren siempre después de las cargas
+        Stage("aggregates.refresh", _refresh_cubes(force), after=loads, triggered_by=loads, writes=True),
+    ]
+
+def _prerender_reports(generation):
+    """
+    Deja renderizados los informes ejecutivos de la nueva generación (uno por
+    año) para que la API los sirva como archivos estáticos.
+    """
+    try:
+        from report_store import ReportStore, render_all
+        store = ReportStore()
+        with SessionLocal() as db:
+            rendered = render_all(db, generation, store)
+        # Se conserva la generación anterior: puede haber descargas en curso
+        store.prune(keep=(generation, generation - 1))
+        print(f"   📄 Informes ejecutivos pre-renderizados: {len(rendered)}")
+    except Exception as e:
+        # La API los renderiza a demanda si esto falla (p. ej. sin reportlab)
+        print(f"   ⚠️ No se pudieron pre-renderizar los informes: {e}")
+
+def publish_generation(bind=None, refresh=False):
+    """
+    Publica una nueva generación de datos: invalida la caché de la API y
+    deja los informes pre-renderizados. Con `refresh` reconstruye antes los
+    cubos (cargas hechas fuera del DAG, donde no hay etapa de cubos).
+    """
+    if refresh:
+        with Session(bind=bind or engine) as db:
+            refresh_aggregates(db)
+    generation = bump_generation(bind=bind)
+    print(f"   🔄 Generación de datos: {generation}")
+    if bind is None:
+        _prerender_reports(generation)
+    return generation
+
+def run_pipeline(stages=None, skip=(), incremental=True, limit_files=0, workers=4, report_path=REPORT_PATH):
+    """
+    Ejecuta el pipeline (o las etapas que coinciden con `stages`, más sus
+    dependencias) y deja el reporte de la ejecución en `report_path`.
+    """
     print("Starting ETL Pipeline...")
     start_time = time.time()
-    
+
     try:
-        # 1. Royalties
-        run_royalties_etl()
-        
-        # 2. Production
-        # Run with default limit (10 files) or 0 for all
-        run_production_etl_multi(limit_files=0) 
-        
-        # 3. Demand
-        run_demand_etl()
-        
+        Base.metadata.create_all(bind=engine)
+        ensure_cube_schema(engine)
+        selected = select_stages(build_stages(incremental, limit_files), stages, skip)
+        report = run_dag(selected, workers=workers, report_path=report_path)
+
+        # Nueva generación de datos si alguna etapa escribió: invalida la caché de la API
+        by_name = {stage.name: stage for stage in selected}
+        if any(by_name[e["name"]].writes and e["status"] == "ok" and e.get("rows")
+               for e in report["stages"]):
+            publish_generation()
+
         end_time = time.time()
         print(f"\nETL Pipeline completed in {end_time - start_time:.2f} seconds.")
-        
+        return report
+
     except Exception:
         print("❌ Error in pipeline execution")
         traceback.print_exc()
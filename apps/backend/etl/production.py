@@ -2,17 +2,23 @@
 ETL de Producción MEJORADO - Procesa los 50 archivos Excel encontrados
 """
 import pandas as pd
+import numpy as np
 import requests
 from bs4 import BeautifulSoup
-from sqlalchemy.orm import Session
 from models import Production
-from database import SessionLocal
+from etl.downloads import CACHE_DIR, ParsedCache, digest_of, fetch_all, fingerprint
+from etl.bulk import bulk_load
+from concurrent.futures import ProcessPoolExecutor
 import datetime
-import io
+import multiprocessing
+import os
 import re
 
 MINENERGIA_URL = "https://www.minenergia.gov.co/es/misional/hidrocarburos/funcionamiento-del-sector/gas-natural/"
 BASE_URL = "https://www.minenergia.gov.co"
+PARSE_WORKERS = int(os.getenv("SIMGN_PARSE_WORKERS", os.cpu_count() or 1))
+# Subir al cambiar el parseo: invalida los resultados guardados en la caché
+PARSER_VERSION = 1
 
 def extract_all_production_urls():
     """
@@ -60,116 +66,144 @@ def extract_all_production_urls():
     
     return files_list
 
+MONTH_ABBR = {
+    'ene': 1, 'feb': 2, 'mar': 3, 'abr': 4,
+    'may': 5, 'jun': 6, 'jul': 7, 'ago': 8,
+    'sep': 9, 'oct': 10, 'nov': 11, 'dic': 12
+}
+YEAR_RE = re.compile(r'20\d{2}')
+PRODUCTION_COLUMNS = ['campo', 'operadora', 'anio', 'mes', 'produccion_mensual']
+
+def find_year_row(df):
+    """Primera fila (de las 15 primeras) que contiene 'año', o None"""
+    head = df.iloc[:15].to_numpy().ravel()
+    has_year = pd.Series(head).map(str).str.lower().str.contains('año', regex=False)
+    matches = has_year.to_numpy().reshape(-1, df.shape[1]).any(axis=1).nonzero()[0]
+    return int(matches[0]) if len(matches) else None
+
+def header_column_map(year_row, month_row):
+    """
+    Mapea cada columna de datos a (año, mes) a partir de las dos filas de
+    encabezado. El año se arrastra hacia la derecha hasta el siguiente año.
+    """
+    col_to_year_month = {}
+    current_year = None
+    
+    for col_idx, (year_val, month_val) in enumerate(zip(year_row.tolist(), month_row.tolist())):
+        year_match = YEAR_RE.search(str(year_val))
+        if year_match:
+            current_year = int(year_match.group())
+        
+        month_val = str(month_val).lower()
+        month = next((num for abbr, num in MONTH_ABBR.items() if abbr in month_val), None)
+        
+        if current_year and month:
+            col_to_year_month[col_idx] = (current_year, month)
+    
+    return col_to_year_month
+
+def parse_production_sheet(df, campo):
+    """
+    Convierte una hoja pivoteada (operadoras x meses) a formato largo en una
+    sola pasada vectorizada. Devuelve un DataFrame con PRODUCTION_COLUMNS.
+    """
+    empty = pd.DataFrame(columns=PRODUCTION_COLUMNS)
+    
+    if df.shape[1] <= 2:
+        return empty
+    
+    year_row_idx = find_year_row(df)
+    if year_row_idx is None or year_row_idx + 1 >= len(df):
+        return empty
+    
+    month_row_idx = year_row_idx + 1
+    col_map = header_column_map(df.iloc[year_row_idx], df.iloc[month_row_idx])
+    if not col_map:
+        return empty
+    
+    data = df.iloc[month_row_idx + 1:]
+    operadora = data.iloc[:, 2].map(str).to_numpy()
+    
+    cols = list(col_map)
+    block = data.iloc[:, cols].to_numpy()
+    values = pd.to_numeric(pd.Series(block.ravel()), errors='coerce').to_numpy(dtype='float64', copy=True)
+    values = values.reshape(block.shape)
+    values[operadora == 'nan'] = np.nan
+    
+    # nonzero recorre fila por fila: mismo orden que el recorrido celda a celda
+    rows, positions = np.nonzero(values > 0)
+    years = np.array([col_map[c][0] for c in cols])
+    months = np.array([col_map[c][1] for c in cols])
+    
+    return pd.DataFrame({
+        'campo': campo,
+        'operadora': operadora[rows],
+        'anio': years[positions],
+        'mes': months[positions],
+        'produccion_mensual': values[rows, positions],
+    })
+
 def parse_production_excel_multi_sheet(file_buffer, limit_sheets=None):
     """
     Parser especializado para archivos Excel multi-hoja con formato pivoteado
     """
-    all_records = []
+    frames = []
     
     try:
         xl_file = pd.ExcelFile(file_buffer)
         sheets = xl_file.sheet_names[:limit_sheets] if limit_sheets else xl_file.sheet_names
         
+        # Una sola pasada: el libro se abre una vez y se leen todas las hojas
+        sheet_frames = xl_file.parse(sheet_name=sheets, header=None)
+        
         for sheet_name in sheets:
             try:
-                df = pd.read_excel(file_buffer, sheet_name=sheet_name, header=None)
                 # Usar nombre completo de la hoja para mejor matching con el diccionario
-                campo = sheet_name.strip()
-                
-                # Buscar fila de años
-                year_row_idx = None
-                for idx in range(min(15, len(df))):
-                    row_str = df.iloc[idx].astype(str)
-                    if any('año' in str(val).lower() for val in row_str):
-                        year_row_idx = idx
-                        break
-                
-                if year_row_idx is None:
-                    continue
-                
-                month_row_idx = year_row_idx + 1
-                year_row = df.iloc[year_row_idx]
-                month_row = df.iloc[month_row_idx]
-                
-                # Mapear columnas a año/mes
-                col_to_year_month = {}
-                current_year = None
-                
-                for col_idx in range(len(year_row)):
-                    year_val = str(year_row.iloc[col_idx])
-                    year_match = re.search(r'20\d{2}', year_val)
-                    if year_match:
-                        current_year = int(year_match.group())
-                    
-                    month_val = str(month_row.iloc[col_idx])
-                    month_map = {
-                        'ene': 1, 'feb': 2, 'mar': 3, 'abr': 4,
-                        'may': 5, 'jun': 6, 'jul': 7, 'ago': 8,
-                        'sep': 9, 'oct': 10, 'nov': 11, 'dic': 12
-                    }
-                    
-                    month = None
-                    for abbr, num in month_map.items():
-                        if abbr in month_val.lower():
-                            month = num
-                            break
-                    
-                    if current_year and month:
-                        col_to_year_month[col_idx] = (current_year, month)
-                
-                # Procesar datos
-                data_start_row = month_row_idx + 1
-                for row_idx in range(data_start_row, len(df)):
-                    row = df.iloc[row_idx]
-                    operadora = str(row.iloc[2]) if len(row) > 2 else None
-                    
-                    if not operadora or operadora == 'nan' or pd.isna(operadora):
-                        continue
-                    
-                    for col_idx, (year, month) in col_to_year_month.items():
-                        try:
-                            produccion = float(row.iloc[col_idx])
-                            if produccion > 0:
-                                all_records.append({
-                                    'campo': campo,
-                                    'operadora': operadora,
-                                    'anio': year,
-                                    'mes': month,
-                                    'produccion_mensual': produccion
-                                })
-                        except:
-                            continue
+                sheet_df = parse_production_sheet(sheet_frames[sheet_name], sheet_name.strip())
+                if not sheet_df.empty:
+                    frames.append(sheet_df)
             except:
                 continue
     except Exception as e:
         print(f"     ✗ Error: {str(e)[:50]}")
     
-    return pd.DataFrame(all_records) if all_records else pd.DataFrame()
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+def compact_frame(df):
+    """
+    Reduce el DataFrame a tipos compactos antes de devolverlo al proceso padre
+    (categorías para textos repetidos, enteros pequeños para año/mes)
+    """
+    if df.empty:
+        return df
+    return df.astype({
+        'campo': 'category',
+        'operadora': 'category',
+        'anio': 'int16',
+        'mes': 'int8',
+        'produccion_mensual': 'float64',
+    })
 
-def download_and_parse_excel(url):
+def parse_production_file(path):
     """
-    Descarga y parsea un archivo Excel con estructura multi-hoja
+    Parsea un archivo Excel ya descargado (ruta en la caché local).
+    Se ejecuta en un proceso del pool, por eso devuelve un resultado compacto.
+    Devuelve None si el parseo falla.
     """
     try:
-        print(f"  📥 {url.split('/')[-1][:70]}")
-        
-        response = requests.get(url, timeout=120)
-        response.raise_for_status()
-        
-        # Parsear con el nuevo parser
-        with io.BytesIO(response.content) as f:
+        with open(path, 'rb') as f:
             df = parse_production_excel_multi_sheet(f, limit_sheets=20)  # Limitar a 20 hojas por archivo
-        
-        print(f"     ✓ {len(df):,} registros")
-        return df
+        return compact_frame(df)
         
     except Exception as e:
-        print(f"     ✗ Error: {str(e)[:50]}")
-        return pd.DataFrame()
+        print(f"     ✗ Error en {os.path.basename(path)[:50]}: {str(e)[:50]}")
+        return None
 
-def extract_production(limit_files=10):
+def extract_production(limit_files=10, cache_dir=CACHE_DIR):
     """
-    Extrae datos de múltiples archivos Excel
+    Extrae datos de múltiples archivos Excel. Solo se parsean los archivos
+    cuyo contenido no está ya en la caché de resultados (ParsedCache); la
+    huella del conjunto queda en `df.attrs['fingerprint']`.
     
     Args:
         limit_files: Número máximo de archivos (0 = todos)
@@ -192,23 +226,54 @@ def extract_production(limit_files=10):
     else:
         print(f"📋 Procesando TODOS los {len(file_list)} archivos\n")
     
-    # Descargar y consolidar
-    all_dataframes = []
+    # Descargar en paralelo (reanuda desde la caché local si existe)
+    paths = fetch_all([f['url'] for f in file_list], cache_dir=cache_dir)
+    downloaded = [f for f in file_list if paths.get(f['url'])]
+    digests = {f['url']: digest_of(paths[f['url']]) for f in downloaded}
+    
+    # Los archivos sin cambios aportan el resultado ya parseado
+    parsed_cache = ParsedCache("production", PARSER_VERSION, cache_dir)
+    parsed = {digest: parsed_cache.get(digest) for digest in set(digests.values())}
+    pending = [digest for digest, df in parsed.items() if df is None]
+    paths_by_digest = {digests[f['url']]: paths[f['url']] for f in downloaded}
+    
+    # Parsear en paralelo: un archivo por proceso. Con "spawn" y no fork: esta
+    # función corre en un hilo del DAG y hacer fork de un proceso con hilos
+    # puede heredar candados tomados por los demás
+    print(f"\n⚙️  Parseando {len(pending)} archivos con {PARSE_WORKERS} procesos "
+          f"({len(parsed) - len(pending)} sin cambios, desde la caché)...")
+    if pending:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=context) as pool:
+            for digest, df in zip(pending, pool.map(parse_production_file, [paths_by_digest[d] for d in pending])):
+                parsed[digest] = df if df is not None else pd.DataFrame()
+                # Un fallo o un resultado vacío no se guarda: se reintenta en la próxima corrida
+                if df is not None and not df.empty:
+                    parsed_cache.put(digest, df)
+    incomplete = len(downloaded) < len(file_list) or any(df.empty for df in parsed.values())
     
-    for i, file_info in enumerate(file_list, 1):
-        print(f"[{i}/{len(file_list)}] Período {file_info['period']}:")
+    all_dataframes = []
+    for i, file_info in enumerate(downloaded, 1):
+        df = parsed[digests[file_info['url']]].copy()
+        print(f"[{i}/{len(downloaded)}] Período {file_info['period']}: {len(df):,} registros")
         
-        df = download_and_parse_excel(file_info['url'])
+        if df.empty:
+            continue
         
-        if not df.empty:
-            # Agregar metadata
-            df['source_period'] = file_info['period']
-            df['source_file'] = file_info['text']
-            all_dataframes.append(df)
+        # Agregar metadata
+        df['source_period'] = file_info['period']
+        df['source_file'] = file_info['text']
+        all_dataframes.append(df)
     
     # Consolidar
     if all_dataframes:
         combined_df = pd.concat(all_dataframes, ignore_index=True)
+        if incomplete:
+            # Sin huella: la próxima corrida no da por cargado este conjunto
+            print("   ⚠️ Hubo archivos sin descargar o sin datos: no se registra la huella")
+        else:
+            combined_df.attrs['fingerprint'] = fingerprint(
+                [f"{f['url']} {f['period']} {f['text']} {digests[f['url']]}" for f in downloaded], PARSER_VERSION)
         print(f"\n✅ CONSOLIDADO: {len(combined_df):,} registros de {len(all_dataframes)} archivos")
         return combined_df
     else:
@@ -241,40 +306,162 @@ def load_location_dictionary():
         print(f"⚠️ Error cargando diccionario: {e}")
         return {}
 
+NUMERIC_PREFIX_RE = re.compile(r'^\d+[-_\s]*')
+NON_WORD_RE = re.compile(r'[^\w\s]')
+
+def normalize_key(text):
+    """
+    Normaliza nombres de campo: minúsculas, sin prefijo numérico ("1-", "10-"),
+    sin caracteres especiales y con espacios simples
+    """
+    if not isinstance(text, str): return ""
+    text = NUMERIC_PREFIX_RE.sub('', text)
+    text = text.replace('-', ' ').replace('_', ' ')
+    text = NON_WORD_RE.sub('', text)
+    return " ".join(text.lower().split())
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class FieldResolver:
+    """
+    Resuelve nombre de campo -> {'departamento', 'municipio'} usando el
+    diccionario de ubicaciones. Se construye una sola vez y memoiza por valor
+    distinto de campo.
+    
+    Orden de búsqueda (el primero que coincide gana):
+    1. Exacta sobre el nombre del Excel
+    2. Normalizada
+    3. Parcial: clave contenida en el campo o campo contenido en la clave
+       (índice de trigramas + verificación, gana la primera clave del diccionario)
+    4. Primer token (solo tokens de más de 3 caracteres)
+    """
+    
+    def __init__(self, location_map):
+        self.location_map = location_map
+        self.normalized_map = {}
+        for key, val in location_map.items():
+            norm_key = normalize_key(key)
+            if norm_key:
+                self.normalized_map[norm_key] = val
+        
+        # Posición de cada clave normalizada: desempata igual que el recorrido lineal
+        self.keys = list(self.normalized_map)
+        self.key_trigrams = [trigrams(key) for key in self.keys]
+        self.trigram_index = {}
+        for pos, grams in enumerate(self.key_trigrams):
+            for gram in grams:
+                self.trigram_index.setdefault(gram, []).append(pos)
+        # Claves de menos de 3 caracteres no tienen trigramas: siempre candidatas
+        self.short_keys = [pos for pos, key in enumerate(self.keys) if len(key) < 3]
+        
+        self.token_index = {}
+        for pos, key in enumerate(self.keys):
+            self.token_index.setdefault(key.split()[0], pos)
+        
+        self.cache = {}
+        self.stats = {'exacta': 0, 'normalizada': 0, 'parcial': 0, 'token': 0, 'sin_match': 0}
+        self.lookups = 0
+    
+    def _substring_match(self, norm_campo):
+        """Primera clave (en orden del diccionario) que contiene o está contenida en norm_campo"""
+        if len(norm_campo) < 3:
+            # Campo muy corto: el índice no discrimina, verificar todas
+            candidates = range(len(self.keys))
+        else:
+            campo_grams = trigrams(norm_campo)
+            counts = {}
+            for gram in campo_grams:
+                for pos in self.trigram_index.get(gram, ()):
+                    counts[pos] = counts.get(pos, 0) + 1
+            # clave en campo: todos sus trigramas aparecen en el campo
+            # campo en clave: la clave tiene todos los trigramas del campo
+            candidates = sorted(
+                [pos for pos, n in counts.items()
+                 if n == len(self.key_trigrams[pos]) or n == len(campo_grams)]
+                + self.short_keys
+            )
+        for pos in candidates:
+            key = self.keys[pos]
+            if key in norm_campo or norm_campo in key:
+                return self.normalized_map[key]
+        return None
+    
+    def _token_match(self, norm_campo):
+        tokens = norm_campo.split()
+        if tokens and len(tokens[0]) > 3:
+            pos = self.token_index.get(tokens[0])
+            if pos is not None:
+                return self.normalized_map[self.keys[pos]]
+        return None
+    
+    def _resolve(self, campo_raw):
+        loc_info = self.location_map.get(campo_raw.strip())
+        if loc_info:
+            return loc_info, 'exacta'
+        norm_campo = normalize_key(campo_raw)
+        loc_info = self.normalized_map.get(norm_campo)
+        if loc_info:
+            return loc_info, 'normalizada'
+        loc_info = self._substring_match(norm_campo)
+        if loc_info:
+            return loc_info, 'parcial'
+        loc_info = self._token_match(norm_campo)
+        if loc_info:
+            return loc_info, 'token'
+        return None, 'sin_match'
+    
+    def resolve(self, campo_raw):
+        """Ubicación para campo_raw, o None si no hay coincidencia"""
+        self.lookups += 1
+        return self._cached(campo_raw)
+    
+    def resolve_all(self, campos):
+        """{campo: ubicación o None} para cada valor distinto de la serie `campos`"""
+        self.lookups += len(campos)
+        return {campo_raw: self._cached(campo_raw) for campo_raw in campos.unique()}
+    
+    def _cached(self, campo_raw):
+        if campo_raw not in self.cache:
+            loc_info, strategy = self._resolve(campo_raw)
+            self.cache[campo_raw] = loc_info
+            self.stats[strategy] += 1
+        return self.cache[campo_raw]
+    
+    def report(self):
+        """Resumen de aciertos por estrategia (sobre valores distintos de campo)"""
+        detail = ", ".join(f"{name}: {count}" for name, count in self.stats.items())
+        return (f"{len(self.cache)} campos distintos en {self.lookups:,} filas ({detail})")
+
+def first_column(df, names, default):
+    """Primera columna de `names` presente en df, o una constante `default`"""
+    for name in names:
+        if name in df.columns:
+            return df[name]
+    return pd.Series(default, index=df.index)
+
+def as_text(series):
+    """str() de cada valor, nulos incluidos ('nan'), como en el recorrido por filas"""
+    return series.astype(object).map(str)
+
 def transform_production(df: pd.DataFrame):
     """
-    Transforma los datos con mapeo robusto de columnas
+    Transforma los datos con mapeo robusto de columnas. Trabaja por columnas
+    (como transform_royalties): cada valor distinto de campo se resuelve una
+    sola vez y el resultado se mapea sobre el frame.
     """
     print(f"\n🔄 Transformando {len(df):,} registros...")
     
     if df.empty:
-        return []
+        return pd.DataFrame()
     
     # Cargar diccionario
     location_map = load_location_dictionary()
     
-    # Pre-procesar claves del diccionario para búsqueda normalizada
-    # Normalizamos: minúsculas, sin espacios extra, sin caracteres especiales
-    def normalize_key(text):
-        if not isinstance(text, str): return ""
-        # Eliminar prefijos numéricos (ej: "1-", "10-")
-        text = re.sub(r'^\d+[-_\s]*', '', text)
-        # Reemplazar guiones y guiones bajos por espacios
-        text = text.replace('-', ' ').replace('_', ' ')
-        # Eliminar caracteres no alfanuméricos (excepto espacios)
-        text = re.sub(r'[^\w\s]', '', text)
-        # Normalizar espacios y minúsculas
-        return " ".join(text.lower().split())
-
-    normalized_map = {}
+    # Índices de búsqueda construidos una vez; memoiza por valor de campo
+    resolver = FieldResolver(location_map)
     if location_map:
-        for key, val in location_map.items():
-            norm_key = normalize_key(key)
-            if norm_key:
-                normalized_map[norm_key] = val
-        print(f"   🔑 Diccionario normalizado: {len(normalized_map)} entradas")
-
-    transformed_data = []
+        print(f"   🔑 Diccionario normalizado: {len(resolver.normalized_map)} entradas")
     
     # Normalizar columnas
     df.columns = [str(c).strip().lower().replace(' ', '_').replace('ó', 'o').replace('ñ', 'n') 
@@ -282,145 +469,67 @@ def transform_production(df: pd.DataFrame):
     
     print(f"   Columnas: {df.columns.tolist()[:8]}...")
     
-    matches_found = 0
+    # Mapeo flexible: gana el primer nombre de columna presente
+    campo = as_text(first_column(df, ('campo', 'field', 'nombre_campo', 'nombre'), 'Unknown'))
+    operadora = as_text(first_column(df, ('operadora', 'operador', 'operator', 'empresa'), 'Unknown'))
+    anio = pd.to_numeric(first_column(df, ('ano', 'anio', 'year', 'a_o'), datetime.datetime.now().year),
+                         errors='coerce')
+    mes = pd.to_numeric(first_column(df, ('mes', 'month'), 1), errors='coerce')
+    produccion = pd.to_numeric(first_column(df, ('produccion', 'produccion_mensual', 'production', 'prod'), 0),
+                               errors='coerce').astype('float64')
     
-    for _, row in df.iterrows():
-        try:
-            # Mapeo flexible
-            campo_raw = str(row.get('campo', row.get('field', row.get('nombre_campo', 
-                                row.get('nombre', 'Unknown')))))
-            
-            # Intentar matching robusto
-            # 1. Búsqueda exacta
-            loc_info = location_map.get(campo_raw.strip())
-            
-            # 2. Búsqueda normalizada
-            norm_campo = normalize_key(campo_raw)
-            if not loc_info:
-                loc_info = normalized_map.get(norm_campo)
-            
-            # 3. Búsqueda parcial (substring)
-            if not loc_info:
-                for map_key, val in normalized_map.items():
-                    if map_key in norm_campo or norm_campo in map_key:
-                        loc_info = val
-                        break
-            
-            # 4. Búsqueda por tokens (primer token coincide)
-            # Ej: "apiay libertad" vs "apiay apiay" -> coinciden en "apiay"
-            if not loc_info:
-                campo_tokens = norm_campo.split()
-                if campo_tokens:
-                    first_token = campo_tokens[0]
-                    # Solo confiar si el token tiene longitud razonable (>3 chars) para evitar falsos positivos con "el", "la", etc.
-                    if len(first_token) > 3:
-                        for map_key, val in normalized_map.items():
-                            map_tokens = map_key.split()
-                            if map_tokens and map_tokens[0] == first_token:
-                                loc_info = val
-                                break
-            
-            if loc_info:
-                matches_found += 1
-                departamento = loc_info['departamento']
-                municipio = loc_info['municipio']
-            else:
-                # Fallback a lo que venga en el excel
-                departamento = str(row.get('departamento', row.get('department', 
-                                          row.get('depto', ''))))
-                municipio = str(row.get('municipio', row.get('municipality', 
-                                       row.get('mpio', ''))))
-            
-            operadora = str(row.get('operadora', row.get('operador', row.get('operator', 
-                                   row.get('empresa', 'Unknown')))))
-            
-            # Año y mes - intentar múltiples nombres
-            anio = int(row.get('ano', row.get('anio', row.get('year', 
-                              row.get('a_o', datetime.datetime.now().year)))))
-            
-            mes = int(row.get('mes', row.get('month', 1)))
-            
-            # Producción - intentar múltiples nombres
-            produccion = float(row.get('produccion', 
-                                      row.get('produccion_mensual',
-                                             row.get('production',
-                                                    row.get('prod', 0)))))
-            
-            # Solo agregar si tiene datos válidos
-            if produccion > 0 and campo_raw != 'Unknown':
-                item = Production(
-                    campo=campo_raw[:100],  # Limitar longitud
-                    operadora=operadora[:100],
-                    departamento=departamento[:100],
-                    municipio=municipio[:100],
-                    anio=anio,
-                    mes=mes,
-                    produccion_mensual=produccion,
-                    fecha_carga=datetime.datetime.utcnow()
-                )
-                transformed_data.append(item)
-            
-        except Exception as e:
-            # Silenciar errores individuales
-            continue
+    # Ubicación desde el diccionario; si no hay coincidencia, lo que venga en el excel
+    locations = {name: info for name, info in resolver.resolve_all(campo).items() if info}
+    matched = campo.isin(list(locations))
+    departamento = campo.map({name: info['departamento'] for name, info in locations.items()}).where(
+        matched, as_text(first_column(df, ('departamento', 'department', 'depto'), '')))
+    municipio = campo.map({name: info['municipio'] for name, info in locations.items()}).where(
+        matched, as_text(first_column(df, ('municipio', 'municipality', 'mpio'), '')))
+    
+    # Solo filas con datos válidos
+    valid = (produccion > 0) & (campo != 'Unknown') & anio.notna() & mes.notna()
+    result = pd.DataFrame({
+        'campo': campo.str[:100],  # Limitar longitud
+        'operadora': operadora.str[:100],
+        'departamento': departamento.str[:100],
+        'municipio': municipio.str[:100],
+        'anio': anio,
+        'mes': mes,
+        'produccion_mensual': produccion,
+    })[valid].astype({'anio': 'int64', 'mes': 'int64'}).reset_index(drop=True)
     
-    print(f"   ✓ {len(transformed_data):,} registros válidos")
-    print(f"   ✓ {matches_found:,} coincidencias con diccionario encontradas")
-    return transformed_data
+    print(f"   ✓ {len(result):,} registros válidos")
+    print(f"   ✓ {int(matched.sum()):,} coincidencias con diccionario encontradas")
+    print(f"   🔎 Resolver: {resolver.report()}")
+    return result
 
-def load_production(data: list, db: Session):
+def load_production(data: pd.DataFrame):
     """
-    Carga datos con truncate
+    Reemplaza la tabla de producción con carga masiva (ver etl/bulk.py)
     """
     print(f"\n💾 Cargando {len(data):,} registros...")
     try:
-        deleted = db.query(Production).delete()
-        print(f"   🗑️  Eliminados {deleted} registros antiguos")
-        
-        db.add_all(data)
-        db.commit()
-        print("   ✅ Cargados exitosamente")
+        inserted = bulk_load(Production, data)
+        print(f"   ✅ Cargados exitosamente ({inserted:,} filas)")
+        return inserted
     except Exception as e:
         print(f"   ❌ Error: {e}")
-        db.rollback()
+        return None
 
 def run_production_etl_multi(limit_files=10):
     """
-    ETL principal con soporte para múltiples archivos
+    ETL de producción fuera del pipeline completo: corre sus etapas del DAG
+    (recarga forzada), con lo que también se reconstruyen los cubos y se
+    publica una nueva generación de datos.
     
     Args:
         limit_files: Archivos a procesar (10 por defecto, 0 = todos)
     """
+    from etl.pipeline import run_pipeline
     print("\n" + "="*70)
     print("  🚀 ETL DE PRODUCCIÓN - MÚLTIPLES ARCHIVOS")
     print("="*70)
-    
-    try:
-        # Extract
-        df = extract_production(limit_files=limit_files)
-        
-        if not df.empty:
-            # Transform
-            data = transform_production(df)
-            
-            if data:
-                # Load
-                db = SessionLocal()
-                load_production(data, db)
-                db.close()
-                
-                print(f"\n{'='*70}")
-                print(f"  ✅ ETL COMPLETADO: {len(data):,} registros en base de datos")
-                print(f"{'='*70}")
-            else:
-                print("\n⚠️ No hay datos válidos después de transformación")
-        else:
-            print("\n⚠️ No se extrajeron datos")
-            
-    except Exception as e:
-        print(f"\n❌ Error en ETL: {e}")
-        import traceback
-        traceback.print_exc()
+    return run_pipeline(stages=["production"], incremental=False, limit_files=limit_files)
 
 if __name__ == "__main__":
     # Procesar 10 archivos por defecto
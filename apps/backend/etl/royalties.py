@@ -1,26 +1,58 @@
+import asyncio
+import json
+import time
+
+import httpx
 import pandas as pd
+import pyarrow as pa
 import requests
-from sqlalchemy.orm import Session
 from models import Royalty
-from database import SessionLocal
-import datetime
+from etl.bulk import bulk_load, bulk_upsert
+from etl.state import get_state, set_state
 
 SOCRATA_URL = "https://www.datos.gov.co/resource/j7js-yk74.json"
+PAGE_SIZE = 5000
+CONCURRENCY = 6
+PAGE_RETRIES = 3
+
+# Marca de agua de la sincronización incremental (campo de sistema de Socrata)
+UPDATED_AT = ":updated_at"
+STATE_KEY = "royalties.updated_at"
+
+# Clave natural de una liquidación. Incluye municipio: un mismo campo y
+# contrato liquida por separado en cada municipio donde produce.
+NATURAL_KEY = ("contrato", "campo", "municipio", "anio", "mes", "tipo_hidrocarburo")
+
+def soql_params(since=None):
+    """
+    Parámetros SoQL comunes: columnas de sistema incluidas y orden estable
+    (necesario para paginar con $offset sin saltos ni repetidos).
+    """
+    params = {"$select": ":*, *", "$order": f"{UPDATED_AT}, :id"}
+    if since:
+        # >= y no >: las filas con la misma marca que la última vista se
+        # vuelven a pedir (el upsert es idempotente) y ninguna queda fuera
+        params["$where"] = f"{UPDATED_AT} >= '{since}'"
+    return params
 
-def extract_royalties():
+def extract_royalties(url=SOCRATA_URL, since=None):
     """
-    Extrae TODOS los registros de regalías usando paginación.
+    Extrae los registros de regalías usando paginación.
+    Con `since` solo pide las filas creadas o modificadas desde esa marca.
     """
-    print("🔍 Iniciando extracción completa de Regalías...")
+    if since:
+        print(f"🔍 Sincronización incremental de Regalías desde {since}...")
+    else:
+        print("🔍 Iniciando extracción completa de Regalías...")
     all_data = []
-    limit = 5000
+    limit = PAGE_SIZE
     offset = 0
     
     try:
         while True:
             print(f"   📥 Descargando lote: offset={offset}, limit={limit}...")
-            url = f"{SOCRATA_URL}?$limit={limit}&$offset={offset}"
-            response = requests.get(url, timeout=30)
+            params = {**soql_params(since), "$limit": limit, "$offset": offset}
+            response = requests.get(url, params=params, timeout=30)
             response.raise_for_status()
             
             data = response.json()
@@ -45,65 +77,254 @@ def extract_royalties():
         print(f"   ❌ Error extrayendo regalías: {e}")
         return pd.DataFrame(all_data) if all_data else pd.DataFrame()
 
+class ColumnBuffers:
+    """
+    Acumula páginas de Socrata como columnas Arrow (string) en vez de una
+    lista creciente de dicts. Cada página se convierte al llegar; el orden
+    final lo da el offset de la página, no el orden de llegada.
+    """
+
+    def __init__(self):
+        self.pages = {}  # offset -> (filas, {columna: pa.Array})
+        self.columns = {}  # columnas en orden de aparición
+
+    @staticmethod
+    def _text(value):
+        if value is None or isinstance(value, str):
+            return value
+        return json.dumps(value) if isinstance(value, (dict, list)) else str(value)
+
+    def add_page(self, offset, rows):
+        names = {}
+        for row in rows:
+            for name in row:
+                names.setdefault(name, None)
+        self.columns.update(names)
+        arrays = {
+            name: pa.array([self._text(row.get(name)) for row in rows], type=pa.string())
+            for name in names
+        }
+        self.pages[offset] = (len(rows), arrays)
+
+    def to_frame(self):
+        ordered = [self.pages[offset] for offset in sorted(self.pages)]
+        columns = {
+            name: pa.chunked_array(
+                [arrays.get(name, pa.nulls(n, type=pa.string())) for n, arrays in ordered],
+                type=pa.string(),
+            )
+            for name in self.columns
+        }
+        return pa.table(columns).to_pandas() if columns else pd.DataFrame()
+
+async def _fetch_json(client, url, params):
+    for attempt in range(PAGE_RETRIES):
+        try:
+            response = await client.get(url, params=params)
+            response.raise_for_status()
+            return response.json()
+        except (httpx.TransportError, httpx.HTTPStatusError):
+            if attempt == PAGE_RETRIES - 1:
+                raise
+            await asyncio.sleep(2 ** attempt)
+
+async def _extract_concurrent(url, since, concurrency, page_size):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        where = soql_params(since).get("$where")
+        count_params = {"$select": "count(*) AS n", **({"$where": where} if where else {})}
+        total = int((await _fetch_json(client, url, count_params))[0]["n"])
+        print(f"   📊 {total:,} registros en {-(-total // page_size)} páginas")
+
+        buffers = ColumnBuffers()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch_window(offset):
+            async with semaphore:
+                params = {**soql_params(since), "$limit": page_size, "$offset": offset}
+                rows = await _fetch_json(client, url, params)
+            buffers.add_page(offset, rows)
+
+        await asyncio.gather(*(fetch_window(offset) for offset in range(0, total, page_size)))
+        return buffers.to_frame()
+
+def extract_royalties_concurrent(url=SOCRATA_URL, since=None, concurrency=CONCURRENCY, page_size=None):
+    """
+    Igual que extract_royalties pero pide las páginas en paralelo: primero el
+    total de filas y luego todas las ventanas de $offset, con un máximo de
+    `concurrency` peticiones en vuelo sobre un cliente HTTP con pool.
+    Si una página falla tras los reintentos no devuelve nada: cargar una
+    extracción con huecos sería peor que no cargar.
+    """
+    print(f"🔍 Extracción concurrente de Regalías ({concurrency} conexiones)"
+          + (f" desde {since}" if since else "") + "...")
+    start = time.perf_counter()
+    try:
+        df = asyncio.run(_extract_concurrent(url, since, concurrency, page_size or PAGE_SIZE))
+    except Exception as e:
+        print(f"   ❌ Error extrayendo regalías: {e}")
+        return pd.DataFrame()
+    print(f"   🎉 Extracción finalizada: {len(df):,} registros en {time.perf_counter() - start:.1f}s")
+    return df
+
+def high_water_mark(df: pd.DataFrame):
+    """Mayor :updated_at recibido (formato SoQL, sin la Z final), o None"""
+    if UPDATED_AT not in df.columns:
+        return None
+    marks = df[UPDATED_AT].dropna()
+    return str(marks.max()).rstrip("Z") if not marks.empty else None
+
+# Royalty column <- Socrata column
+TEXT_FIELDS = {
+    "departamento": "departamento",
+    "municipio": "municipio",
+    "campo": "campo",
+    "contrato": "contrato",
+    "tipo_prod": "tipoprod",
+    "tipo_hidrocarburo": "tipohidrocarburo",
+    "regimen": "regimenreg",
+}
+INT_FIELDS = {"anio": "a_o", "mes": "mes"}
+FLOAT_FIELDS = {
+    "volumen_regalia": "volumenregaliablskpc",
+    "trm_promedio": "trmpromedio",
+    "prod_gravable": "prodgravableblskpc",
+    "precio_usd": "preciohidrocarburousd",
+    "porc_regalia": "porcregalia",
+    "valor_liquidado": "regaliascop",
+}
+# Optional coordinates: missing or empty -> NULL
+NULLABLE_FLOAT_FIELDS = {"longitud": "longitud", "latitud": "latitud"}
+
+def parse_decimal(series: pd.Series):
+    """
+    Decimal-comma normalization over a whole column ("1234,5" -> 1234.5).
+    Returns (float64 values, mask of present values that failed to parse).
+    """
+    text = series.astype("string").str.strip()
+    values = pd.to_numeric(text.str.replace(",", ".", regex=False), errors="coerce").astype("float64")
+    present = text.notna() & (text != "")
+    return values, present & values.isna()
+
 def transform_royalties(df: pd.DataFrame):
+    """
+    Column-wise transform of the raw Socrata frame into a typed frame with
+    the Royalty columns, ready for etl.bulk. Rows with a value that cannot
+    be parsed are dropped and counted per column.
+    """
     print("Transforming Royalties data...")
     if df.empty:
-        return []
+        return pd.DataFrame()
     
-    transformed_data = []
-    for _, row in df.iterrows():
-        try:
-            # Map fields based on Socrata column names (usually lowercase)
-            # Adjust column names based on actual API response if needed
-            item = Royalty(
-                departamento=row.get("departamento"),
-                municipio=row.get("municipio"),
-                campo=row.get("campo"),
-                contrato=row.get("contrato"),
-                anio=int(row.get("a_o")) if row.get("a_o") else None,
-                mes=int(row.get("mes")) if row.get("mes") else None,
-                
-                volumen_regalia=float(str(row.get("volumenregaliablskpc", 0)).replace(',', '.')),
-                trm_promedio=float(str(row.get("trmpromedio", 0)).replace(',', '.')),
-                tipo_prod=row.get("tipoprod"),
-                tipo_hidrocarburo=row.get("tipohidrocarburo"),
-                regimen=row.get("regimenreg"),
-                prod_gravable=float(str(row.get("prodgravableblskpc", 0)).replace(',', '.')),
-                precio_usd=float(str(row.get("preciohidrocarburousd", 0)).replace(',', '.')),
-                porc_regalia=float(str(row.get("porcregalia", 0)).replace(',', '.')),
-                
-                longitud=float(str(row.get("longitud", 0)).replace(',', '.')) if row.get("longitud") else None,
-                latitud=float(str(row.get("latitud", 0)).replace(',', '.')) if row.get("latitud") else None,
-                
-                valor_liquidado=float(str(row.get("regaliascop", 0)).replace(',', '.')),
-                fecha_carga=datetime.datetime.utcnow()
-            )
-            transformed_data.append(item)
-        except Exception as e:
-            print(f"Error transforming row: {e}")
+    n = len(df)
+    missing = pd.Series(pd.NA, index=df.index, dtype="string")
+    column = lambda name: df[name] if name in df.columns else missing
+    out = pd.DataFrame(index=df.index)
+    rejected = {}
+    
+    for target, source in TEXT_FIELDS.items():
+        out[target] = column(source)
+    
+    for target, source in INT_FIELDS.items():
+        raw = column(source)
+        values, invalid = parse_decimal(raw)
+        # A missing year/month is an error; an empty one is stored as NULL
+        invalid |= raw.isna() & (source in df.columns)
+        invalid |= values.notna() & (values % 1 != 0)
+        out[target] = values.where(~invalid).astype("Int32")
+        rejected[target] = invalid
+    
+    for target, source in FLOAT_FIELDS.items():
+        if source not in df.columns:
+            out[target] = 0.0
             continue
-    return transformed_data
+        out[target], rejected[target] = parse_decimal(df[source])
+    
+    for target, source in NULLABLE_FLOAT_FIELDS.items():
+        out[target], rejected[target] = parse_decimal(column(source))
+    
+    bad = pd.Series(False, index=df.index)
+    for mask in rejected.values():
+        bad |= mask
+    if bad.any():
+        reasons = ", ".join(f"{name}: {int(mask.sum())}" for name, mask in rejected.items() if mask.any())
+        print(f"   ⚠️ {int(bad.sum()):,} of {n:,} rows rejected ({reasons})")
+    
+    return out[~bad].reset_index(drop=True)
 
-def load_royalties(data: list, db: Session):
+def load_royalties(data: pd.DataFrame, bind=None):
+    """Full reload. Returns rows loaded, or None on error."""
     print(f"Loading {len(data)} Royalties records...")
     try:
-        # Optional: Clear existing data or handle duplicates
-        db.query(Royalty).delete()
-        
-        db.add_all(data)
-        db.commit()
+        # Replaces existing data in one transaction (see etl/bulk.py)
+        loaded = bulk_load(Royalty, data, bind=bind)
         print("Royalties loaded successfully.")
+        return loaded
     except Exception as e:
         print(f"Error loading royalties: {e}")
-        db.rollback()
+        return None
+
+def upsert_royalties(data: pd.DataFrame, bind=None):
+    """Upsert by natural key. Returns rows actually written (changed + new), or None on error."""
+    print(f"Upserting {len(data)} Royalties records...")
+    try:
+        replaced, written = bulk_upsert(Royalty, data, NATURAL_KEY, bind=bind)
+        print(f"Royalties upserted: {replaced} updated, {written - replaced} new, "
+              f"{len(data) - written} unchanged.")
+        return written
+    except Exception as e:
+        print(f"Error upserting royalties: {e}")
+        return None
+
+def royalties_since(incremental, bind=None):
+    """High-water mark to sync from, or None for a full reload."""
+    since = get_state(STATE_KEY, bind=bind) if incremental else None
+    if incremental and not since:
+        print("   ⚠️ No high-water mark yet, running a full reload")
+    return since
+
+def publish_royalties(raw: pd.DataFrame, data: pd.DataFrame, since=None, bind=None):
+    """
+    Loads `data` (upsert when syncing from `since`, full reload otherwise)
+    and advances the high-water mark from the raw extract. Returns rows
+    written: 0 when a sync only brought back rows already stored (the rows
+    at the mark are always fetched again), so no new generation is published.
+    """
+    loaded = upsert_royalties(data, bind) if since else load_royalties(data, bind)
+    if loaded is None:
+        raise RuntimeError("royalties load failed")
+    mark = high_water_mark(raw)
+    if mark:
+        set_state(STATE_KEY, mark, bind=bind)
+    return loaded
 
-def run_royalties_etl():
-    df = extract_royalties()
-    if not df.empty:
-        data = transform_royalties(df)
-        db = SessionLocal()
-        load_royalties(data, db)
-        db.close()
+def run_royalties_etl(incremental=False, url=SOCRATA_URL, bind=None):
+    """
+    Full reload by default. With incremental=True only rows changed since the
+    stored high-water mark are fetched and upserted; without a mark (first
+    run) it falls back to a full reload. When rows were written the cubes
+    are rebuilt and a new dataset generation is published, as the pipeline
+    does. Returns rows written.
+    """
+    from etl.pipeline import publish_generation
+    since = royalties_since(incremental, bind)
+    df = extract_royalties_concurrent(url, since=since)
+    if df.empty:
+        print("Royalties already up to date." if since else "No royalties extracted.")
+        return 0
+
+    data = transform_royalties(df)
+    try:
+        written = publish_royalties(df, data, since, bind)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        return 0
+    if written:
+        publish_generation(bind, refresh=True)
+    return written
 
 if __name__ == "__main__":
-    run_royalties_etl()
+    import sys
+    from etl.pipeline import run_pipeline
+    # Through the DAG: cube refresh and generation bump included
+    run_pipeline(stages=["royalties"], incremental="--incremental" in sys.argv)
@@ -0,0 +1,153 @@
+"""
+Generaciones de tablas para recargas sin cortes.
+
+Cada recarga completa escribe en `<tabla>__staging`, crea ahí los índices y
+luego la intercambia con la tabla viva mediante dos RENAME en una transacción
+corta. La generación anterior queda como `<tabla>__previous` hasta la próxima
+recarga, de modo que se puede volver atrás con `rollback_generation`.
+
+SQLite no permite renombrar índices y sus nombres son globales, así que cada
+generación usa uno de dos "slots" de nombre: el del modelo (`ix_...`) o el
+mismo con sufijo `__b`. La tabla viva puede tener cualquiera de los dos.
+
+Las funciones reciben un cursor DBAPI (sqlite3): el módulo sqlite3 no abre
+transacción antes de un DDL, así que el intercambio se hace con un
+BEGIN IMMEDIATE explícito.
+
+Uso:
+    python -m etl.staging rollback production
+"""
+import sys
+
+from sqlalchemy import MetaData
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.schema import CreateTable
+
+STAGING_SUFFIX = "__staging"
+PREVIOUS_SUFFIX = "__previous"
+SLOT_SUFFIX = "__b"
+# Claves de etl_state que describen lo cargado en cada tabla (huella o marca de agua)
+STATE_KEYS = {
+    "royalties": ("royalties.updated_at",),
+    "production": ("production.fingerprint",),
+    "demand": ("demand.fingerprint",),
+}
+
+def staging_name(table):
+    return table.name + STAGING_SUFFIX
+
+def previous_name(table):
+    return table.name + PREVIOUS_SUFFIX
+
+def table_exists(cursor, name):
+    return cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone() is not None
+
+def index_names(cursor, table_name):
+    rows = cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?", (table_name,)
+    )
+    return {row[0] for row in rows}
+
+def free_slot(cursor, index):
+    """Nombre libre para `index`: el del modelo o el alternativo con sufijo."""
+    taken = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (index.name,)
+    ).fetchone()
+    return index.name + SLOT_SUFFIX if taken else index.name
+
+def create_index(cursor, name, table_name, index):
+    # DDL directa: un Index() nuevo se engancharía a la tabla del modelo
+    unique = "UNIQUE " if index.unique else ""
+    columns = ", ".join(f'"{column.name}"' for column in index.columns)
+    cursor.execute(f'CREATE {unique}INDEX "{name}" ON "{table_name}" ({columns})')
+
+def create_staging(cursor, table):
+    """
+    Descarta la generación anterior y crea una tabla de staging vacía, sin
+    índices (se crean después de cargar, ver `build_indexes`).
+    """
+    cursor.execute(f'DROP TABLE IF EXISTS "{previous_name(table)}"')
+    cursor.execute(f'DROP TABLE IF EXISTS "{staging_name(table)}"')
+    staging = table.to_metadata(MetaData(), name=staging_name(table))
+    cursor.execute(str(CreateTable(staging).compile(dialect=sqlite.dialect())))
+
+def build_indexes(cursor, table):
+    """Crea en la tabla de staging los índices del modelo, en el slot libre."""
+    for index in table.indexes:
+        create_index(cursor, free_slot(cursor, index), staging_name(table), index)
+
+def _renames(cursor, pairs):
+    """Aplica los RENAME de `pairs` en una sola transacción corta."""
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        for old, new in pairs:
+            cursor.execute(f'ALTER TABLE "{old}" RENAME TO "{new}"')
+        cursor.execute("COMMIT")
+    except BaseException:
+        cursor.execute("ROLLBACK")
+        raise
+
+def swap_in(cursor, table):
+    """Publica staging como tabla viva; la viva pasa a ser la generación anterior."""
+    pairs = [(staging_name(table), table.name)]
+    if table_exists(cursor, table.name):
+        pairs.insert(0, (table.name, previous_name(table)))
+    _renames(cursor, pairs)
+
+def rollback_generation(table, bind=None):
+    """
+    Vuelve a la generación anterior (la actual pasa a ser la anterior),
+    reconstruye los cubos y borra la huella / marca de agua de la tabla:
+    ya no describen lo publicado, así que la próxima corrida la recarga.
+    """
+    from sqlalchemy.orm import Session
+    from aggregates import refresh_aggregates
+    from database import engine
+    from etl.state import bump_generation, clear_state
+    raw = (bind or engine).raw_connection()
+    try:
+        raw.commit()
+        cursor = raw.cursor()
+        if not table_exists(cursor, previous_name(table)):
+            print(f"   ⚠️ {table.name}: no hay generación anterior")
+            return False
+        discard = table.name + "__discard"
+        _renames(cursor, [
+            (table.name, discard),
+            (previous_name(table), table.name),
+            (discard, previous_name(table)),
+        ])
+    finally:
+        raw.close()
+    with Session(bind=bind or engine) as db:
+        refresh_aggregates(db)
+    clear_state(*STATE_KEYS.get(table.name, ()), bind=bind)
+    bump_generation(bind=bind)
+    print(f"   ↩️  {table.name}: restaurada la generación anterior")
+    return True
+
+def ensure_indexes(bind, metadata):
+    """
+    Crea los índices del modelo que falten en las tablas vivas. Un índice
+    existente en cualquiera de los dos slots cuenta como presente.
+    """
+    raw = bind.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for table in metadata.sorted_tables:
+            existing = index_names(cursor, table.name)
+            for index in table.indexes:
+                if index.name not in existing and index.name + SLOT_SUFFIX not in existing:
+                    create_index(cursor, free_slot(cursor, index), table.name, index)
+        raw.commit()
+    finally:
+        raw.close()
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "rollback":
+        import models
+        rollback_generation(models.Base.metadata.tables[sys.argv[2]])
+    else:
+        print(__doc__)
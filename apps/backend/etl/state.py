@@ -0,0 +1,48 @@
+"""
+Estado persistente del ETL (tabla etl_state): marcas de agua de las
+sincronizaciones incrementales y otros valores clave -> texto.
+"""
+import datetime
+
+from sqlalchemy import Integer, String, cast, delete, select
+from sqlalchemy.dialects.sqlite import insert
+
+from database import engine
+from models import EtlState
+
+def get_state(key, bind=None, default=None):
+    with (bind or engine).connect() as conn:
+        value = conn.execute(select(EtlState.value).where(EtlState.key == key)).scalar()
+    return default if value is None else value
+
+def set_state(key, value, bind=None):
+    now = datetime.datetime.utcnow()
+    statement = insert(EtlState).values(key=key, value=str(value), updated_at=now)
+    statement = statement.on_conflict_do_update(
+        index_elements=[EtlState.key],
+        set_={"value": statement.excluded.value, "updated_at": now},
+    )
+    with (bind or engine).begin() as conn:
+        conn.execute(statement)
+
+def clear_state(*keys, bind=None):
+    with (bind or engine).begin() as conn:
+        conn.execute(delete(EtlState).where(EtlState.key.in_(keys)))
+
+GENERATION_KEY = "dataset.generation"
+
+def bump_generation(bind=None):
+    """
+    Incrementa el número de generación de los datos publicados. La API lo
+    usa en la clave de su caché de respuestas: al subir, todo lo cacheado
+    queda obsoleto. Devuelve la nueva generación.
+    """
+    now = datetime.datetime.utcnow()
+    statement = insert(EtlState).values(key=GENERATION_KEY, value="1", updated_at=now)
+    statement = statement.on_conflict_do_update(
+        index_elements=[EtlState.key],
+        set_={"value": cast(cast(EtlState.value, Integer) + 1, String), "updated_at": now},
+    )
+    with (bind or engine).begin() as conn:
+        conn.execute(statement)
+        return int(conn.execute(select(EtlState.value).where(EtlState.key == GENERATION_KEY)).scalar())
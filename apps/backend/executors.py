@@ -0,0 +1,39 @@
+"""
+Bounded executor for the expensive read endpoints.
+
+Sync `def` routes run on Starlette's shared threadpool, so a burst of full
+scans (the /stats/* aggregations, the PDF report) could take every thread
+and leave /health and the cube-backed widgets waiting. Heavy routes are
+`async def` instead and hand their work to a small dedicated pool here.
+They queue on that pool and never hold the shared threads.
+
+An async SQLite driver (aiosqlite) would not change this: it runs each
+connection on its own thread anyway, and the scans would still compete
+for the same CPU. What matters is bounding how many can run at once.
+"""
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+HEAVY_WORKERS = int(os.getenv("SIMGN_HEAVY_WORKERS", 2))
+# Heavy requests allowed to wait for a worker before answering 503
+HEAVY_QUEUE_LIMIT = int(os.getenv("SIMGN_HEAVY_QUEUE_LIMIT", 32))
+
+HEAVY_EXECUTOR = ThreadPoolExecutor(max_workers=HEAVY_WORKERS, thread_name_prefix="heavy")
+_in_flight = 0  # only touched from the event loop thread
+
+async def run_heavy(fn, *args, **kwargs):
+    """Runs `fn(*args, **kwargs)` on the heavy pool and returns its result."""
+    global _in_flight
+    if _in_flight >= HEAVY_WORKERS + HEAVY_QUEUE_LIMIT:
+        raise HTTPException(status_code=503, detail="Server busy, retry shortly",
+                            headers={"Retry-After": "5"})
+    _in_flight += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(HEAVY_EXECUTOR, functools.partial(fn, *args, **kwargs))
+    finally:
+        _in_flight -= 1
@@ -0,0 +1,134 @@
+"""
+Index advisor: replays every GET endpoint of the API against the local
+database, captures the SQL it runs and checks each statement with
+EXPLAIN QUERY PLAN. Any full table scan on a raw table is reported.
+
+Everything runs on the read-only engine and the router is mounted on a bare
+app (not main.app, whose startup creates tables and indexes), so the
+advisor never writes to the database it inspects.
+
+Uso:
+    python index_advisor.py            # exit code 1 si hay full scans
+    python index_advisor.py --verbose  # muestra también los planes OK
+"""
+import re
+import sys
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+from sqlalchemy import event, select
+from routers import api
+from database import read_engine, ReadSessionLocal
+import aggregates
+import models
+
+# Tables that are small by design and may be scanned
+SMALL_TABLES = {cube.__tablename__ for cube, *_rest in aggregates.CUBES.values()}
+
+DEFAULT_SAMPLES = {
+    "type": "campo",
+    "anio_min": 2018,
+    "anio_max": 2022,
+    "limit": 10,
+}
+
+API_PREFIX = "/api"  # as mounted in main.py
+
+SCAN_RE = re.compile(r"^SCAN (?:TABLE )?(\w+)(.*)$")
+
+def sample_values():
+    """Picks one real value per filter column so plans reflect actual filters."""
+    samples = dict(DEFAULT_SAMPLES)
+    db = ReadSessionLocal()
+    try:
+        for model in (models.Production, models.Royalty, models.Demand):
+            for column in model.__table__.columns:
+                if column.name in samples or column.name in ("id", "fecha_carga"):
+                    continue
+                value = db.execute(select(column).where(column.isnot(None)).limit(1)).scalar()
+                if value is not None:
+                    samples[column.name] = value
+    finally:
+        db.close()
+    return samples
+
+def replay_requests(samples):
+    """Yields (path, params) for every GET route: bare, one filter at a time and all filters."""
+    for route in api.router.routes:
+        if not isinstance(route, APIRoute) or "GET" not in route.methods:
+            continue
+        if "{" in route.path:
+            continue
+        path = API_PREFIX + route.path
+        query_params = route.dependant.query_params
+        required = {p.alias: samples.get(p.alias, "") for p in query_params if p.field_info.is_required()}
+        optional = [p.alias for p in query_params if not p.field_info.is_required() and p.alias in samples]
+        yield path, dict(required)
+        for name in optional:
+            yield path, {**required, name: samples[name]}
+        if len(optional) > 1:
+            yield path, {**required, **{name: samples[name] for name in optional}}
+
+def capture_statements(client, requests):
+    """Runs the requests and returns {(sql, params): set(paths)}."""
+    captured = {}
+    current = {}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and not executemany:
+            key = (statement, tuple(parameters or ()))
+            captured.setdefault(key, set()).add(current["path"])
+
+    # API reads go through the read-only pool
+    event.listen(read_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        for path, params in requests:
+            current["path"] = path
+            client.get(path, params=params)
+    finally:
+        event.remove(read_engine, "before_cursor_execute", before_cursor_execute)
+    return captured
+
+def full_scans(plan_rows):
+    """Returns the raw tables scanned without any index in an EXPLAIN QUERY PLAN result."""
+    scans = []
+    for row in plan_rows:
+        detail = row[-1]
+        match = SCAN_RE.match(detail)
+        if match and "INDEX" not in match.group(2) and match.group(1) not in SMALL_TABLES:
+            scans.append(detail)
+    return scans
+
+def build_app():
+    """The API router as main.py mounts it, without main's startup side effects."""
+    app = FastAPI()
+    app.include_router(api.router, prefix=API_PREFIX)
+    return app
+
+def run_advisor(verbose=False):
+    client = TestClient(build_app())
+    statements = capture_statements(client, list(replay_requests(sample_values())))
+
+    problems = 0
+    raw = read_engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for (statement, params), paths in statements.items():
+            plan = cursor.execute(f"EXPLAIN QUERY PLAN {statement}", params).fetchall()
+            scans = full_scans(plan)
+            if scans:
+                problems += 1
+            if scans or verbose:
+                status = "❌ FULL SCAN" if scans else "✅"
+                print(f"{status} {', '.join(sorted(paths))}")
+                print("   " + " ".join(statement.split())[:300])
+                for row in plan:
+                    print(f"     {row[-1]}")
+    finally:
+        raw.close()
+
+    print(f"\n{len(statements)} consultas analizadas, {problems} con full scan")
+    return problems
+
+if __name__ == "__main__":
+    sys.exit(1 if run_advisor(verbose="--verbose" in sys.argv) else 0)
@@ -1,16 +1,27 @@
 from fastapi import FastAPI
 from database import engine, Base
 from routers import api
+from etl.staging import ensure_indexes
+from aggregates import ensure_cube_schema
+from cache import ResponseCache
 import models
 
 # Create tables
 models.Base.metadata.create_all(bind=engine)
 
+# create_all only creates new tables: rebuild cubes whose columns changed and
+# add indexes introduced after the first run
+ensure_cube_schema(engine)
+ensure_indexes(engine, models.Base.metadata)
+
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 
 app = FastAPI(title="SIMGN Backend", description="API for Natural Gas Data Integration", version="1.0.0")
 
+# Response cache keyed on the dataset generation (innermost: CORS headers are per origin)
+app.add_middleware(ResponseCache, exclude=("/api/export",))
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
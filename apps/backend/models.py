@@ -1,14 +1,21 @@
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Index
 from database import Base
 import datetime
 
 class Royalty(Base):
     __tablename__ = "royalties"
+    # Equality filters first, then the anio range used by every endpoint
+    __table_args__ = (
+        Index("ix_royalties_departamento_anio", "departamento", "anio"),
+        Index("ix_royalties_campo_anio", "campo", "anio"),
+        Index("ix_royalties_tipo_hidrocarburo_anio", "tipo_hidrocarburo", "anio"),
+        Index("ix_royalties_anio_mes", "anio", "mes", "valor_liquidado"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    departamento = Column(String, index=True)
+    departamento = Column(String)
     municipio = Column(String, index=True)
-    campo = Column(String, index=True)
+    campo = Column(String)
     contrato = Column(String)
     anio = Column(Integer) # Replaces periodo
     mes = Column(Integer)
@@ -31,10 +38,17 @@ class Royalty(Base):
 
 class Production(Base):
     __tablename__ = "production"
+    __table_args__ = (
+        Index("ix_production_departamento_anio", "departamento", "anio"),
+        Index("ix_production_campo_anio", "campo", "anio"),
+        Index("ix_production_operadora_anio", "operadora", "anio"),
+        # Covering: yearly/monthly SUMs never touch the table
+        Index("ix_production_anio_mes", "anio", "mes", "produccion_mensual"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    campo = Column(String, index=True)
-    operadora = Column(String, index=True)
+    campo = Column(String)
+    operadora = Column(String)
     departamento = Column(String)
     municipio = Column(String)
     anio = Column(Integer)
@@ -44,6 +58,10 @@ class Production(Base):
 
 class Demand(Base):
     __tablename__ = "demand"
+    __table_args__ = (
+        Index("ix_demand_escenario_sector_region_anio", "escenario", "sector", "region", "anio", "demanda"),
+        Index("ix_demand_anio_mes", "anio", "mes", "demanda"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     sector = Column(String, index=True) # Residencial, Industrial, etc.
@@ -53,3 +71,55 @@ class Demand(Base):
     escenario = Column(String) # Alto, Medio, Bajo
     demanda = Column(Float) # en GBTUD
     fecha_carga = Column(DateTime, default=datetime.datetime.utcnow)
+
+# --- Aggregate cubes (rebuilt by the ETL, see aggregates.py) ---
+
+class ProductionMonthly(Base):
+    __tablename__ = "production_monthly"
+
+    id = Column(Integer, primary_key=True, index=True)
+    anio = Column(Integer, index=True)
+    mes = Column(Integer)
+    departamento = Column(String)
+    campo = Column(String)
+    operadora = Column(String)
+    produccion_mensual = Column(Float) # SUM(produccion_mensual), divide by produccion_mensual_n for AVG
+    produccion_mensual_n = Column(Integer) # COUNT(produccion_mensual)
+    registros = Column(Integer) # COUNT(*) of raw rows
+
+class RoyaltyMonthly(Base):
+    __tablename__ = "royalties_monthly"
+
+    id = Column(Integer, primary_key=True, index=True)
+    anio = Column(Integer, index=True)
+    mes = Column(Integer)
+    departamento = Column(String)
+    campo = Column(String)
+    tipo_hidrocarburo = Column(String)
+    valor_liquidado = Column(Float) # SUM(valor_liquidado)
+    volumen_regalia = Column(Float) # SUM(volumen_regalia)
+    precio_usd = Column(Float) # SUM(precio_usd), divide by precio_usd_n for AVG
+    precio_usd_n = Column(Integer) # COUNT(precio_usd)
+    registros = Column(Integer)
+
+class DemandMonthly(Base):
+    __tablename__ = "demand_monthly"
+
+    id = Column(Integer, primary_key=True, index=True)
+    anio = Column(Integer, index=True)
+    mes = Column(Integer)
+    sector = Column(String)
+    region = Column(String)
+    escenario = Column(String)
+    demanda = Column(Float) # SUM(demanda), divide by demanda_n for AVG
+    demanda_n = Column(Integer) # COUNT(demanda)
+    registros = Column(Integer)
+
+# --- ETL bookkeeping (high-water marks, dataset generations, ...) ---
+
+class EtlState(Base):
+    __tablename__ = "etl_state"
+
+    key = Column(String, primary_key=True)
+    value = Column(String)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
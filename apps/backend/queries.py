@@ -0,0 +1,37 @@
+"""
+Read-only data access for the API.
+
+Runs SQLAlchemy Core `select()` statements and hands back plain tuples or
+dicts, skipping the ORM identity map and per-row object construction. Use
+it for routes that only read; the ETL keeps using sessions and models.
+"""
+from sqlalchemy import Date, DateTime
+from sqlalchemy.orm import Session
+
+BATCH_SIZE = 1000
+
+def fetch_dicts(db: Session, statement):
+    """Executes `statement` and returns a list of JSON-ready dicts."""
+    dated = [
+        i for i, column in enumerate(statement.selected_columns)
+        if isinstance(column.type, (Date, DateTime))
+    ]
+    result = db.execute(statement)
+    keys = list(result.keys())
+    rows = result.all()
+    if not dated:
+        return [dict(zip(keys, row)) for row in rows]
+    items = []
+    for row in rows:
+        values = list(row)
+        for i in dated:
+            if values[i] is not None:
+                values[i] = values[i].isoformat()
+        items.append(dict(zip(keys, values)))
+    return items
+
+def iter_batches(db: Session, statement, batch_size=BATCH_SIZE):
+    """Streams the result of `statement` as lists of plain tuples."""
+    result = db.execute(statement.execution_options(yield_per=batch_size))
+    for rows in result.partitions():
+        yield [tuple(row) for row in rows]
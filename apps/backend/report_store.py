@@ -0,0 +1,146 @@
+"""
+Pre-rendered executive reports, served like static files.
+
+A report is rendered once per dataset generation and parameter set (the
+year it describes), off the request path: the ETL renders every year right
+after publishing a generation, and the API renders whatever is still
+missing on a background thread (`RenderQueue`). Each PDF is stored once as
+<sha256>.pdf; a small ref file per (generation, year) points at it, and the
+hash doubles as the ETag of the download.
+
+Ref files are written atomically and each key has its own, so API workers
+and the ETL never lose each other's updates; at worst two of them render
+the same report once.
+"""
+import hashlib
+import os
+import queue
+import tempfile
+import threading
+
+import dashboards
+
+# Next to this module, not the working directory: the ETL and the API share one store
+REPORTS_DIR = os.getenv("SIMGN_REPORTS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "reports"))
+
+class ReportStore:
+    """PDFs stored by content hash, with one ref file per (generation, year)."""
+
+    def __init__(self, directory=REPORTS_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def ref_path(self, generation, year):
+        return os.path.join(self.directory, f"{generation}.{year}.ref")
+
+    def path_for(self, digest):
+        return os.path.join(self.directory, f"{digest}.pdf")
+
+    def lookup(self, generation, year):
+        """(path, sha256) of the stored report, or None."""
+        try:
+            with open(self.ref_path(generation, year), encoding="utf-8") as f:
+                digest = f.read().strip()
+        except FileNotFoundError:
+            return None
+        path = self.path_for(digest)
+        return (path, digest) if os.path.exists(path) else None
+
+    def put(self, generation, year, content):
+        digest = hashlib.sha256(content).hexdigest()
+        path = self.path_for(digest)
+        if not os.path.exists(path):
+            self._write(path, content)
+        self._write(self.ref_path(generation, year), digest.encode())
+        return path, digest
+
+    def prune(self, keep):
+        """Drops refs of generations not in `keep` and the PDFs nothing points at any more."""
+        keep = {str(generation) for generation in keep}
+        referenced = set()
+        for name in os.listdir(self.directory):
+            if not name.endswith(".ref"):
+                continue
+            path = os.path.join(self.directory, name)
+            if name.split(".", 1)[0] in keep:
+                with open(path, encoding="utf-8") as f:
+                    referenced.add(f.read().strip())
+            else:
+                os.remove(path)
+        for name in os.listdir(self.directory):
+            if name.endswith(".pdf") and name[:-4] not in referenced:
+                os.remove(os.path.join(self.directory, name))
+
+    def _write(self, path, content):
+        # Atomic: a reader never sees a half-written PDF or ref
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+def render(db, generation, year=None, store=None, data=None):
+    """
+    Renders the executive report for `year` (default: the latest year with
+    data) and stores it. `data` skips the queries when the caller has it.
+    Returns (path, sha256).
+    """
+    from reports import PDFReportGenerator
+    data = data or dashboards.report_data(db, year)
+    store = store or ReportStore()
+    return store.put(generation, data["kpis"]["year"], PDFReportGenerator().generate(data).getvalue())
+
+def render_all(db, generation, store=None):
+    """Renders every parameter set of `generation`: the default year first, then the rest."""
+    store = store or ReportStore()
+    data = dashboards.report_data(db)
+    rendered = [render(db, generation, store=store, data=data)]
+    for year in data["years"]:
+        if year != data["kpis"]["year"]:
+            rendered.append(render(db, generation, year, store=store))
+    return rendered
+
+class RenderQueue:
+    """
+    One background thread rendering the reports nobody has asked for yet.
+    Jobs are (generation, year); a job whose generation is no longer current
+    or whose report is already stored is skipped.
+    """
+
+    def __init__(self, session_factory, store=None, current_generation=None):
+        self.session_factory = session_factory
+        self.store = store or ReportStore()
+        self.current_generation = current_generation
+        self.jobs = queue.Queue()
+        self.scheduled = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def schedule(self, generation, years):
+        with self._lock:
+            generation = str(generation)
+            self.scheduled = {job for job in self.scheduled if job[0] == generation}
+            for year in years:
+                if (generation, year) not in self.scheduled:
+                    self.scheduled.add((generation, year))
+                    self.jobs.put((generation, year))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name="report-render", daemon=True)
+                self._thread.start()
+
+    def _work(self):
+        while True:
+            generation, year = self.jobs.get()
+            try:
+                stale = self.current_generation and str(self.current_generation()) != str(generation)
+                if not stale and self.store.lookup(generation, year) is None:
+                    with self.session_factory() as db:
+                        render(db, generation, year, store=self.store)
+            except Exception as e:
+                print(f"⚠️ Report render failed ({generation}, {year}): {e}")
+            finally:
+                self.jobs.task_done()
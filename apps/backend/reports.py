@@ -6,25 +6,37 @@ from reportlab.lib.units import inch
 from io import BytesIO
 from datetime import datetime
 
+# Built once per process: the generator used to rebuild them for every report
+STYLES = getSampleStyleSheet()
+TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=STYLES['Heading1'],
+    fontSize=24,
+    spaceAfter=30,
+    textColor=colors.HexColor('#1e3a8a'), # Blue-900
+    alignment=1 # Center
+)
+SUBTITLE_STYLE = ParagraphStyle(
+    'CustomSubtitle',
+    parent=STYLES['Heading2'],
+    fontSize=14,
+    spaceAfter=20,
+    textColor=colors.HexColor('#64748b') # Slate-500
+)
+FOOTER_STYLE = ParagraphStyle(
+    'Footer',
+    parent=STYLES['Normal'],
+    fontSize=8,
+    textColor=colors.gray,
+    alignment=1
+)
+
 class PDFReportGenerator:
     def __init__(self):
-        self.styles = getSampleStyleSheet()
-        self.title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=self.styles['Heading1'],
-            fontSize=24,
-            spaceAfter=30,
-            textColor=colors.HexColor('#1e3a8a'), # Blue-900
-            alignment=1 # Center
-        )
-        self.subtitle_style = ParagraphStyle(
-            'CustomSubtitle',
-            parent=self.styles['Heading2'],
-            fontSize=14,
-            spaceAfter=20,
-            textColor=colors.HexColor('#64748b') # Slate-500
-        )
-        self.normal_style = self.styles['Normal']
+        self.styles = STYLES
+        self.title_style = TITLE_STYLE
+        self.subtitle_style = SUBTITLE_STYLE
+        self.normal_style = STYLES['Normal']
         
     def generate(self, data):
         buffer = BytesIO()
@@ -37,7 +49,7 @@ class PDFReportGenerator:
         elements.append(Spacer(1, 0.5 * inch))
         
         # --- Executive Summary (KPIs) ---
-        elements.append(Paragraph("Resumen Ejecutivo (2023)", self.styles['Heading2']))
+        elements.append(Paragraph(f"Resumen Ejecutivo ({data['kpis']['year']})", self.styles['Heading2']))
         
         kpi_data = [
             ['Indicador', 'Valor', 'Unidad'],
@@ -102,13 +114,7 @@ class PDFReportGenerator:
         
         # --- Footer ---
         elements.append(Spacer(1, 1 * inch))
-        elements.append(Paragraph("Ministerio de Minas y Energía - SIMGN", ParagraphStyle(
-            'Footer',
-            parent=self.styles['Normal'],
-            fontSize=8,
-            textColor=colors.gray,
-            alignment=1
-        )))
+        elements.append(Paragraph("Ministerio de Minas y Energía - SIMGN", FOOTER_STYLE))
         
         doc.build(elements)
         buffer.seek(0)
@@ -1,102 +1,163 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import FileResponse, JSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
-from database import get_db
+from sqlalchemy import func, desc, select, literal, String
+from database import ReadSessionLocal, get_read_db
 import models
 import schemas
+import aggregates
+import cache
+import columnar
+import dashboards
+import queries
+from executors import run_heavy
+from report_store import RenderQueue, ReportStore, render as render_report
 from typing import List, Optional
 from datetime import datetime
+import base64
+import json
+import os
 
 router = APIRouter()
 
 @router.get("/health")
-def health_check():
+async def health_check():
     return {"status": "ok"}
 
+# --- Raw data pagination ---
+# Keyset pagination on id: the cursor is an opaque token wrapping the last id
+# returned, so each page is an index range scan no matter how deep it is.
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = int(os.getenv("SIMGN_MAX_PAGE_SIZE", "5000"))
+
+def encode_cursor(last_id: int) -> str:
+    raw = json.dumps({"id": last_id}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(padded))["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def projection(model, fields: Optional[str]):
+    """Columns to select for `fields=a,b,c`; id is always included for the cursor."""
+    columns = model.__table__.columns
+    if not fields:
+        return list(columns)
+    names = ["id"] + [f.strip() for f in fields.split(",") if f.strip() and f.strip() != "id"]
+    unknown = [n for n in names if n not in columns]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return [columns[n] for n in names]
+
+def paginate(db: Session, statement, model, cursor: Optional[str], limit: int, headers=None):
+    """
+    Fetches one page (limit + 1 rows to detect the next one) through the Core
+    fast path and returns it as JSON directly, skipping per-row validation.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    statement = statement.where(model.id > decode_cursor(cursor)).order_by(model.id).limit(limit + 1)
+    items = queries.fetch_dicts(db, statement)
+    next_cursor = encode_cursor(items[limit - 1]["id"]) if len(items) > limit else None
+    return JSONResponse({"items": items[:limit], "next_cursor": next_cursor}, headers=headers)
+
 # --- Royalties Endpoints ---
-@router.get("/royalties", response_model=List[schemas.Royalty])
+@router.get("/royalties", response_model=schemas.RoyaltyPage)
 def get_royalties(
-    response: Response,
+    request: Request,
     departamento: Optional[str] = None,
     campo: Optional[str] = None,
     anio_min: Optional[int] = None,
     anio_max: Optional[int] = None,
     tipo_hidrocarburo: Optional[str] = None,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    fields: Optional[str] = None,
+    format: Optional[str] = None, # arrow | parquet (or via Accept header)
+    db: Session = Depends(get_read_db)
 ):
-    # Set browser cache for 1 hour
-    response.headers["Cache-Control"] = "public, max-age=3600"
+    # Clients keep the page but revalidate it (ETag/304 from ResponseCache): an ETL reload shows up at once
+    cache_headers = {"Cache-Control": "no-cache"}
     
-    query = db.query(models.Royalty)
+    statement = select(*projection(models.Royalty, fields))
     
     # Apply filters
     if departamento:
-        query = query.filter(models.Royalty.departamento == departamento)
+        statement = statement.where(models.Royalty.departamento == departamento)
     if campo:
-        query = query.filter(models.Royalty.campo == campo)
+        statement = statement.where(models.Royalty.campo == campo)
     if anio_min:
-        query = query.filter(models.Royalty.anio >= anio_min)
+        statement = statement.where(models.Royalty.anio >= anio_min)
     if anio_max:
-        query = query.filter(models.Royalty.anio <= anio_max)
+        statement = statement.where(models.Royalty.anio <= anio_max)
     if tipo_hidrocarburo:
-        query = query.filter(models.Royalty.tipo_hidrocarburo == tipo_hidrocarburo)
+        statement = statement.where(models.Royalty.tipo_hidrocarburo == tipo_hidrocarburo)
     
-    # Return ALL matching records - no limit
-    royalties = query.all()
-    return royalties
-
-# ... (rest of file)
+    # Columnar extracts stream the whole filtered set in batches
+    fmt = columnar.negotiate(request, format)
+    if fmt:
+        return columnar.columnar_response(db, statement.order_by(models.Royalty.id), fmt, "regalias", headers=cache_headers)
+    
+    # One page at a time, capped at MAX_PAGE_SIZE rows
+    return paginate(db, statement, models.Royalty, cursor, limit, headers=cache_headers)
 
 # --- Production Endpoints ---
-@router.get("/production", response_model=List[schemas.Production])
+@router.get("/production", response_model=schemas.ProductionPage)
 def get_production(
-    response: Response,
+    request: Request,
     departamento: Optional[str] = None,
     campo: Optional[str] = None,
     operadora: Optional[str] = None,
     anio_min: Optional[int] = None,
     anio_max: Optional[int] = None,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    fields: Optional[str] = None,
+    format: Optional[str] = None, # arrow | parquet (or via Accept header)
+    db: Session = Depends(get_read_db)
 ):
-    # Set browser cache for 1 hour
-    response.headers["Cache-Control"] = "public, max-age=3600"
+    # Clients keep the page but revalidate it (ETag/304 from ResponseCache): an ETL reload shows up at once
+    cache_headers = {"Cache-Control": "no-cache"}
 
-    query = db.query(models.Production)
+    statement = select(*projection(models.Production, fields))
     
     # Apply filters
     if departamento:
-        query = query.filter(models.Production.departamento == departamento)
+        statement = statement.where(models.Production.departamento == departamento)
     if campo:
-        query = query.filter(models.Production.campo == campo)
+        statement = statement.where(models.Production.campo == campo)
     if operadora:
-        query = query.filter(models.Production.operadora == operadora)
+        statement = statement.where(models.Production.operadora == operadora)
     if anio_min:
-        query = query.filter(models.Production.anio >= anio_min)
+        statement = statement.where(models.Production.anio >= anio_min)
     if anio_max:
-        query = query.filter(models.Production.anio <= anio_max)
+        statement = statement.where(models.Production.anio <= anio_max)
     
-    # Return ALL matching records - no limit
-    production = query.all()
-    return production
-
-import time
+    # Columnar extracts stream the whole filtered set in batches
+    fmt = columnar.negotiate(request, format)
+    if fmt:
+        return columnar.columnar_response(db, statement.order_by(models.Production.id), fmt, "produccion", headers=cache_headers)
+    
+    # One page at a time, capped at MAX_PAGE_SIZE rows
+    return paginate(db, statement, models.Production, cursor, limit, headers=cache_headers)
 
-# Simple in-memory cache
-FILTER_CACHE = {
-    "royalties": {"data": None, "timestamp": 0},
-    "production": {"data": None, "timestamp": 0}
-}
+# Filter options per dataset generation (an ETL reload invalidates them),
+# in the same backend as the response cache so workers share them
 CACHE_TTL = 3600 * 24  # 24 hours
 
+def cached_filters(name, compute):
+    return cache.memoize(f"filters:{name}", compute, ttl=CACHE_TTL)
+
 @router.get("/royalties/filters")
-def get_royalties_filters(db: Session = Depends(get_db)):
+def get_royalties_filters(db: Session = Depends(get_read_db)):
     """Get available filter options for royalties (Cached)"""
-    current_time = time.time()
-    cached = FILTER_CACHE["royalties"]
-    
-    if cached["data"] and (current_time - cached["timestamp"] < CACHE_TTL):
-        return cached["data"]
+    return cached_filters("royalties", lambda: royalties_filters(db))
 
+def royalties_filters(db: Session):
     departamentos = db.query(models.Royalty.departamento).distinct().all()
     campos = db.query(models.Royalty.campo).distinct().all()
     tipos_hidrocarburo = db.query(models.Royalty.tipo_hidrocarburo).distinct().all()
@@ -108,54 +169,19 @@ def get_royalties_filters(db: Session = Depends(get_db)):
         "tipos_hidrocarburo": sorted([t[0] for t in tipos_hidrocarburo if t[0]]),
         "anios": sorted([a[0] for a in anios if a[0]])
     }
-    
-    FILTER_CACHE["royalties"] = {"data": result, "timestamp": current_time}
     return result
 
 @router.get("/royalties/stats")
-def get_royalties_stats(db: Session = Depends(get_db)):
-    total_value = db.query(models.Royalty).with_entities(models.Royalty.valor_liquidado).all()
-    total = sum([v[0] for v in total_value if v[0]])
-    count = db.query(models.Royalty).count()
-    return {"total_records": count, "total_value_liquidado": total}
-
-# --- Production Endpoints ---
-@router.get("/production", response_model=List[schemas.Production])
-def get_production(
-    departamento: Optional[str] = None,
-    campo: Optional[str] = None,
-    operadora: Optional[str] = None,
-    anio_min: Optional[int] = None,
-    anio_max: Optional[int] = None,
-    db: Session = Depends(get_db)
-):
-    query = db.query(models.Production)
-    
-    # Apply filters
-    if departamento:
-        query = query.filter(models.Production.departamento == departamento)
-    if campo:
-        query = query.filter(models.Production.campo == campo)
-    if operadora:
-        query = query.filter(models.Production.operadora == operadora)
-    if anio_min:
-        query = query.filter(models.Production.anio >= anio_min)
-    if anio_max:
-        query = query.filter(models.Production.anio <= anio_max)
-    
-    # Return ALL matching records - no limit
-    production = query.all()
-    return production
+def get_royalties_stats(db: Session = Depends(get_read_db)):
+    count, total = db.execute(select(func.count(), func.sum(models.Royalty.valor_liquidado))).one()
+    return {"total_records": count, "total_value_liquidado": total or 0}
 
 @router.get("/production/filters")
-def get_production_filters(db: Session = Depends(get_db)):
+def get_production_filters(db: Session = Depends(get_read_db)):
     """Get available filter options for production (Cached)"""
-    current_time = time.time()
-    cached = FILTER_CACHE["production"]
-    
-    if cached["data"] and (current_time - cached["timestamp"] < CACHE_TTL):
-        return cached["data"]
+    return cached_filters("production", lambda: production_filters(db))
 
+def production_filters(db: Session):
     departamentos = db.query(models.Production.departamento).distinct().all()
     campos = db.query(models.Production.campo).distinct().all()
     operadoras = db.query(models.Production.operadora).distinct().all()
@@ -167,8 +193,6 @@ def get_production_filters(db: Session = Depends(get_db)):
         "operadoras": sorted([o[0] for o in operadoras if o[0]]),
         "anios": sorted([a[0] for a in anios if a[0]])
     }
-    
-    FILTER_CACHE["production"] = {"data": result, "timestamp": current_time}
     return result
 
 # --- Aggregation Endpoints (Low RAM Strategy) ---
@@ -180,31 +204,36 @@ def get_production_kpis(
     operadora: Optional[str] = None,
     anio_min: Optional[int] = None,
     anio_max: Optional[int] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get calculated KPIs directly from DB to save RAM"""
-    query = db.query(models.Production)
+    M = aggregates.source(
+        db, models.Production,
+        departamento=departamento, campo=campo, operadora=operadora,
+        anio_min=anio_min, anio_max=anio_max
+    )
+    query = db.query(M)
     
     # Apply filters
     if departamento:
-        query = query.filter(models.Production.departamento == departamento)
+        query = query.filter(M.departamento == departamento)
     if campo:
-        query = query.filter(models.Production.campo == campo)
+        query = query.filter(M.campo == campo)
     if operadora:
-        query = query.filter(models.Production.operadora == operadora)
+        query = query.filter(M.operadora == operadora)
     if anio_min:
-        query = query.filter(models.Production.anio >= anio_min)
+        query = query.filter(M.anio >= anio_min)
     if anio_max:
-        query = query.filter(models.Production.anio <= anio_max)
+        query = query.filter(M.anio <= anio_max)
     
     # Calculate KPIs in DB
     from sqlalchemy import func, distinct
     
     stats = query.with_entities(
-        func.sum(models.Production.produccion_mensual).label('total_production'),
-        func.count(distinct(models.Production.campo)).label('active_fields'),
-        func.count(distinct(models.Production.operadora)).label('active_operators'),
-        func.avg(models.Production.produccion_mensual).label('avg_monthly')
+        func.sum(M.produccion_mensual).label('total_production'),
+        func.count(distinct(M.campo)).label('active_fields'),
+        func.count(distinct(M.operadora)).label('active_operators'),
+        aggregates.avg(M, 'produccion_mensual').label('avg_monthly')
     ).first()
     
     return {
@@ -221,21 +250,26 @@ def get_production_trend(
     operadora: Optional[str] = None,
     anio_min: Optional[int] = None,
     anio_max: Optional[int] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get time series data aggregated by date"""
-    query = db.query(models.Production)
+    M = aggregates.source(
+        db, models.Production,
+        departamento=departamento, campo=campo, operadora=operadora,
+        anio_min=anio_min, anio_max=anio_max
+    )
+    query = db.query(M)
     
     if departamento:
-        query = query.filter(models.Production.departamento == departamento)
+        query = query.filter(M.departamento == departamento)
     if campo:
-        query = query.filter(models.Production.campo == campo)
+        query = query.filter(M.campo == campo)
     if operadora:
-        query = query.filter(models.Production.operadora == operadora)
+        query = query.filter(M.operadora == operadora)
     if anio_min:
-        query = query.filter(models.Production.anio >= anio_min)
+        query = query.filter(M.anio >= anio_min)
     if anio_max:
-        query = query.filter(models.Production.anio <= anio_max)
+        query = query.filter(M.anio <= anio_max)
         
     from sqlalchemy import func
     
@@ -243,10 +277,10 @@ def get_production_trend(
     # Note: We assume anio/mes columns exist. 
     # For a proper date sort, we might need to construct a date object or sort by anio, mes.
     results = query.with_entities(
-        models.Production.anio,
-        models.Production.mes,
-        func.sum(models.Production.produccion_mensual).label('total')
-    ).group_by(models.Production.anio, models.Production.mes).order_by(models.Production.anio, models.Production.mes).all()
+        M.anio,
+        M.mes,
+        func.sum(M.produccion_mensual).label('total')
+    ).group_by(M.anio, M.mes).order_by(M.anio, M.mes).all()
     
     return [
         {
@@ -266,29 +300,34 @@ def get_production_ranking(
     operadora: Optional[str] = None,
     anio_min: Optional[int] = None,
     anio_max: Optional[int] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get top N items by production"""
-    query = db.query(models.Production)
+    M = aggregates.source(
+        db, models.Production,
+        departamento=departamento, campo=campo, operadora=operadora,
+        anio_min=anio_min, anio_max=anio_max
+    )
+    query = db.query(M)
     
     if departamento:
-        query = query.filter(models.Production.departamento == departamento)
+        query = query.filter(M.departamento == departamento)
     if campo:
-        query = query.filter(models.Production.campo == campo)
+        query = query.filter(M.campo == campo)
     if operadora:
-        query = query.filter(models.Production.operadora == operadora)
+        query = query.filter(M.operadora == operadora)
     if anio_min:
-        query = query.filter(models.Production.anio >= anio_min)
+        query = query.filter(M.anio >= anio_min)
     if anio_max:
-        query = query.filter(models.Production.anio <= anio_max)
+        query = query.filter(M.anio <= anio_max)
         
     from sqlalchemy import func, desc
     
-    group_col = models.Production.operadora if type == 'operadora' else models.Production.campo
+    group_col = M.operadora if type == 'operadora' else M.campo
     
     results = query.with_entities(
         group_col.label('name'),
-        func.sum(models.Production.produccion_mensual).label('total')
+        func.sum(M.produccion_mensual).label('total')
     ).group_by(group_col).order_by(desc('total')).limit(limit).all()
     
     return [
@@ -306,28 +345,33 @@ def get_production_map(
     operadora: Optional[str] = None,
     anio_min: Optional[int] = None,
     anio_max: Optional[int] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get aggregated production data by department for map"""
-    query = db.query(models.Production)
+    M = aggregates.source(
+        db, models.Production,
+        departamento=departamento, campo=campo, operadora=operadora,
+        anio_min=anio_min, anio_max=anio_max
+    )
+    query = db.query(M)
     
     if departamento:
-        query = query.filter(models.Production.departamento == departamento)
+        query = query.filter(M.departamento == departamento)
     if campo:
-        query = query.filter(models.Production.campo == campo)
+        query = query.filter(M.campo == campo)
     if operadora:
-        query = query.filter(models.Production.operadora == operadora)
+        query = query.filter(M.operadora == operadora)
     if anio_min:
-        query = query.filter(models.Production.anio >= anio_min)
+        query = query.filter(M.anio >= anio_min)
     if anio_max:
-        query = query.filter(models.Production.anio <= anio_max)
+        query = query.filter(M.anio <= anio_max)
         
     from sqlalchemy import func
     
     results = query.with_entities(
-        models.Production.departamento,
-        func.sum(models.Production.produccion_mensual).label('total')
-    ).group_by(models.Production.departamento).all()
+        M.departamento,
+        func.sum(M.produccion_mensual).label('total')
+    ).group_by(M.departamento).all()
     
     return [
         {
@@ -336,6 +380,23 @@ def get_production_map(
         }
         for r in results
     ]
+
+@router.get("/production/dashboard")
+def get_production_dashboard(
+    departamento: Optional[str] = None,
+    campo: Optional[str] = None,
+    operadora: Optional[str] = None,
+    anio_min: Optional[int] = None,
+    anio_max: Optional[int] = None,
+    limit: int = 15,
+    db: Session = Depends(get_read_db)
+):
+    """Every Production widget (kpis, trend, both rankings, map) from one grouped scan"""
+    return dashboards.production_dashboard(
+        db, ranking_limit=limit,
+        departamento=departamento, campo=campo, operadora=operadora,
+        anio_min=anio_min, anio_max=anio_max
+    )
     
 # --- Royalties Aggregation Endpoints ---
 
@@ -346,7 +407,7 @@ def get_royalties_kpis(
     anio_min: Optional[int] = None,
     anio_max: Optional[int] = None,
     tipo_hidrocarburo: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get calculated KPIs for Royalties directly from DB"""
     query = db.query(models.Royalty)
@@ -385,31 +446,36 @@ def get_royalties_trend(
     anio_min: Optional[int] = None,
     anio_max: Optional[int] = None,
     tipo_hidrocarburo: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get time series data for Royalties"""
-    query = db.query(models.Royalty)
+    M = aggregates.source(
+        db, models.Royalty,
+        departamento=departamento, campo=campo, tipo_hidrocarburo=tipo_hidrocarburo,
+        anio_min=anio_min, anio_max=anio_max
+    )
+    query = db.query(M)
     
     if departamento:
-        query = query.filter(models.Royalty.departamento == departamento)
+        query = query.filter(M.departamento == departamento)
     if campo:
-        query = query.filter(models.Royalty.campo == campo)
+        query = query.filter(M.campo == campo)
     if anio_min:
-        query = query.filter(models.Royalty.anio >= anio_min)
+        query = query.filter(M.anio >= anio_min)
     if anio_max:
-        query = query.filter(models.Royalty.anio <= anio_max)
+        query = query.filter(M.anio <= anio_max)
     if tipo_hidrocarburo:
-        query = query.filter(models.Royalty.tipo_hidrocarburo == tipo_hidrocarburo)
+        query = query.filter(M.tipo_hidrocarburo == tipo_hidrocarburo)
         
     from sqlalchemy import func
     
     results = query.with_entities(
-        models.Royalty.anio,
-        models.Royalty.mes,
-        func.sum(models.Royalty.valor_liquidado).label('valor'),
-        func.sum(models.Royalty.volumen_regalia).label('volumen'),
-        func.avg(models.Royalty.precio_usd).label('precio')
-    ).group_by(models.Royalty.anio, models.Royalty.mes).order_by(models.Royalty.anio, models.Royalty.mes).all()
+        M.anio,
+        M.mes,
+        func.sum(M.valor_liquidado).label('valor'),
+        func.sum(M.volumen_regalia).label('volumen'),
+        aggregates.avg(M, 'precio_usd').label('precio')
+    ).group_by(M.anio, M.mes).order_by(M.anio, M.mes).all()
     
     return [
         {
@@ -429,77 +495,41 @@ def get_royalties_map(
     anio_min: Optional[int] = None,
     anio_max: Optional[int] = None,
     tipo_hidrocarburo: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get aggregated data by department for map"""
-    query = db.query(models.Royalty)
+    M = aggregates.source(
+        db, models.Royalty,
+        departamento=departamento, campo=campo, tipo_hidrocarburo=tipo_hidrocarburo,
+        anio_min=anio_min, anio_max=anio_max
+    )
+    query = db.query(M)
     
     if departamento:
-        query = query.filter(models.Royalty.departamento == departamento)
+        query = query.filter(M.departamento == departamento)
     if campo:
-        query = query.filter(models.Royalty.campo == campo)
+        query = query.filter(M.campo == campo)
     if anio_min:
-        query = query.filter(models.Royalty.anio >= anio_min)
+        query = query.filter(M.anio >= anio_min)
     if anio_max:
-        query = query.filter(models.Royalty.anio <= anio_max)
+        query = query.filter(M.anio <= anio_max)
     if tipo_hidrocarburo:
-        query = query.filter(models.Royalty.tipo_hidrocarburo == tipo_hidrocarburo)
+        query = query.filter(M.tipo_hidrocarburo == tipo_hidrocarburo)
         
     from sqlalchemy import func
     
     results = query.with_entities(
-        models.Royalty.departamento,
-        func.sum(models.Royalty.valor_liquidado).label('total')
-    ).group_by(models.Royalty.departamento).all()
+        M.departamento,
+        func.sum(M.valor_liquidado).label('total')
+    ).group_by(M.departamento).all()
     
-    # Normalization Mapping (DB -> Frontend)
-    dept_mapping = {
-        'ANTIOQUIA': 'Antioquia',
-        'ARAUCA': 'Arauca',
-        'ATLANTICO': 'Atlántico',
-        'BOLIVAR': 'Bolívar',
-        'BOYACA': 'Boyacá',
-        'CALDAS': 'Caldas',
-        'CAQUETA': 'Caquetá',
-        'CASANARE': 'Casanare',
-        'CAUCA': 'Cauca',
-        'CESAR': 'Cesar',
-        'CHOCO': 'Chocó',
-        'CORDOBA': 'Córdoba',
-        'CUNDINAMARCA': 'Cundinamarca',
-        'GUAJIRA': 'La Guajira',
-        'GUAVIARE': 'Guaviare',
-        'HUILA': 'Huila',
-        'MAGDALENA': 'Magdalena',
-        'META': 'Meta',
-        'NARIÑO': 'Nariño',
-        'NORTE DE SANTANDER': 'Norte de Santander',
-        'PUTUMAYO': 'Putumayo',
-        'QUINDIO': 'Quindío',
-        'RISARALDA': 'Risaralda',
-        'SANTANDER': 'Santander',
-        'SUCRE': 'Sucre',
-        'TOLIMA': 'Tolima',
-        'VALLE DEL CAUCA': 'Valle del Cauca',
-        'VICHADA': 'Vichada',
-        'AMAZONAS': 'Amazonas',
-        'VAUPES': 'Vaupés',
-        'GUAINIA': 'Guainía',
-        'SAN ANDRES': 'San Andrés y Providencia'
-    }
-
-    normalized_results = []
-    for r in results:
-        dept_name = r.departamento
-        # Try exact match, then upper match
-        norm_name = dept_mapping.get(dept_name) or dept_mapping.get(dept_name.upper()) or dept_name.title()
-        
-        normalized_results.append({
-            "department": norm_name,
+    return [
+        {
+            "department": dashboards.department_name(r.departamento),
             "value": r.total
-        })
-        
-    return normalized_results
+        }
+        for r in results
+    ]
 
 @router.get("/royalties/distribution")
 def get_royalties_distribution(
@@ -508,28 +538,33 @@ def get_royalties_distribution(
     anio_min: Optional[int] = None,
     anio_max: Optional[int] = None,
     tipo_hidrocarburo: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get distribution by hydrocarbon type"""
-    query = db.query(models.Royalty)
+    M = aggregates.source(
+        db, models.Royalty,
+        departamento=departamento, campo=campo, tipo_hidrocarburo=tipo_hidrocarburo,
+        anio_min=anio_min, anio_max=anio_max
+    )
+    query = db.query(M)
     
     if departamento:
-        query = query.filter(models.Royalty.departamento == departamento)
+        query = query.filter(M.departamento == departamento)
     if campo:
-        query = query.filter(models.Royalty.campo == campo)
+        query = query.filter(M.campo == campo)
     if anio_min:
-        query = query.filter(models.Royalty.anio >= anio_min)
+        query = query.filter(M.anio >= anio_min)
     if anio_max:
-        query = query.filter(models.Royalty.anio <= anio_max)
+        query = query.filter(M.anio <= anio_max)
     if tipo_hidrocarburo:
-        query = query.filter(models.Royalty.tipo_hidrocarburo == tipo_hidrocarburo)
+        query = query.filter(M.tipo_hidrocarburo == tipo_hidrocarburo)
         
     from sqlalchemy import func
     
     results = query.with_entities(
-        models.Royalty.tipo_hidrocarburo,
-        func.sum(models.Royalty.valor_liquidado).label('total')
-    ).group_by(models.Royalty.tipo_hidrocarburo).all()
+        M.tipo_hidrocarburo,
+        func.sum(M.valor_liquidado).label('total')
+    ).group_by(M.tipo_hidrocarburo).all()
     
     return [
         {
@@ -547,28 +582,33 @@ def get_royalties_ranking(
     anio_min: Optional[int] = None,
     anio_max: Optional[int] = None,
     tipo_hidrocarburo: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get top fields by royalties"""
-    query = db.query(models.Royalty)
+    M = aggregates.source(
+        db, models.Royalty,
+        departamento=departamento, campo=campo, tipo_hidrocarburo=tipo_hidrocarburo,
+        anio_min=anio_min, anio_max=anio_max
+    )
+    query = db.query(M)
     
     if departamento:
-        query = query.filter(models.Royalty.departamento == departamento)
+        query = query.filter(M.departamento == departamento)
     if campo:
-        query = query.filter(models.Royalty.campo == campo)
+        query = query.filter(M.campo == campo)
     if anio_min:
-        query = query.filter(models.Royalty.anio >= anio_min)
+        query = query.filter(M.anio >= anio_min)
     if anio_max:
-        query = query.filter(models.Royalty.anio <= anio_max)
+        query = query.filter(M.anio <= anio_max)
     if tipo_hidrocarburo:
-        query = query.filter(models.Royalty.tipo_hidrocarburo == tipo_hidrocarburo)
+        query = query.filter(M.tipo_hidrocarburo == tipo_hidrocarburo)
         
     from sqlalchemy import func, desc
     
     results = query.with_entities(
-        models.Royalty.campo,
-        func.sum(models.Royalty.valor_liquidado).label('total'),
-    ).group_by(models.Royalty.campo).order_by(desc('total')).limit(limit).all()
+        M.campo,
+        func.sum(M.valor_liquidado).label('total'),
+    ).group_by(M.campo).order_by(desc('total')).limit(limit).all()
     
     return [
         {
@@ -578,21 +618,107 @@ def get_royalties_ranking(
         for r in results
     ]
 
+@router.get("/royalties/dashboard")
+def get_royalties_dashboard(
+    departamento: Optional[str] = None,
+    campo: Optional[str] = None,
+    anio_min: Optional[int] = None,
+    anio_max: Optional[int] = None,
+    tipo_hidrocarburo: Optional[str] = None,
+    limit: int = 20,
+    db: Session = Depends(get_read_db)
+):
+    """Every Royalties widget (kpis, trend, map, distribution, ranking) from one grouped scan"""
+    return dashboards.royalties_dashboard(
+        db, ranking_limit=limit,
+        departamento=departamento, campo=campo, tipo_hidrocarburo=tipo_hidrocarburo,
+        anio_min=anio_min, anio_max=anio_max
+    )
+
 # --- Streaming Export Endpoint ---
 
 from fastapi.responses import StreamingResponse
 import io
 import csv
 
+def export_statements(produccion, demanda, regalias, start_year=None, end_year=None):
+    """
+    Core SELECTs for the combined export, one per dataset, all with the same
+    column layout as the CSV (ID, Tipo, Año, Mes, Entidad, Concepto, Valor, ...).
+    """
+    def text(value):
+        return literal(value, String)
+
+    def year_range(stmt, model):
+        if start_year:
+            stmt = stmt.where(model.anio >= start_year)
+        if end_year:
+            stmt = stmt.where(model.anio <= end_year)
+        return stmt.order_by(model.id)
+
+    statements = []
+    if produccion:
+        P = models.Production
+        statements.append(year_range(select(
+            P.id.label('id'), text('Producción').label('tipo'), P.anio.label('anio'), P.mes.label('mes'),
+            (P.departamento + ' - ' + P.municipio).label('entidad_territorial'), P.campo.label('concepto'),
+            P.produccion_mensual.label('valor'), text('KPC').label('unidad'), text('ANH').label('fuente'),
+            text('Sí').label('validado')
+        ), P))
+    if demanda:
+        D = models.Demand
+        statements.append(year_range(select(
+            D.id.label('id'), text('Demanda').label('tipo'), D.anio.label('anio'), D.mes.label('mes'),
+            D.region.label('entidad_territorial'), D.sector.label('concepto'),
+            D.demanda.label('valor'), text('GBTUD').label('unidad'), text('XM').label('fuente'),
+            text('Sí').label('validado')
+        ), D))
+    if regalias:
+        R = models.Royalty
+        statements.append(year_range(select(
+            R.id.label('id'), text('Regalías').label('tipo'), R.anio.label('anio'), R.mes.label('mes'),
+            (R.departamento + ' - ' + R.municipio).label('entidad_territorial'), R.campo.label('concepto'),
+            R.valor_liquidado.label('valor'), text('COP').label('unidad'), text('ANM').label('fuente'),
+            text('Sí').label('validado')
+        ), R))
+    return statements
+
+def report_data(db: Session, year=None):
+    """Strategic KPIs, series and balances, computed once per dataset generation."""
+    return cache.memoize(f"report:{year or 'latest'}", lambda: dashboards.report_data(db, year), ttl=CACHE_TTL)
+
+# Executive reports are pre-rendered (ETL, then RENDER_QUEUE) and served from disk
+REPORT_STORE = ReportStore()
+RENDER_QUEUE = RenderQueue(ReadSessionLocal, REPORT_STORE, current_generation=cache.current_generation)
+
+def stored_executive_report(db: Session, year=None):
+    """
+    (path, sha256, year) of the stored report for `year`, rendering it now
+    only when neither the ETL nor the queue has yet. Years without data fall
+    back to the latest one.
+    """
+    generation = cache.current_generation()
+    latest = report_data(db)
+    if year not in latest["years"]:
+        year = latest["kpis"]["year"]
+    # Every other year is rendered in the background before anyone asks for it
+    RENDER_QUEUE.schedule(generation, latest["years"])
+    stored = REPORT_STORE.lookup(generation, year)
+    if stored is None:
+        data = latest if year == latest["kpis"]["year"] else report_data(db, year)
+        stored = render_report(db, generation, store=REPORT_STORE, data=data)
+    return (*stored, year)
+
 @router.get("/export/combined")
-def export_combined_data(
+async def export_combined_data(
+    request: Request,
     produccion: bool = False,
     demanda: bool = False,
     regalias: bool = False,
     fecha_inicio: Optional[str] = None,
     fecha_fin: Optional[str] = None,
-    format: str = 'csv', # csv or excel (tab-separated)
-    db: Session = Depends(get_db)
+    format: str = 'csv', # csv, excel (tab-separated), pdf, arrow or parquet
+    db: Session = Depends(get_read_db)
 ):
     """
     Stream combined data export to avoid high RAM usage.
@@ -601,39 +727,38 @@ def export_combined_data(
     
     # ... (CSV/Excel logic remains) ...
     
-    if format == 'pdf':
-        from reports import PDFReportGenerator
-        
-        # Gather Data for Report
-        # 1. KPIs
-        kpis = get_stats_kpis(db)
-        
-        # 2. Top Operators
-        # Reusing logic from get_production_ranking
-        top_ops_query = db.query(
-            models.Production.operadora.label('name'),
-            func.sum(models.Production.produccion_mensual).label('total')
-        ).group_by(models.Production.operadora).order_by(desc('total')).limit(5).all()
-        
-        total_prod = db.query(func.sum(models.Production.produccion_mensual)).scalar() or 1
-        top_operators = [{"name": r.name, "value": (r.total / total_prod) * 100} for r in top_ops_query]
-        
-        # 3. Regional Balance
-        regional_balance = get_stats_regional_balance(db)
-        
-        report_data = {
-            "kpis": kpis,
-            "top_operators": top_operators,
-            "regional_balance": regional_balance
-        }
-        
-        pdf_buffer = PDFReportGenerator().generate(report_data)
+    # Helper to parse dates
+    start_year, start_month = (None, None)
+    end_year, end_month = (None, None)
+    
+    if fecha_inicio:
+        try:
+            dt = datetime.strptime(fecha_inicio, '%Y-%m-%d')
+            start_year, start_month = dt.year, dt.month
+        except: pass
         
-        return StreamingResponse(
-            pdf_buffer,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename=SIMGN_Informe_Ejecutivo_{datetime.now().strftime('%Y%m%d')}.pdf"}
-        )
+    if fecha_fin:
+        try:
+            dt = datetime.strptime(fecha_fin, '%Y-%m-%d')
+            end_year, end_month = dt.year, dt.month
+        except: pass
+
+    if format == 'pdf':
+        # The executive report for the year of fecha_fin, served like a static file.
+        # A miss (rare: the ETL pre-renders) renders on the heavy pool.
+        path, digest, year = await run_heavy(stored_executive_report, db, end_year)
+        headers = {"ETag": f'"{digest}"', "Cache-Control": "no-cache"}
+        if cache.etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        return FileResponse(path, media_type="application/pdf",
+                            filename=f"SIMGN_Informe_Ejecutivo_{year}.pdf", headers=headers)
+
+    fmt = columnar.negotiate(request, format)
+    if fmt:
+        statements = export_statements(produccion, demanda, regalias, start_year, end_year)
+        if not statements:
+            raise HTTPException(status_code=400, detail="Seleccione al menos un conjunto de datos")
+        return columnar.columnar_response(db, statements, fmt, "SIMGN_Informe")
 
     delimiter = ',' if format == 'csv' else '\t'
     
@@ -647,93 +772,10 @@ def export_combined_data(
         output.seek(0)
         output.truncate(0)
         
-        # Helper to parse dates
-        start_year, start_month = (None, None)
-        end_year, end_month = (None, None)
-        
-        if fecha_inicio:
-            try:
-                dt = datetime.strptime(fecha_inicio, '%Y-%m-%d')
-                start_year, start_month = dt.year, dt.month
-            except: pass
-            
-        if fecha_fin:
-            try:
-                dt = datetime.strptime(fecha_fin, '%Y-%m-%d')
-                end_year, end_month = dt.year, dt.month
-            except: pass
-
-        # 1. Production Data
-        if produccion:
-            query = db.query(models.Production)
-            if start_year:
-                query = query.filter(models.Production.anio >= start_year)
-            if end_year:
-                query = query.filter(models.Production.anio <= end_year)
-                
-            for row in query.yield_per(1000):
-                writer.writerow([
-                    row.id,
-                    'Producción',
-                    row.anio,
-                    row.mes,
-                    f"{row.departamento} - {row.municipio}",
-                    row.campo,
-                    row.produccion_mensual,
-                    'KPC', # Assuming KPC based on models comment
-                    'ANH',
-                    'Sí'
-                ])
-                yield output.getvalue()
-                output.seek(0)
-                output.truncate(0)
-
-        # 2. Demand Data
-        if demanda:
-            query = db.query(models.Demand)
-            if start_year:
-                query = query.filter(models.Demand.anio >= start_year)
-            if end_year:
-                query = query.filter(models.Demand.anio <= end_year)
-                
-            for row in query.yield_per(1000):
-                writer.writerow([
-                    row.id,
-                    'Demanda',
-                    row.anio,
-                    row.mes,
-                    row.region,
-                    row.sector,
-                    row.demanda,
-                    'GBTUD',
-                    'XM',
-                    'Sí'
-                ])
-                yield output.getvalue()
-                output.seek(0)
-                output.truncate(0)
-
-        # 3. Royalties Data
-        if regalias:
-            query = db.query(models.Royalty)
-            if start_year:
-                query = query.filter(models.Royalty.anio >= start_year)
-            if end_year:
-                query = query.filter(models.Royalty.anio <= end_year)
-                
-            for row in query.yield_per(1000):
-                writer.writerow([
-                    row.id,
-                    'Regalías',
-                    row.anio,
-                    row.mes,
-                    f"{row.departamento} - {row.municipio}",
-                    row.campo,
-                    row.valor_liquidado,
-                    'COP',
-                    'ANM',
-                    'Sí'
-                ])
+        # Production, Demand and Royalties, as plain tuples in batches
+        for statement in export_statements(produccion, demanda, regalias, start_year, end_year):
+            for rows in queries.iter_batches(db, statement):
+                writer.writerows(rows)
                 yield output.getvalue()
                 output.seek(0)
                 output.truncate(0)
@@ -747,22 +789,21 @@ def export_combined_data(
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
 @router.get("/production/stats")
-def get_production_stats(db: Session = Depends(get_db)):
-    total_prod = db.query(models.Production).with_entities(models.Production.produccion_mensual).all()
-    total = sum([v[0] for v in total_prod if v[0]])
-    count = db.query(models.Production).count()
-    return {"total_records": count, "total_production_kpc": total}
+def get_production_stats(db: Session = Depends(get_read_db)):
+    count, total = db.execute(select(func.count(), func.sum(models.Production.produccion_mensual))).one()
+    return {"total_records": count, "total_production_kpc": total or 0}
 
 # --- Demand Endpoints ---
 @router.get("/demand", response_model=List[schemas.Demand])
-def get_demand(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    demand = db.query(models.Demand).offset(skip).limit(limit).all()
-    return demand
+def get_demand(skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db)):
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    statement = select(*models.Demand.__table__.columns).order_by(models.Demand.id).offset(skip).limit(limit)
+    return JSONResponse(queries.fetch_dicts(db, statement))
 
 # --- Demand Aggregation Endpoints ---
 
 @router.get("/demand/kpis")
-def get_demand_kpis(db: Session = Depends(get_db)):
+def get_demand_kpis(db: Session = Depends(get_read_db)):
     """
     Get aggregated KPIs for Demand: Total Real, Total Projected, Deviation.
     Real < 2024, Projected >= 2024.
@@ -785,16 +826,17 @@ def get_demand_kpis(db: Session = Depends(get_db)):
     }
 
 @router.get("/demand/trend")
-def get_demand_trend(db: Session = Depends(get_db)):
+def get_demand_trend(db: Session = Depends(get_read_db)):
     """
     Get demand trend (Time Series).
     Returns list of { name: 'YYYY-MM', real: float|None, projected: float|None }
     """
+    M = aggregates.source(db, models.Demand)
     results = db.query(
-        models.Demand.anio,
-        models.Demand.mes,
-        func.sum(models.Demand.demanda).label("total")
-    ).group_by(models.Demand.anio, models.Demand.mes).all()
+        M.anio,
+        M.mes,
+        func.sum(M.demanda).label("total")
+    ).group_by(M.anio, M.mes).all()
     
     data = []
     for r in results:
@@ -811,14 +853,15 @@ def get_demand_trend(db: Session = Depends(get_db)):
     return data
 
 @router.get("/demand/sector")
-def get_demand_by_sector(db: Session = Depends(get_db)):
+def get_demand_by_sector(db: Session = Depends(get_read_db)):
     """
     Get demand distribution by sector.
     """
+    M = aggregates.source(db, models.Demand)
     results = db.query(
-        models.Demand.sector,
-        func.sum(models.Demand.demanda).label("total")
-    ).group_by(models.Demand.sector).all()
+        M.sector,
+        func.sum(M.demanda).label("total")
+    ).group_by(M.sector).all()
     
     return [
         {"name": r.sector or "Desconocido", "value": r.total}
@@ -827,20 +870,21 @@ def get_demand_by_sector(db: Session = Depends(get_db)):
     ]
 
 @router.get("/demand/sectors")
-def get_demand_sectors_trend(db: Session = Depends(get_db)):
+def get_demand_sectors_trend(db: Session = Depends(get_read_db)):
     """
     Get demand trend by sector (Stacked Area Chart data).
     Returns: [{ "year": 2024, "Industrial": 120, "Residencial": 80, ... }, ...]
     """
     # Query sum of demand by Year and Sector (Scenario Medio)
+    M = aggregates.source(db, models.Demand)
     results = db.query(
-        models.Demand.anio,
-        models.Demand.sector,
-        func.sum(models.Demand.demanda).label("total")
+        M.anio,
+        M.sector,
+        func.sum(M.demanda).label("total")
     ).filter(
-        models.Demand.escenario == 'Medio',
-        models.Demand.sector != 'Agregado' # Exclude aggregate if present
-    ).group_by(models.Demand.anio, models.Demand.sector).all()
+        M.escenario == 'Medio',
+        M.sector != 'Agregado' # Exclude aggregate if present
+    ).group_by(M.anio, M.sector).all()
     
     # Pivot Data
     data_by_year = {}
@@ -855,17 +899,18 @@ def get_demand_sectors_trend(db: Session = Depends(get_db)):
     return final_data
 
 @router.get("/demand/scenarios")
-def get_demand_scenarios(db: Session = Depends(get_db)):
+def get_demand_scenarios(db: Session = Depends(get_read_db)):
     """
     Get demand scenarios (Real vs Projected) pivoted for Recharts.
     Returns: [{ "year": 2024, "Bajo": 100, "Medio": 120, "Alto": 140 }, ...]
     """
     # Filter for 'Agregado' sector to get totals
+    M = aggregates.source(db, models.Demand)
     results = db.query(
-        models.Demand.anio,
-        models.Demand.escenario,
-        func.sum(models.Demand.demanda).label("total")
-    ).filter(models.Demand.sector == 'Agregado').group_by(models.Demand.anio, models.Demand.escenario).all()
+        M.anio,
+        M.escenario,
+        func.sum(M.demanda).label("total")
+    ).filter(M.sector == 'Agregado').group_by(M.anio, M.escenario).all()
     
     # Pivot Data
     data_by_year = {}
@@ -883,8 +928,11 @@ def get_demand_scenarios(db: Session = Depends(get_db)):
     return final_data
 
 @router.get("/demand/balance")
-def get_demand_balance(db: Session = Depends(get_db)):
+async def get_demand_balance(db: Session = Depends(get_read_db)):
     """Get Supply (Production) vs Demand (High Scenario) Balance"""
+    return await run_heavy(demand_balance, db)
+
+def demand_balance(db: Session):
     # 1. Get Demand (High Scenario)
     demand_query = db.query(
         models.Demand.anio,
@@ -909,182 +957,44 @@ def get_demand_balance(db: Session = Depends(get_db)):
     
     prod_dict = {row.anio: row.production for row in prod_query}
     
-    # Combine
-    years = sorted(list(set(demand_dict.keys()) | set(prod_dict.keys())))
-    result = []
-    
-    # Simple heuristic for future production: use last known year's production
-    last_prod_year = max(prod_dict.keys()) if prod_dict else 0
-    last_prod_val = prod_dict.get(last_prod_year, 0)
-    
-    for year in years:
-        if year < 2024: continue # Focus on future balance
-        
-        d_val = demand_dict.get(year, 0)
-        # Use actual production if available, else flat projection of last known
-        p_val = prod_dict.get(year, last_prod_val) 
-        
-        # Convert Production to GBTUD if needed. 
-        # Production is usually in KPC (thousands of cubic feet). 
-        # 1 GBTU = 1 KPC (approx, varies by heating value).
-        # So KPC/month / 30 = KPC/day = GBTUD (approx).
-        
-        p_val_gbtud = (p_val / 365) if p_val > 0 else 0 # Annual KPC -> Daily KPC (GBTUD)
-        
-        result.append({
-            "year": year,
-            "demand": d_val,
-            "production": p_val_gbtud,
-            "deficit": d_val - p_val_gbtud if d_val > p_val_gbtud else 0
-        })
-        
-    return result
+    return dashboards.supply_demand_balance(demand_dict, prod_dict)
 
 # --- Statistics / Strategic Dashboard Endpoints ---
 
 @router.get("/stats/kpis")
-def get_stats_kpis(db: Session = Depends(get_db)):
+async def get_stats_kpis(db: Session = Depends(get_read_db)):
     """Get Global KPIs for the Dashboard"""
-    current_year = 2023 # Or dynamic
-    
-    # 1. Total Production (Annual)
-    prod_total = db.query(func.sum(models.Production.produccion_mensual)).filter(models.Production.anio == current_year).scalar() or 0
-    prod_avg_gbtud = (prod_total / 365) # KPC/year -> GBTUD (approx)
-    
-    # 2. Total Royalties (Annual & Historical)
-    royalty_annual = db.query(func.sum(models.Royalty.valor_liquidado)).filter(models.Royalty.anio == current_year).scalar() or 0
-    royalty_total_historical = db.query(func.sum(models.Royalty.valor_liquidado)).scalar() or 0
-    
-    # 3. Total Demand (Annual - Real or Projected)
-    demand_total = db.query(func.sum(models.Demand.demanda)).filter(
-        models.Demand.anio == current_year,
-        models.Demand.escenario == 'Medio', # Use Medio as baseline
-        models.Demand.sector == 'Agregado',
-        models.Demand.region == 'Nacional'
-    ).scalar() or 0
-    
-    # 4. Coverage Ratio
-    coverage = (prod_avg_gbtud / demand_total * 100) if demand_total > 0 else 0
-    
-    return {
-        "year": current_year,
-        "production_avg_gbtud": prod_avg_gbtud,
-        "royalties_annual_cop": royalty_annual,
-        "royalties_total_historical_cop": royalty_total_historical,
-        "demand_avg_gbtud": demand_total, 
-        "coverage_ratio": coverage
-    }
+    return await run_heavy(stats_kpis, db)
+
+def stats_kpis(db: Session):
+    return report_data(db)["kpis"]
 
 @router.get("/stats/production-vs-royalties")
-def get_stats_prod_vs_royalties(db: Session = Depends(get_db)):
+async def get_stats_prod_vs_royalties(db: Session = Depends(get_read_db)):
     """Get Time Series for Production Volume vs Royalties Value"""
-    # Production by Year
-    prod_query = db.query(
-        models.Production.anio,
-        func.sum(models.Production.produccion_mensual).label('volume')
-    ).group_by(models.Production.anio).all()
-    
-    prod_map = {r.anio: r.volume for r in prod_query}
-    
-    # Royalties by Year
-    roy_query = db.query(
-        models.Royalty.anio,
-        func.sum(models.Royalty.valor_liquidado).label('value')
-    ).group_by(models.Royalty.anio).all()
-    
-    roy_map = {r.anio: r.value for r in roy_query}
-    
-    years = sorted(list(set(prod_map.keys()) | set(roy_map.keys())))
-    
-    result = []
-    for y in years:
-        p_vol = prod_map.get(y, 0)
-        r_val = roy_map.get(y, 0)
-        
-        # Only include years where we have BOTH data points (Intersection)
-        # This avoids showing drops to zero for future projections or missing historical data
-        if p_vol > 0 and r_val > 0:
-            result.append({
-                "year": y,
-                "production_vol": p_vol,
-                "royalties_val": r_val
-            })
-            
-    return result
+    return await run_heavy(stats_prod_vs_royalties, db)
+
+def stats_prod_vs_royalties(db: Session):
+    return report_data(db)["production_vs_royalties"]
 
 @router.get("/stats/regional-balance")
-def get_stats_regional_balance(db: Session = Depends(get_db)):
+async def get_stats_regional_balance(db: Session = Depends(get_read_db)):
     """Get Supply vs Demand by Department"""
-    # 1. Production by Department (Supply)
-    prod_query = db.query(
-        models.Production.departamento,
-        func.sum(models.Production.produccion_mensual).label('volume')
-    ).filter(models.Production.anio == 2023).group_by(models.Production.departamento).all()
-    
-    supply_map = {r.departamento: (r.volume / 365) for r in prod_query} # GBTUD
-    
-    # 2. Demand by Region (Demand) -> Map to Departments
-    demand_query = db.query(
-        models.Demand.region,
-        func.sum(models.Demand.demanda).label('demand')
-    ).filter(
-        models.Demand.anio == 2023,
-        models.Demand.escenario == 'Medio',
-        models.Demand.sector == 'Agregado'
-    ).group_by(models.Demand.region).all()
-    
-    # Mapping Logic (UPME Region -> Departments)
-    mapping = {
-        'Costa Atlántica': ['Atlántico', 'La Guajira', 'Magdalena'],
-        'Costa Interior': ['Bolívar', 'Cesar', 'Córdoba', 'Sucre'],
-        'Centro': ['Bogotá D.C.', 'Cundinamarca', 'Boyacá', 'Meta'],
-        'NorOccidente': ['Antioquia', 'Chocó'],
-        'SurOccidente': ['Valle del Cauca', 'Cauca', 'Nariño'],
-        'NorOriente': ['Santander', 'Norte de Santander', 'Arauca'],
-        'Tolima-Huila': ['Tolima', 'Huila'],
-        'CQR': ['Casanare'],
-        'Magdalena Medio': ['Santander'],
-    }
-    
-    dept_demand = {}
-    
-    for r in demand_query:
-        region = r.region
-        val = r.demand
-        depts = mapping.get(region, [])
-        if not depts: continue
-        
-        val_per_dept = val / len(depts)
-        for d in depts:
-            dept_demand[d] = dept_demand.get(d, 0) + val_per_dept
-            
-    # Combine
-    all_depts = set(supply_map.keys()) | set(dept_demand.keys())
-    result = []
-    
-    for d in all_depts:
-        s = supply_map.get(d, 0)
-        dem = dept_demand.get(d, 0)
-        balance = s - dem
-        result.append({
-            "department": d,
-            "supply": s,
-            "demand": dem,
-            "balance": balance,
-            "status": "Superávit" if balance > 0 else "Déficit"
-        })
-        
-    return sorted(result, key=lambda x: x['balance'], reverse=True)
+    return await run_heavy(stats_regional_balance, db)
+
+def stats_regional_balance(db: Session):
+    return report_data(db)["regional_balance"]
 
 @router.get("/demand/region")
-def get_demand_by_region(db: Session = Depends(get_db)):
+def get_demand_by_region(db: Session = Depends(get_read_db)):
     """
     Get demand distribution by region.
     """
+    M = aggregates.source(db, models.Demand)
     results = db.query(
-        models.Demand.region,
-        func.sum(models.Demand.demanda).label("total")
-    ).group_by(models.Demand.region).all()
+        M.region,
+        func.sum(M.demanda).label("total")
+    ).group_by(M.region).all()
     
     return [
         {"name": r.region or "Desconocido", "value": r.total}
@@ -1093,52 +1003,34 @@ def get_demand_by_region(db: Session = Depends(get_db)):
     ]
 
 @router.get("/demand/map")
-def get_demand_map(db: Session = Depends(get_db)):
+def get_demand_map(db: Session = Depends(get_read_db)):
     """
     Get demand distribution mapped to departments for the map visualization.
     """
     # Query demand by region
+    M = aggregates.source(db, models.Demand)
     results = db.query(
-        models.Demand.region,
-        func.sum(models.Demand.demanda).label("total")
-    ).group_by(models.Demand.region).all()
-    
-    # Mapping from UPME Regions to Departments
-    mapping = {
-        'Costa Atlántica': ['Atlántico', 'La Guajira', 'Magdalena'],
-        'Costa Interior': ['Bolívar', 'Cesar', 'Córdoba', 'Sucre'],
-        'Centro': ['Bogotá D.C.', 'Cundinamarca', 'Boyacá', 'Meta'],
-        'NorOccidente': ['Antioquia', 'Chocó'],
-        'SurOccidente': ['Valle del Cauca', 'Cauca', 'Nariño'],
-        'NorOriente': ['Santander', 'Norte de Santander', 'Arauca'],
-        'Tolima-Huila': ['Tolima', 'Huila'],
-        'CQR': ['Casanare'],
-        'Magdalena Medio': ['Santander'],
-    }
+        M.region,
+        func.sum(M.demanda).label("total")
+    ).group_by(M.region).all()
     
-    dept_demand = {}
-    
-    for r in results:
-        region = r.region
-        val = r.total
-        if not val or val <= 0: continue
-        
-        depts = mapping.get(region, [])
-        if not depts: continue
-        
-        # Distribute regional demand evenly among departments in that region
-        val_per_dept = val / len(depts)
-        for d in depts:
-            dept_demand[d] = dept_demand.get(d, 0) + val_per_dept
+    # Distribute regional demand evenly among departments in that region
+    dept_demand = dashboards.spread_over_departments(
+        (r.region, r.total) for r in results if r.total and r.total > 0
+    )
             
     return [
         {"name": k, "value": v}
         for k, v in dept_demand.items()
     ]
 
+@router.get("/demand/dashboard")
+async def get_demand_dashboard(db: Session = Depends(get_read_db)):
+    """Every Demand widget (kpis, trend, sector, region, scenarios, sectors, map, balance) from one grouped scan"""
+    # The balance widget scans the raw production table: heavy pool, like /demand/balance
+    return await run_heavy(dashboards.demand_dashboard, db)
+
 @router.get("/demand/stats")
-def get_demand_stats(db: Session = Depends(get_db)):
-    total_demand = db.query(models.Demand).with_entities(models.Demand.demanda).all()
-    total = sum([v[0] for v in total_demand if v[0]])
-    count = db.query(models.Demand).count()
-    return {"total_records": count, "total_demand_gbtud": total}
+def get_demand_stats(db: Session = Depends(get_read_db)):
+    count, total = db.execute(select(func.count(), func.sum(models.Demand.demanda))).one()
+    return {"total_records": count, "total_demand_gbtud": total or 0}
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class RoyaltyBase(BaseModel):
@@ -61,3 +61,13 @@ class Demand(DemandBase):
 
     class Config:
         from_attributes = True
+
+# --- Paginated raw endpoints ---
+
+class RoyaltyPage(BaseModel):
+    items: List[Royalty]
+    next_cursor: Optional[str] = None
+
+class ProductionPage(BaseModel):
+    items: List[Production]
+    next_cursor: Optional[str] = None
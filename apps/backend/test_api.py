@@ -35,7 +35,7 @@ def test_api():
         print("\n3️⃣ Probando /api/royalties?limit=2...")
         response = requests.get(f"{BASE_URL}/api/royalties?limit=2", timeout=5)
         if response.status_code == 200:
-            data = response.json()
+            data = response.json()["items"]
             print(f"   ✅ Status: {response.status_code}")
             print(f"   📊 Registros recibidos: {len(data)}")
             if data:
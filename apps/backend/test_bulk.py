@@ -0,0 +1,99 @@
+"""
+Pruebas de la carga masiva (etl/bulk.py) sobre una base SQLite temporal.
+"""
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import Production, ProductionMonthly, Royalty
+from etl.bulk import bulk_load
+from etl.state import get_state, set_state
+from etl.staging import ensure_indexes, rollback_generation, index_names
+
+def temp_engine(directory):
+    engine = create_engine(f"sqlite:///{os.path.join(directory, 'bulk.db')}")
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+def test_bulk_load_frames_and_arrow():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = temp_engine(tmp)
+        df = pd.DataFrame({
+            'campo': pd.Categorical(['APIAY', 'CUSIANA', 'APIAY']),
+            'operadora': ['ECOPETROL', None, 'ECOPETROL'],
+            'anio': [2022, 2023, 2023],
+            'mes': [1, 2, 3],
+            'produccion_mensual': [10.5, np.nan, 3.0],
+            'source_file': ['a.xlsx'] * 3,  # columnas ajenas al modelo se ignoran
+        })
+        assert bulk_load(Production, df, batch_size=2, bind=engine) == 3
+
+        db = sessionmaker(bind=engine)()
+        rows = db.query(Production).order_by(Production.id).all()
+        assert [r.campo for r in rows] == ['APIAY', 'CUSIANA', 'APIAY']
+        assert rows[1].operadora is None and rows[1].produccion_mensual is None
+        assert rows[2].anio == 2023 and rows[0].fecha_carga is not None
+
+        # Lotes Arrow, enteros con huecos y reemplazo del contenido previo
+        table = pa.table({'departamento': ['Meta', 'Casanare'], 'anio': [2021.0, None],
+                          'valor_liquidado': [1.0, 2.0]})
+        bulk_load(Royalty, table.to_batches(max_chunksize=1), bind=engine)
+        bulk_load(Royalty, table, bind=engine)
+        royalties = db.query(Royalty).order_by(Royalty.id).all()
+        assert [(r.departamento, r.anio) for r in royalties] == [('Meta', 2021), ('Casanare', None)]
+        db.close()
+
+        # Los pragmas de carga no quedan aplicados en la conexión
+        raw = engine.raw_connection()
+        assert raw.cursor().execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+        raw.close()
+        engine.dispose()
+
+def test_reload_swaps_generations_and_rolls_back():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = temp_engine(tmp)
+        first = pd.DataFrame({'campo': ['A'] * 5, 'anio': 2022, 'mes': 1, 'produccion_mensual': 1.0})
+        second = pd.DataFrame({'campo': ['B'] * 3, 'anio': 2023, 'mes': 1, 'produccion_mensual': 2.0})
+        bulk_load(Production, first, bind=engine)
+
+        # Un lector con conexión abierta ve siempre una generación completa
+        reader = engine.connect()
+        count = lambda: reader.exec_driver_sql("SELECT count(*) FROM production").scalar()
+        assert count() == 5
+        bulk_load(Production, second, bind=engine)
+        assert count() == 3
+
+        raw = engine.raw_connection()
+        cursor = raw.cursor()
+        live = index_names(cursor, "production")
+        previous = index_names(cursor, "production__previous")
+        raw.close()
+        # Cada generación conserva sus índices, cada una en su slot de nombres
+        assert len(live) == len(previous) == len(Production.__table__.indexes)
+        assert live.isdisjoint(previous)
+
+        ensure_indexes(engine, Base.metadata)  # no duplica índices en el slot alternativo
+        raw = engine.raw_connection()
+        assert index_names(raw.cursor(), "production") == live
+        raw.close()
+
+        set_state("production.fingerprint", "second", bind=engine)
+        assert rollback_generation(Production.__table__, bind=engine)
+        assert count() == 5
+        # Cubos reconstruidos sobre la generación restaurada y huella olvidada
+        cube = reader.exec_driver_sql(f"SELECT campo, registros FROM {ProductionMonthly.__tablename__}").fetchall()
+        assert cube == [('A', 5)]
+        assert get_state("production.fingerprint", bind=engine) is None
+        reader.close()
+        engine.dispose()
+
+if __name__ == "__main__":
+    test_bulk_load_frames_and_arrow()
+    test_reload_swaps_generations_and_rolls_back()
+    print("✅ Carga masiva OK")
@@ -0,0 +1,161 @@
+"""
+Tests for the response cache (cache.py): keys, ETag/304, generation
+invalidation and the LRU byte budget.
+"""
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+
+from database import Base
+from cache import MemoryCache, ResponseCache, SQLiteCache, TieredCache
+from etl.state import bump_generation, get_state, GENERATION_KEY
+
+def build_app(backend, generation):
+    app = FastAPI()
+    calls = []
+
+    @app.get("/api/items")
+    def items(a: int = 0, b: int = 0):
+        calls.append((a, b))
+        return {"a": a, "b": b, "calls": len(calls)}
+
+    @app.get("/api/stream")
+    def stream():
+        calls.append("stream")
+        return StreamingResponse(iter([b"x,y\n", b"1,2\n"]), media_type="text/csv")
+
+    app.add_middleware(ResponseCache, backend=backend, generation=lambda: generation["value"])
+    return TestClient(app), calls
+
+def test_hits_etag_and_generation():
+    generation = {"value": "1"}
+    client, calls = build_app(MemoryCache(), generation)
+
+    first = client.get("/api/items?a=1&b=2")
+    assert first.headers["x-cache"] == "MISS" and first.headers["etag"].startswith('"1-')
+    # Same parameters in another order share the entry
+    second = client.get("/api/items?b=2&a=1")
+    assert second.headers["x-cache"] == "HIT" and second.json() == first.json()
+    assert len(calls) == 1
+
+    # Revalidation with the ETag answers 304 without a body
+    not_modified = client.get("/api/items?a=1&b=2", headers={"If-None-Match": first.headers["etag"]})
+    assert not_modified.status_code == 304 and not_modified.content == b""
+    assert not_modified.headers["etag"] == first.headers["etag"]
+
+    # A new dataset generation invalidates everything
+    generation["value"] = "2"
+    fresh = client.get("/api/items?a=1&b=2", headers={"If-None-Match": first.headers["etag"]})
+    assert fresh.status_code == 200 and fresh.headers["x-cache"] == "MISS"
+    assert fresh.json()["calls"] == 2
+
+    # Streamed bodies pass through and are never stored
+    assert client.get("/api/stream").text == "x,y\n1,2\n"
+    assert client.get("/api/stream").text == "x,y\n1,2\n"
+    assert calls.count("stream") == 2
+
+def test_lru_budget_and_ttl():
+    lru = MemoryCache(max_bytes=10)
+    lru.set("a", b"1234")
+    lru.set("b", b"1234")
+    assert lru.get("a") == b"1234"  # "a" becomes most recently used
+    lru.set("c", b"1234")
+    assert lru.get("b") is None and lru.get("a") and lru.get("c")
+    assert lru.size == 8 and lru.evictions == 1
+    lru.set("huge", b"x" * 11)
+    assert lru.get("huge") is None
+
+    lru.set("short", b"1", ttl=-1)
+    assert lru.get("short") is None
+
+def test_sqlite_backend_shared_between_processes():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.db")
+        shared = SQLiteCache(path, max_bytes=1000)
+        shared.set("a", b"x" * 100)
+        shared.set("gone", b"x", ttl=-1)
+        assert shared.get("gone") is None
+
+        # Another process sees the entry and writes its own
+        code = ("import sys; from cache import SQLiteCache; c = SQLiteCache(sys.argv[1]); "
+                "assert c.get('a') == b'x' * 100; c.set('b', b'from child')")
+        subprocess.run([sys.executable, "-c", code, path], check=True,
+                       cwd=os.path.dirname(os.path.abspath(__file__)))
+        assert shared.get("b") == b"from child"
+
+        # Size-bounded eviction drops the least recently used entries
+        for i in range(SQLiteCache.EVICT_EVERY):
+            shared.set(f"k{i}", b"y" * 100)
+        assert shared.evictions > 0  # triggered by the writes themselves
+        shared.evict()
+        assert shared.stats()["bytes"] <= 900
+        newest = f"k{SQLiteCache.EVICT_EVERY - 1}"
+        assert shared.get("a") is None and shared.get(newest) == b"y" * 100
+
+        # The memory tier keeps shared hits for the next request
+        tiered = TieredCache(MemoryCache(), shared)
+        assert tiered.get(newest) == b"y" * 100 and tiered.local.get(newest) == b"y" * 100
+
+class ThreadRecordingCache(MemoryCache):
+    def __init__(self):
+        super().__init__()
+        self.threads = set()
+
+    def get(self, key):
+        self.threads.add(threading.current_thread().name)
+        return super().get(key)
+
+    def set(self, key, value, ttl=None):
+        self.threads.add(threading.current_thread().name)
+        super().set(key, value, ttl)
+
+def test_backend_calls_off_the_event_loop_and_busy_cache_skipped():
+    backend = ThreadRecordingCache()
+    client, _calls = build_app(backend, {"value": "1"})
+    client.get("/api/items")
+    assert client.get("/api/items").headers["x-cache"] == "HIT"
+    assert backend.threads and all(name.startswith("cache") for name in backend.threads)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.db")
+        shared = SQLiteCache(path)
+        shared.set("kept", b"v")
+        writer = sqlite3.connect(path, isolation_level=None)
+        writer.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process holds the write lock: the store is skipped at once, reads still work
+            start = time.perf_counter()
+            shared.set("late", b"v")
+            assert time.perf_counter() - start < 1
+            assert shared.get("kept") == b"v"
+        finally:
+            writer.execute("ROLLBACK")
+            writer.close()
+        assert shared.get("late") is None
+
+def test_bump_generation():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'state.db')}")
+        Base.metadata.create_all(bind=engine)
+        assert get_state(GENERATION_KEY, bind=engine) is None
+        assert bump_generation(bind=engine) == 1
+        assert bump_generation(bind=engine) == 2
+        assert get_state(GENERATION_KEY, bind=engine) == "2"
+        engine.dispose()
+
+if __name__ == "__main__":
+    test_hits_etag_and_generation()
+    test_lru_budget_and_ttl()
+    test_sqlite_backend_shared_between_processes()
+    test_backend_calls_off_the_event_loop_and_busy_cache_skipped()
+    test_bump_generation()
+    print("✅ Caché de respuestas OK")
@@ -0,0 +1,110 @@
+"""
+Tests for the columnar responses (columnar.py): format negotiation through
+the Accept header and ?format=, Arrow IPC and Parquet bodies that read back
+to the same rows as the JSON pages, and the JSON fallback.
+"""
+import datetime
+import io
+import tempfile
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import columnar
+import models
+from columnar import ARROW_STREAM, PARQUET
+from test_pagination import build_client
+
+def read_rows(response):
+    """Rows of an Arrow stream or Parquet body, with timestamps as in the JSON response."""
+    body = io.BytesIO(response.content)
+    if response.headers["content-type"] == PARQUET:
+        table = pq.read_table(body)
+    else:
+        table = pa.ipc.open_stream(body).read_all()
+    return [
+        {k: v.isoformat() if isinstance(v, datetime.datetime) else v for k, v in row.items()}
+        for row in table.to_pylist()
+    ]
+
+def json_rows(client, path, **params):
+    return client.get(path, params={**params, "limit": 1000}).json()["items"]
+
+def test_negotiation_by_accept_header_and_format_param():
+    with tempfile.TemporaryDirectory() as tmp:
+        client, engine = build_client(tmp)
+        try:
+            cases = [
+                ({"accept": ARROW_STREAM}, {}, ARROW_STREAM),
+                ({"accept": f"{PARQUET}, application/json;q=0.5"}, {}, PARQUET),
+                ({}, {"format": "arrow"}, ARROW_STREAM),
+                ({}, {"format": "parquet"}, PARQUET),
+                # An explicit ?format= wins over the Accept header
+                ({"accept": ARROW_STREAM}, {"format": "parquet"}, PARQUET),
+            ]
+            for headers, params, media_type in cases:
+                response = client.get("/api/production", headers=headers, params=params)
+                assert response.status_code == 200
+                assert response.headers["content-type"] == media_type
+                extension = columnar.EXTENSIONS["parquet" if media_type == PARQUET else "arrow"]
+                assert response.headers["content-disposition"].endswith(f"produccion.{extension}")
+        finally:
+            engine.dispose()
+
+def test_arrow_and_parquet_bodies_match_json():
+    with tempfile.TemporaryDirectory() as tmp:
+        client, engine = build_client(tmp)
+        try:
+            for path, params in (("/api/production", {}),
+                                 ("/api/production", {"campo": "CAMPO 2", "fields": "campo,produccion_mensual"}),
+                                 ("/api/royalties", {"anio_min": 2022})):
+                expected = json_rows(client, path, **params)
+                assert expected
+                for fmt in ("arrow", "parquet"):
+                    response = client.get(path, params={**params, "format": fmt})
+                    assert read_rows(response) == expected
+
+            # The combined export streams every dataset in one body
+            response = client.get("/api/export/combined",
+                                  params={"produccion": True, "regalias": True, "format": "arrow"})
+            rows = read_rows(response)
+            assert len(rows) == 23 + 7 and {row["tipo"] for row in rows} == {"Producción", "Regalías"}
+        finally:
+            engine.dispose()
+
+def test_columnar_body_is_streamed_in_batches():
+    with tempfile.TemporaryDirectory() as tmp:
+        client, engine = build_client(tmp)
+        try:
+            statement = select(*models.Production.__table__.columns).order_by(models.Production.id)
+            with Session(engine) as db:
+                chunks = list(columnar._iter_columnar(db, [statement], "arrow", batch_size=5))
+            # One chunk per batch of 5 rows plus the end-of-stream marker
+            assert len(chunks) == 5 + 1
+            table = pa.ipc.open_stream(b"".join(chunks)).read_all()
+            assert table.num_rows == 23 and [b.num_rows for b in table.to_batches()] == [5, 5, 5, 5, 3]
+        finally:
+            engine.dispose()
+
+def test_json_fallback():
+    with tempfile.TemporaryDirectory() as tmp:
+        client, engine = build_client(tmp)
+        try:
+            for headers, params in (({}, {}),
+                                    ({"accept": "application/json"}, {}),
+                                    ({"accept": "text/csv"}, {"format": "xml"})):
+                response = client.get("/api/royalties", headers=headers, params=params)
+                assert response.status_code == 200
+                assert response.headers["content-type"] == "application/json"
+                assert len(response.json()["items"]) == 7
+        finally:
+            engine.dispose()
+
+if __name__ == "__main__":
+    test_negotiation_by_accept_header_and_format_param()
+    test_arrow_and_parquet_bodies_match_json()
+    test_columnar_body_is_streamed_in_batches()
+    test_json_fallback()
+    print("✅ Formatos columnares OK")
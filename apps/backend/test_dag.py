@@ -0,0 +1,89 @@
+"""
+Pruebas del ejecutor de etapas del pipeline (etl/dag.py) con etapas falsas.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+from etl.dag import Stage, select_stages, run_dag
+
+def test_dag_parallel_sources_serialized_writes_and_report():
+    active_writers = []
+    overlap = []
+    lock = threading.Lock()
+
+    def extract(n):
+        def fn(_inputs):
+            time.sleep(0.2)
+            return pd.DataFrame({"x": range(n)})
+        return fn
+
+    def load(source):
+        def fn(inputs):
+            with lock:
+                active_writers.append(source)
+                overlap.append(len(active_writers))
+            time.sleep(0.1)
+            with lock:
+                active_writers.remove(source)
+            return len(inputs[f"{source}.extract"])
+        return fn
+
+    def broken(_inputs):
+        raise RuntimeError("sin conexión")
+
+    stages = [
+        Stage("a.extract", extract(10)),
+        Stage("a.load", load("a"), deps=["a.extract"], writes=True),
+        Stage("b.extract", extract(20)),
+        Stage("b.load", load("b"), deps=["b.extract"], writes=True),
+        Stage("c.extract", broken),
+        Stage("c.load", lambda i: 0, deps=["c.extract"], writes=True),
+        Stage("cubes", lambda i: {"t": 1}, after=["a.load", "b.load", "c.load"], writes=True),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "report.json")
+        report = run_dag(stages, workers=4, report_path=path)
+        with open(path, encoding="utf-8") as f:
+            assert json.load(f) == report
+
+    by_name = {e["name"]: e for e in report["stages"]}
+    # Las extracciones independientes corren a la vez; las cargas nunca se solapan
+    assert report["wall_s"] < 0.2 * 3 + 0.1 * 2
+    assert max(overlap) == 1
+    assert by_name["b.extract"]["rows"] == 20 and by_name["b.extract"]["bytes"] > 0
+    assert by_name["b.load"]["rows"] == 20
+    assert by_name["c.extract"]["status"] == "failed"
+    assert by_name["c.load"]["status"] == "skipped"
+    assert by_name["cubes"]["status"] == "ok"
+    assert by_name["cubes"]["start_s"] >= by_name["b.load"]["start_s"]
+    assert report["status"] == "failed"
+    assert all("cpu_s" in e and "wall_s" in e for e in report["stages"] if e["status"] != "skipped")
+
+def test_select_stages_pulls_dependencies():
+    stages = [
+        Stage("a.extract", None),
+        Stage("a.load", None, deps=["a.extract"]),
+        Stage("b.extract", None),
+        Stage("b.load", None, deps=["b.extract"]),
+        Stage("cubes", None, after=["a.load", "b.load"], triggered_by=["a.load", "b.load"]),
+    ]
+    names = lambda selected: [s.name for s in selected]
+    assert names(select_stages(stages, ["a.extract"])) == ["a.extract"]
+    assert names(select_stages(stages, ["a"])) == ["a.extract", "a.load", "cubes"]
+    assert names(select_stages(stages, None, skip=["cubes"])) == ["a.extract", "a.load", "b.extract", "b.load"]
+    assert names(select_stages(stages, ["*.extract"])) == ["a.extract", "b.extract"]
+    # Cualquier carga arrastra los cubos (y ellos no arrastran las demás cargas)
+    assert names(select_stages(stages, ["a.load"])) == ["a.extract", "a.load", "cubes"]
+    assert names(select_stages(stages, ["*.load"])) == ["a.extract", "a.load", "b.extract", "b.load", "cubes"]
+    assert names(select_stages(stages, ["b.load"], skip=["cubes"])) == ["b.extract", "b.load"]
+
+if __name__ == "__main__":
+    test_dag_parallel_sources_serialized_writes_and_report()
+    test_select_stages_pulls_dependencies()
+    print("✅ DAG OK")
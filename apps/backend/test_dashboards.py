@@ -0,0 +1,178 @@
+"""
+Tests for the composite dashboard payloads (dashboards.py): every widget
+must match its individual endpoint, on the raw tables and on the cubes, and
+the strategic report must describe the latest year with data.
+"""
+import os
+import tempfile
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+import dashboards
+import models
+from aggregates import refresh_aggregates
+from database import Base
+from routers import api
+
+PRODUCTION = [
+    # campo, operadora, departamento, anio, mes, produccion_mensual
+    ("CAMPO A", "OP 1", "Casanare", 2022, 1, 100.0),
+    ("CAMPO A", "OP 1", "Casanare", 2022, 2, 150.0),
+    ("CAMPO B", "OP 2", "Meta", 2022, 1, 40.0),
+    ("CAMPO C", "OP 2", "Meta", 2023, 3, 75.0),
+    ("CAMPO C", "OP 3", "Arauca", 2023, 3, None),
+    ("CAMPO D", "OP 3", "Arauca", 2024, 1, 9.0),
+]
+
+ROYALTIES = [
+    # departamento, municipio, campo, anio, mes, tipo_hidrocarburo, valor, volumen, precio
+    ("CASANARE", "YOPAL", "CAMPO A", 2022, 1, "O", 1000.0, 10.0, 80.0),
+    ("CASANARE", "AGUAZUL", "CAMPO A", 2022, 1, "G", 500.0, 4.0, None),
+    ("META", "PUERTO GAITAN", "CAMPO B", 2022, 2, "O", 300.0, 3.0, 70.0),
+    ("GUAJIRA", "MANAURE", "CAMPO C", 2023, 5, "G", 200.0, None, 4.0),
+    ("Bolivar", "CARTAGENA", "CAMPO D", 2023, 5, "O", 50.0, 1.0, 90.0),
+]
+
+DEMAND = [
+    # sector, region, anio, mes, escenario, demanda
+    ("Agregado", "Nacional", 2023, 1, "Medio", 900.0),
+    ("Agregado", "Nacional", 2024, 1, "Alto", 1000.0),
+    ("Agregado", "Nacional", 2025, 1, "Alto", 1100.0),
+    ("Agregado", "Nacional", 2025, 1, "Bajo", 800.0),
+    ("Industrial", "Centro", 2023, 2, "Medio", 300.0),
+    ("Residencial", "Costa Atlántica", 2024, 2, "Medio", 120.0),
+    ("Residencial", "CQR", 2025, 2, "Medio", 60.0),
+]
+
+def build_session(tmp):
+    engine = create_engine(f"sqlite:///{os.path.join(tmp, 'data.db')}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all(models.Production(campo=c, operadora=o, departamento=d, anio=a, mes=m, produccion_mensual=p)
+               for c, o, d, a, m, p in PRODUCTION)
+    db.add_all(models.Royalty(departamento=d, municipio=mu, campo=c, anio=a, mes=m, tipo_hidrocarburo=t,
+                              valor_liquidado=v, volumen_regalia=vo, precio_usd=pr)
+               for d, mu, c, a, m, t, v, vo, pr in ROYALTIES)
+    db.add_all(models.Demand(sector=s, region=r, anio=a, mes=m, escenario=e, demanda=d)
+               for s, r, a, m, e, d in DEMAND)
+    db.commit()
+    return engine, db
+
+def by_name(rows, key):
+    return sorted(rows, key=lambda row: str(row[key]))
+
+def check_production(db, **filters):
+    dashboard = dashboards.production_dashboard(db, ranking_limit=3, **filters)
+    assert dashboard["kpis"] == api.get_production_kpis(db=db, **filters)
+    assert dashboard["trend"] == api.get_production_trend(db=db, **filters)
+    assert dashboard["ranking"]["operadora"] == api.get_production_ranking("operadora", 3, db=db, **filters)
+    assert dashboard["ranking"]["campo"] == api.get_production_ranking("campo", 3, db=db, **filters)
+    assert by_name(dashboard["map"], "department") == by_name(api.get_production_map(db=db, **filters), "department")
+
+def check_royalties(db, **filters):
+    dashboard = dashboards.royalties_dashboard(db, ranking_limit=3, **filters)
+    assert dashboard["kpis"] == api.get_royalties_kpis(db=db, **filters)
+    assert dashboard["trend"] == api.get_royalties_trend(db=db, **filters)
+    assert dashboard["ranking"] == api.get_royalties_ranking(3, db=db, **filters)
+    assert by_name(dashboard["map"], "department") == by_name(api.get_royalties_map(db=db, **filters), "department")
+    assert by_name(dashboard["distribution"], "name") == by_name(api.get_royalties_distribution(db=db, **filters), "name")
+
+def check_demand(db):
+    dashboard = dashboards.demand_dashboard(db)
+    assert dashboard["kpis"] == api.get_demand_kpis(db=db)
+    assert dashboard["trend"] == api.get_demand_trend(db=db)
+    assert by_name(dashboard["sector"], "name") == by_name(api.get_demand_by_sector(db=db), "name")
+    assert by_name(dashboard["region"], "name") == by_name(api.get_demand_by_region(db=db), "name")
+    assert dashboard["scenarios"] == api.get_demand_scenarios(db=db)
+    assert dashboard["sectors"] == api.get_demand_sectors_trend(db=db)
+    assert by_name(dashboard["map"], "name") == by_name(api.get_demand_map(db=db), "name")
+    assert dashboard["balance"] == api.demand_balance(db)
+
+def test_dashboards_match_widget_endpoints():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, db = build_session(tmp)
+        try:
+            # Raw tables first, then the same answers from the cubes
+            answers = []
+            for _ in ("raw", "cubes"):
+                # The NULL production row must not drag the average down on the cube
+                answers.append((api.get_production_kpis(db=db), api.get_royalties_kpis(db=db)))
+                check_production(db)
+                check_production(db, operadora="OP 2", anio_min=2022, anio_max=2023)
+                check_royalties(db)
+                check_royalties(db, tipo_hidrocarburo="O", anio_min=2022)
+                check_demand(db)
+                refresh_aggregates(db)
+            assert answers[0] == answers[1]
+            # Municipalities come from the raw table even when the cube answers
+            assert dashboards.royalties_dashboard(db)["kpis"]["municipalities"] == 5
+        finally:
+            db.close()
+            engine.dispose()
+
+def test_report_data_year_from_data():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, db = build_session(tmp)
+        try:
+            for _ in ("raw", "cubes"):
+                report = dashboards.report_data(db)
+                # 2024 has production but no royalties yet: the report describes 2023
+                kpis = report["kpis"]
+                assert kpis["year"] == 2023
+                assert kpis["production_avg_gbtud"] == 75 / 365
+                assert kpis["royalties_annual_cop"] == 250 and kpis["royalties_total_historical_cop"] == 2050
+                assert kpis["demand_avg_gbtud"] == 900
+                assert kpis["coverage_ratio"] == (75 / 365) / 900 * 100
+                assert [row["year"] for row in report["production_vs_royalties"]] == [2022, 2023]
+                assert [row["department"] for row in report["regional_balance"]] == ["Meta"]
+                assert [op["name"] for op in report["top_operators"]] == ["OP 1", "OP 2", "OP 3"]
+                assert report["top_operators"][0]["value"] == 250 / 374 * 100
+                refresh_aggregates(db)
+        finally:
+            db.close()
+            engine.dispose()
+
+def test_cube_schema_change_recreates_cubes():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, db = build_session(tmp)
+        try:
+            refresh_aggregates(db)
+            db.execute(text("ALTER TABLE demand_monthly DROP COLUMN demanda_n"))
+            db.commit()
+            db.close()
+            assert dashboards.aggregates.ensure_cube_schema(engine) == ["demand_monthly"]
+            assert dashboards.aggregates.ensure_cube_schema(engine) == []
+            # Recreated empty: the raw table answers until the next refresh
+            assert db.query(models.DemandMonthly.id).count() == 0
+            assert db.query(models.ProductionMonthly.id).count() > 0
+            check_demand(db)
+        finally:
+            db.close()
+            engine.dispose()
+
+def test_failed_refresh_keeps_previous_cubes():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, db = build_session(tmp)
+        try:
+            refresh_aggregates(db)
+            before = dashboards.production_dashboard(db)
+            db.execute(text("DROP TABLE demand"))
+            db.commit()
+            try:
+                refresh_aggregates(db)
+                assert False, "refresh_aggregates debía propagar el error"
+            except Exception:
+                pass
+            assert db.query(models.ProductionMonthly.id).count() > 0
+            assert dashboards.production_dashboard(db) == before
+        finally:
+            db.close()
+            engine.dispose()
+
+if __name__ == "__main__":
+    test_dashboards_match_widget_endpoints()
+    test_report_data_year_from_data()
+    test_cube_schema_change_recreates_cubes()
+    test_failed_refresh_keeps_previous_cubes()
+    print("✅ Dashboards OK")
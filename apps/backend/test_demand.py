@@ -0,0 +1,142 @@
+"""
+Pruebas de etl/demand con un libro de prueba que imita las tres hojas de
+UPME (escenarios, regional y sectorial), suelto y dentro del ZIP publicado.
+"""
+import datetime
+import os
+import re
+import tempfile
+import threading
+import zipfile
+from functools import partial
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+
+import pandas as pd
+
+import etl.demand as demand
+from etl.demand import process_sheet
+
+MONTHS = [datetime.datetime(2024, m, 1) for m in (1, 2, 3)]
+
+def write_fixture_workbook(path):
+    """Escenarios con encabezado en la fila 1; regional y sectorial en la fila 3."""
+    scenarios = [
+        ["Proyección de demanda de gas natural", None, None, None, None],
+        ["Fecha", "Histórico", "Esc. Bajo", "Esc. Medio", "Esc. Alto"],
+        [MONTHS[0], 900.0, None, None, None],
+        [MONTHS[1], None, 950.0, 1000.0, 1050.0],
+        [MONTHS[2], None, 960.0, "n.d.", 1060.0],
+        ["Fuente: UPME", None, None, None, None],
+    ]
+    regional = [
+        ["Escenario medio regional", None, None, None],
+        [None, None, None, None],
+        [None, None, None, None],
+        ["Mes", "Costa", "Centro", "Nacional"],
+        *[[m, 100.0 + i, 200.0 + i, 300.0 + i] for i, m in enumerate(MONTHS)],
+    ]
+    sectorial = [
+        ["Escenario medio sectorial", None, None, None],
+        [None, None, None, None],
+        [None, None, None, None],
+        ["Fecha", "Residencial", "Industrial", None],
+        *[[m, 10.0 + i, 20.0 + i, None] for i, m in enumerate(MONTHS)],
+    ]
+    with pd.ExcelWriter(path) as writer:
+        for name, rows in (("Esc Alto, Medio y Bajo", scenarios),
+                           ("Esc Med Regional", regional),
+                           ("Esc Med Sectorial", sectorial)):
+            pd.DataFrame(rows).to_excel(writer, sheet_name=name, header=False, index=False)
+
+def records(df):
+    return sorted(
+        (int(r.anio), int(r.mes), r.sector, r.region, r.escenario, float(r.demanda))
+        for r in df.itertuples()
+    )
+
+def test_process_sheet_layouts():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "demanda.xlsx")
+        write_fixture_workbook(path)
+
+        scenarios = process_sheet(pd.read_excel(path, sheet_name="Esc Alto, Medio y Bajo", header=1), 'SCENARIOS')
+        assert records(scenarios) == [
+            (2024, 1, 'Agregado', 'Nacional', 'Histórico', 900.0),
+            (2024, 2, 'Agregado', 'Nacional', 'Alto', 1050.0),
+            (2024, 2, 'Agregado', 'Nacional', 'Bajo', 950.0),
+            (2024, 2, 'Agregado', 'Nacional', 'Medio', 1000.0),
+            (2024, 3, 'Agregado', 'Nacional', 'Alto', 1060.0),
+            (2024, 3, 'Agregado', 'Nacional', 'Bajo', 960.0),
+        ]
+
+        regional = process_sheet(pd.read_excel(path, sheet_name="Esc Med Regional", header=3), 'REGIONAL')
+        assert set(regional['region']) == {'Costa', 'Centro'}  # 'Nacional' ya viene de escenarios
+        assert set(regional['escenario']) == {'Medio'} and set(regional['sector']) == {'Agregado'}
+        assert len(regional) == 6
+
+        sectorial = process_sheet(pd.read_excel(path, sheet_name="Esc Med Sectorial", header=3), 'SECTORIAL')
+        assert records(sectorial)[:2] == [
+            (2024, 1, 'Industrial', 'Nacional', 'Medio', 20.0),
+            (2024, 1, 'Residencial', 'Nacional', 'Medio', 10.0),
+        ]
+        assert list(sectorial.columns) == ['anio', 'mes', 'sector', 'region', 'escenario', 'demanda']
+        assert str(sectorial['demanda'].dtype) == 'float64'
+
+def with_dimension(src, dst, ref):
+    """Copia del libro `src` con la dimensión de cada hoja reescrita a `ref`."""
+    with zipfile.ZipFile(src) as zin, zipfile.ZipFile(dst, "w", zipfile.ZIP_DEFLATED) as zout:
+        for item in zin.infolist():
+            data = zin.read(item.filename)
+            if item.filename.startswith("xl/worksheets/"):
+                data = re.sub(rb'<dimension ref="[^"]*"', f'<dimension ref="{ref}"'.encode(), data)
+            zout.writestr(item, data)
+
+def test_wrong_stored_dimension_reads_every_row():
+    with tempfile.TemporaryDirectory() as tmp:
+        book = os.path.join(tmp, "demanda.xlsx")
+        write_fixture_workbook(book)
+        truncated = os.path.join(tmp, "truncada.xlsx")
+        with_dimension(book, truncated, "A1:B2")
+
+        expected = pd.concat(demand.read_demand_workbook(book), ignore_index=True)
+        frames = demand.read_demand_workbook(truncated)
+        assert records(pd.concat(frames, ignore_index=True)) == records(expected)
+        assert len(expected) == 6 + 6 + 6
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+def test_extract_demand_from_zip():
+    with tempfile.TemporaryDirectory() as tmp:
+        book = os.path.join(tmp, "Demanda_Agregada.xlsx")
+        write_fixture_workbook(book)
+        with zipfile.ZipFile(os.path.join(tmp, "anexo.zip"), "w", zipfile.ZIP_DEFLATED) as z:
+            z.write(book, "Anexo/Proyeccion_Demanda_Agregada.xlsx")
+            z.writestr("Anexo/LEAME.txt", "notas")
+
+        server = HTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=tmp))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        original = demand.get_demand_file_url
+        demand.get_demand_file_url = lambda: f"http://127.0.0.1:{server.server_port}/anexo.zip"
+        try:
+            extracted = demand.extract_demand(cache_dir=os.path.join(tmp, "cache"))
+        finally:
+            demand.get_demand_file_url = original
+            server.shutdown()
+
+        # Misma salida que leyendo cada hoja por separado con pandas
+        expected = pd.concat([
+            process_sheet(pd.read_excel(book, sheet_name=sheet, header=header), sheet_type)
+            for sheet_type, sheet, header in (('SCENARIOS', "Esc Alto, Medio y Bajo", 1),
+                                              ('REGIONAL', "Esc Med Regional", 3),
+                                              ('SECTORIAL', "Esc Med Sectorial", 3))
+        ], ignore_index=True)
+        assert records(extracted) == records(expected)
+        assert len(extracted) == 6 + 6 + 6
+
+if __name__ == "__main__":
+    test_process_sheet_layouts()
+    test_wrong_stored_dimension_reads_every_row()
+    test_extract_demand_from_zip()
+    print("✅ Hojas de demanda OK")
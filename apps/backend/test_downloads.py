@@ -0,0 +1,180 @@
+"""
+Pruebas offline de la etapa de descarga (etl/downloads.py) contra un
+servidor HTTP local que sirve libros Excel de prueba.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+from functools import partial
+
+import pandas as pd
+
+from etl.downloads import fetch_all, build_session, digest_of, ParsedCache, DownloadCache, INDEX_FILE
+import etl.production as production
+from etl.production import parse_production_file
+
+def write_fixture_workbook(path, campo="1-APIAY"):
+    """Libro con el formato pivoteado de MinEnergía: fila de años, fila de meses y datos."""
+    rows = [
+        ["", "", "", "", ""],
+        ["", "", "", "Año 2023", ""],
+        ["", "", "", "ene", "feb"],
+        ["", "", "ECOPETROL", 100.0, 120.0],
+    ]
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame(rows).to_excel(writer, sheet_name=campo, header=False, index=False)
+
+class FlakyHandler(SimpleHTTPRequestHandler):
+    """Sirve archivos del directorio; la primera petición de cada ruta responde 503."""
+    hits = {}
+
+    def do_GET(self):
+        FlakyHandler.hits[self.path] = FlakyHandler.hits.get(self.path, 0) + 1
+        if FlakyHandler.hits[self.path] == 1:
+            self.send_error(503)
+            return
+        super().do_GET()
+
+    def log_message(self, *args):
+        pass
+
+def serve(directory):
+    server = HTTPServer(("127.0.0.1", 0), partial(FlakyHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def test_parallel_download_retries_and_resumes():
+    with tempfile.TemporaryDirectory() as site, tempfile.TemporaryDirectory() as cache_dir:
+        names = [f"declaracion_{i}.xlsx" for i in range(5)]
+        for i, name in enumerate(names):
+            write_fixture_workbook(os.path.join(site, name), campo=f"{i}-CAMPO {i}")
+        FlakyHandler.hits = {}
+        server = serve(site)
+        try:
+            base = f"http://127.0.0.1:{server.server_port}/"
+            urls = [base + name for name in names] + [base + "no_existe.xlsx"]
+            session = build_session(workers=3, backoff=0)
+
+            paths = fetch_all(urls, workers=3, cache_dir=cache_dir, session=session)
+
+            # Los 503 iniciales se reintentan; el 404 queda como fallo
+            assert all(paths[base + name] for name in names)
+            assert paths[base + "no_existe.xlsx"] is None
+            assert all(FlakyHandler.hits[f"/{name}"] == 2 for name in names)
+
+            # Contenido direccionado por hash y parseable desde la caché
+            df = parse_production_file(paths[base + names[0]])
+            assert len(df) == 2 and set(df['mes']) == {1, 2}
+
+            # Una segunda ejecución reanuda desde la caché sin tocar la red
+            before = dict(FlakyHandler.hits)
+            again = fetch_all(urls[:-1], workers=3, cache_dir=cache_dir, session=session)
+            assert again == {url: paths[url] for url in urls[:-1]}
+            assert FlakyHandler.hits == before
+        finally:
+            server.shutdown()
+
+def test_conditional_revalidation_and_parsed_cache():
+    with tempfile.TemporaryDirectory() as site, tempfile.TemporaryDirectory() as cache_dir:
+        path = os.path.join(site, "declaracion.xlsx")
+        write_fixture_workbook(path)
+        FlakyHandler.hits = {"/declaracion.xlsx": 1}  # sin 503 inicial
+        server = serve(site)
+        try:
+            url = f"http://127.0.0.1:{server.server_port}/declaracion.xlsx"
+            session = build_session(workers=1, backoff=0)
+            first = fetch_all([url], cache_dir=cache_dir, session=session)[url]
+
+            # Vencida la verificación, se revalida con If-Modified-Since: 304, mismo archivo
+            again = fetch_all([url], cache_dir=cache_dir, session=session, revalidate_after=0)[url]
+            assert again == first and FlakyHandler.hits["/declaracion.xlsx"] == 3
+
+            # El resultado parseado queda asociado al hash del contenido
+            parsed = ParsedCache("production", 1, cache_dir)
+            assert parsed.get(digest_of(first)) is None
+            parsed.put(digest_of(first), parse_production_file(first))
+            assert len(parsed.get(digest_of(first))) == 2
+            assert ParsedCache("production", 2, cache_dir).get(digest_of(first)) is None
+
+            # Si el archivo cambia en el servidor, la revalidación trae el nuevo contenido
+            write_fixture_workbook(path, campo="2-CUSIANA")
+            os.utime(path, (os.path.getmtime(path) + 10,) * 2)
+            changed = fetch_all([url], cache_dir=cache_dir, session=session, revalidate_after=0)[url]
+            assert changed != first and parsed.get(digest_of(changed)) is None
+        finally:
+            server.shutdown()
+
+def test_concurrent_extracts_share_the_cache():
+    with tempfile.TemporaryDirectory() as site, tempfile.TemporaryDirectory() as cache_dir:
+        names = [f"fuente_{i}.xlsx" for i in range(4)]
+        for i, name in enumerate(names):
+            write_fixture_workbook(os.path.join(site, name), campo=f"{i}-CAMPO {i}")
+        FlakyHandler.hits = {f"/{name}": 1 for name in names}  # sin 503 inicial
+        server = serve(site)
+
+        # Un resto viejo de una ejecución interrumpida y una descarga en curso de esta
+        stale = os.path.join(cache_dir, "viejo.part")
+        in_progress = os.path.join(cache_dir, "en_curso.part")
+        for path in (stale, in_progress):
+            open(path, "wb").close()
+        os.utime(stale, (time.time() - 3600,) * 2)
+        try:
+            base = f"http://127.0.0.1:{server.server_port}/"
+            # Dos extracciones a la vez (como producción y demanda en el DAG)
+            results = {}
+            threads = [
+                threading.Thread(target=lambda part=part: results.update(
+                    fetch_all([base + name for name in part], workers=2, cache_dir=cache_dir,
+                              session=build_session(workers=2, backoff=0))))
+                for part in (names[:2], names[2:])
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            assert all(results[base + name] for name in names)
+            assert not os.path.exists(stale) and os.path.exists(in_progress)
+            with open(os.path.join(cache_dir, INDEX_FILE), encoding="utf-8") as f:
+                assert set(json.load(f)) == {base + name for name in names}
+
+            # Otra instancia (otro proceso) que escribe después no pisa las entradas ajenas
+            other = DownloadCache(cache_dir)
+            other.index = {}
+            other._save_entry("http://otro/archivo.xlsx", {"sha256": "x", "size": 0, "checked_at": 0})
+            with open(os.path.join(cache_dir, INDEX_FILE), encoding="utf-8") as f:
+                assert len(json.load(f)) == len(names) + 1
+        finally:
+            server.shutdown()
+
+def test_failed_parse_is_not_cached_nor_fingerprinted():
+    with tempfile.TemporaryDirectory() as site, tempfile.TemporaryDirectory() as cache_dir:
+        write_fixture_workbook(os.path.join(site, "buena.xlsx"))
+        with open(os.path.join(site, "rota.xlsx"), "wb") as f:
+            f.write(b"esto no es un libro de Excel")
+        FlakyHandler.hits = {"/buena.xlsx": 1, "/rota.xlsx": 1}
+        server = serve(site)
+        base = f"http://127.0.0.1:{server.server_port}/"
+        files = [{"url": base + name, "period": name, "text": name} for name in ("buena.xlsx", "rota.xlsx")]
+        original = production.extract_all_production_urls
+        production.extract_all_production_urls = lambda: files
+        try:
+            df = production.extract_production(limit_files=0, cache_dir=cache_dir)
+            assert len(df) == 2 and "fingerprint" not in df.attrs
+
+            parsed = ParsedCache("production", production.PARSER_VERSION, cache_dir)
+            good, broken = (digest_of(fetch_all([f["url"]], cache_dir=cache_dir)[f["url"]]) for f in files)
+            assert parsed.get(good) is not None and parsed.get(broken) is None
+        finally:
+            production.extract_all_production_urls = original
+            server.shutdown()
+
+if __name__ == "__main__":
+    test_parallel_download_retries_and_resumes()
+    test_conditional_revalidation_and_parsed_cache()
+    test_concurrent_extracts_share_the_cache()
+    test_failed_parse_is_not_cached_nor_fingerprinted()
+    print("✅ Descargas OK")
@@ -0,0 +1,114 @@
+"""
+Tests for keyset pagination of the raw data endpoints (/production and
+/royalties): walking every page with next_cursor, cursor and field errors,
+and the `fields=` projection.
+"""
+import base64
+import os
+import tempfile
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+from database import Base, get_read_db
+from routers import api
+
+def build_client(tmp, production=23, royalties=7):
+    engine = create_engine(f"sqlite:///{os.path.join(tmp, 'data.db')}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.add_all(models.Production(campo=f"CAMPO {i % 4}", operadora="OP 1", departamento="Meta",
+                                     anio=2020 + i % 3, mes=i % 12 + 1, produccion_mensual=float(i))
+                   for i in range(production))
+        db.add_all(models.Royalty(departamento="META", campo=f"CAMPO {i % 2}", anio=2022, mes=i + 1,
+                                  tipo_hidrocarburo="O", valor_liquidado=float(i))
+                   for i in range(royalties))
+        db.commit()
+
+    def read_db():
+        with Session() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(api.router, prefix="/api")
+    app.dependency_overrides[get_read_db] = read_db
+    return TestClient(app), engine
+
+def walk(client, path, **params):
+    """Every page of `path`; returns (ids in order, pages)."""
+    ids, pages, cursor = [], 0, None
+    while True:
+        response = client.get(path, params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        page = response.json()
+        ids += [item["id"] for item in page["items"]]
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids, pages
+
+def test_cursor_walk_has_no_gaps_or_duplicates():
+    with tempfile.TemporaryDirectory() as tmp:
+        client, engine = build_client(tmp)
+        try:
+            ids, pages = walk(client, "/api/production", limit=5)
+            assert ids == list(range(1, 24)) and pages == 5
+
+            # An exact multiple of the page size ends without an empty trailing page
+            ids, pages = walk(client, "/api/royalties", limit=7)
+            assert ids == list(range(1, 8)) and pages == 1
+
+            # Filters apply on every page
+            ids, _pages = walk(client, "/api/production", limit=2, campo="CAMPO 1")
+            assert ids == [i + 1 for i in range(23) if i % 4 == 1]
+
+            # Clients must revalidate: a reload changes the generation-keyed ETag
+            assert client.get("/api/production").headers["cache-control"] == "no-cache"
+            assert client.get("/api/royalties").headers["cache-control"] == "no-cache"
+
+            # The page size is capped at MAX_PAGE_SIZE and at least 1
+            assert len(client.get("/api/production", params={"limit": 0}).json()["items"]) == 1
+        finally:
+            engine.dispose()
+
+def test_invalid_cursor_and_unknown_fields_are_rejected():
+    with tempfile.TemporaryDirectory() as tmp:
+        client, engine = build_client(tmp)
+        try:
+            not_json = base64.urlsafe_b64encode(b"12").decode()
+            for cursor in ("%%%", "bm90IGpzb24", not_json):
+                response = client.get("/api/production", params={"cursor": cursor})
+                assert response.status_code == 400 and response.json()["detail"] == "Invalid cursor"
+
+            response = client.get("/api/royalties", params={"fields": "campo,nope,anio"})
+            assert response.status_code == 400 and response.json()["detail"] == "Unknown fields: nope"
+        finally:
+            engine.dispose()
+
+def test_fields_projection_limits_columns():
+    with tempfile.TemporaryDirectory() as tmp:
+        client, engine = build_client(tmp)
+        try:
+            items = client.get("/api/production", params={"fields": "campo, anio", "limit": 3}).json()["items"]
+            # id is always returned: it is what the cursor wraps
+            assert [sorted(item) for item in items] == [["anio", "campo", "id"]] * 3
+            assert items[0] == {"id": 1, "campo": "CAMPO 0", "anio": 2020}
+
+            full = client.get("/api/production", params={"limit": 1}).json()["items"][0]
+            assert set(full) == {c.name for c in models.Production.__table__.columns}
+
+            # The cursor still works on a projected page
+            ids, _pages = walk(client, "/api/royalties", limit=3, fields="valor_liquidado")
+            assert ids == list(range(1, 8))
+        finally:
+            engine.dispose()
+
+if __name__ == "__main__":
+    test_cursor_walk_has_no_gaps_or_duplicates()
+    test_invalid_cursor_and_unknown_fields_are_rejected()
+    test_fields_projection_limits_columns()
+    print("✅ Paginación OK")
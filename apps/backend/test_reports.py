@@ -0,0 +1,55 @@
+"""
+Tests for the pre-rendered executive reports (report_store.py): content
+addressed storage, pruning, rendering per year and the background queue.
+"""
+import os
+import tempfile
+
+from sqlalchemy.orm import sessionmaker
+
+from report_store import RenderQueue, ReportStore, render, render_all
+from test_dashboards import build_session
+
+def test_store_lookup_and_prune():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ReportStore(tmp)
+        assert store.lookup(1, 2023) is None
+        path, digest = store.put(1, 2023, b"%PDF-a")
+        assert store.lookup(1, 2023) == (path, digest) and os.path.basename(path) == f"{digest}.pdf"
+        # Same content for another key is stored once
+        assert store.put(1, 2022, b"%PDF-a") == (path, digest)
+        store.put(2, 2023, b"%PDF-b")
+
+        store.prune(keep=(2,))
+        assert store.lookup(1, 2023) is None and not os.path.exists(path)
+        assert store.lookup(2, 2023) is not None
+
+def test_render_every_year_and_queue():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, db = build_session(tmp)
+        try:
+            store = ReportStore(os.path.join(tmp, "reports"))
+            rendered = render_all(db, 7, store)
+            # One report per production year, the default (2023) first
+            assert len(rendered) == 3 and store.lookup(7, 2023) == rendered[0]
+            with open(rendered[0][0], "rb") as f:
+                assert f.read(5) == b"%PDF-"
+
+            # The queue renders what is missing for the current generation only
+            queue = RenderQueue(sessionmaker(bind=engine), store, current_generation=lambda: "8")
+            queue.schedule(8, [2022, 2024])
+            queue.schedule(7, [2099])
+            queue.jobs.join()
+            assert store.lookup(8, 2022) and store.lookup(8, 2024)
+            assert store.lookup(8, 2023) is None and store.lookup(7, 2099) is None
+
+            # render() without a year stores under the year it resolved to
+            assert render(db, 9, store=store) == store.lookup(9, 2023)
+        finally:
+            db.close()
+            engine.dispose()
+
+if __name__ == "__main__":
+    test_store_lookup_and_prune()
+    test_render_every_year_and_queue()
+    print("✅ Reports OK")
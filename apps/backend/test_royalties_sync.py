@@ -0,0 +1,165 @@
+"""
+Pruebas offline de la extracción de regalías contra un servidor Socrata
+falso (count(*), filtro por :updated_at, paginación con $limit/$offset,
+latencia artificial y pico de peticiones en vuelo). La comparación de
+tiempos está en bench_royalties_extract.py.
+"""
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from sqlalchemy import create_engine, func, select
+
+from database import Base
+from models import Royalty, RoyaltyMonthly
+import etl.royalties as royalties
+from etl.state import GENERATION_KEY, get_state
+
+def socrata_row(i, updated_at, valor=1000):
+    return {
+        ":id": f"row-{i:04d}", ":updated_at": updated_at,
+        "departamento": "META", "municipio": "ACACIAS", "campo": f"CAMPO {i % 7}",
+        "contrato": f"CTO-{i // 7}", "a_o": "2023", "mes": str(i % 12 + 1),
+        "tipohidrocarburo": "O", "regaliascop": f"{valor},5", "volumenregaliablskpc": "10",
+        "trmpromedio": "4000", "prodgravableblskpc": "100", "preciohidrocarburousd": "80",
+        "porcregalia": "8",
+    }
+
+class FakeSocrata(BaseHTTPRequestHandler):
+    rows = []
+    requests = []
+    latency = 0.0
+    in_flight = 0
+    peak = 0
+    lock = threading.Lock()
+
+    @classmethod
+    def reset(cls):
+        cls.requests = []
+        cls.in_flight = cls.peak = 0
+
+    def do_GET(self):
+        params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        with FakeSocrata.lock:
+            FakeSocrata.requests.append(params)
+            FakeSocrata.in_flight += 1
+            FakeSocrata.peak = max(FakeSocrata.peak, FakeSocrata.in_flight)
+        try:
+            time.sleep(FakeSocrata.latency)
+            self.respond(params)
+        finally:
+            with FakeSocrata.lock:
+                FakeSocrata.in_flight -= 1
+
+    def respond(self, params):
+        rows = sorted(FakeSocrata.rows, key=lambda r: (r[":updated_at"], r[":id"]))
+        match = re.fullmatch(r":updated_at >= '(.+)'", params.get("$where", ""))
+        if match:
+            rows = [r for r in rows if r[":updated_at"].rstrip("Z") >= match.group(1)]
+        if params.get("$select", "").startswith("count(*)"):
+            body = json.dumps([{"n": str(len(rows))}]).encode()
+        else:
+            offset, limit = int(params.get("$offset", 0)), int(params.get("$limit", 1000))
+            body = json.dumps(rows[offset:offset + limit]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class FakeServer(ThreadingHTTPServer):
+    # Cola de conexiones amplia: con la de 5 por defecto, las conexiones
+    # simultáneas del cliente concurrente esperan el reintento de SYN (1 s)
+    request_queue_size = 64
+
+def serve():
+    server = FakeServer(("127.0.0.1", 0), FakeSocrata)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/resource/j7js-yk74.json"
+
+def test_incremental_sync_upserts_only_changed_rows():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'sync.db')}")
+        Base.metadata.create_all(bind=engine)
+        FakeSocrata.rows = [socrata_row(i, f"2024-01-{i % 28 + 1:02d}T10:00:00.000Z") for i in range(120)]
+        FakeSocrata.reset()
+        FakeSocrata.latency = 0.0
+        server, url = serve()
+        count = lambda: engine.connect().execute(select(func.count()).select_from(Royalty)).scalar()
+        old_page = royalties.PAGE_SIZE
+        royalties.PAGE_SIZE = 50
+        try:
+            # Primera ejecución: sin marca, recarga completa (conteo + 3 páginas)
+            royalties.run_royalties_etl(incremental=True, url=url, bind=engine)
+            assert count() == 120
+            assert get_state(royalties.STATE_KEY, bind=engine) == "2024-01-28T10:00:00.000"
+            assert len(FakeSocrata.requests) == 4
+            # Fuera del pipeline también se reconstruyen los cubos y se publica una generación
+            assert get_state(GENERATION_KEY, bind=engine) == "1"
+            with engine.connect() as conn:
+                assert conn.execute(select(func.sum(RoyaltyMonthly.registros))).scalar() == 120
+
+            # Cambia una fila y llega una nueva
+            FakeSocrata.rows[5] = socrata_row(5, "2024-02-01T08:00:00.000Z", valor=999999)
+            FakeSocrata.rows.append(socrata_row(120, "2024-02-02T08:00:00.000Z"))
+            FakeSocrata.requests = []
+            # Vuelven las filas de la marca (>=), pero solo se escriben las 2 que cambiaron
+            assert royalties.run_royalties_etl(incremental=True, url=url, bind=engine) == 2
+
+            assert len(FakeSocrata.requests) == 2
+            assert all(r["$where"] == ":updated_at >= '2024-01-28T10:00:00.000'"
+                       for r in FakeSocrata.requests)
+            assert count() == 121
+            with engine.connect() as conn:
+                valor = conn.execute(select(Royalty.valor_liquidado).where(
+                    Royalty.campo == "CAMPO 5", Royalty.contrato == "CTO-0")).scalars().all()
+            assert valor == [999999.5]
+            assert get_state(royalties.STATE_KEY, bind=engine) == "2024-02-02T08:00:00.000"
+
+            # Sin cambios en el origen: la fila de la marca vuelve y no se escribe nada
+            assert royalties.run_royalties_etl(incremental=True, url=url, bind=engine) == 0
+            assert count() == 121
+            assert get_state(GENERATION_KEY, bind=engine) == "2"
+        finally:
+            royalties.PAGE_SIZE = old_page
+            server.shutdown()
+            engine.dispose()
+
+def test_concurrent_extraction_matches_sequential_and_overlaps():
+    concurrency = 4
+    FakeSocrata.rows = [socrata_row(i, f"2024-01-01T00:00:{i % 60:02d}.000Z") for i in range(2000)]
+    FakeSocrata.rows[3].pop("trmpromedio")  # columnas ausentes en algunas filas
+    FakeSocrata.latency = 0.02
+    server, url = serve()
+    old_page = royalties.PAGE_SIZE
+    royalties.PAGE_SIZE = 100
+    try:
+        FakeSocrata.reset()
+        sequential = royalties.extract_royalties(url)
+        assert FakeSocrata.peak == 1
+        FakeSocrata.reset()
+        concurrent = royalties.extract_royalties_concurrent(url, concurrency=concurrency)
+        # Las páginas se piden solapadas, sin pasar del límite de conexiones
+        assert 1 < FakeSocrata.peak <= concurrency
+    finally:
+        royalties.PAGE_SIZE = old_page
+        FakeSocrata.latency = 0.0
+        server.shutdown()
+
+    assert list(concurrent[":id"]) == list(sequential[":id"])
+    a = royalties.transform_royalties(sequential)
+    b = royalties.transform_royalties(concurrent)
+    assert a.equals(b)
+
+if __name__ == "__main__":
+    test_incremental_sync_upserts_only_changed_rows()
+    test_concurrent_extraction_matches_sequential_and_overlaps()
+    print("✅ Extracción de regalías OK")
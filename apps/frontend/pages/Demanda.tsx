@@ -2,7 +2,7 @@ import React, { useMemo, useEffect, useState, useCallback } from 'react';
 import { 
     BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer, LineChart, Line, Legend, AreaChart, Area, ComposedChart, Cell, ReferenceLine 
 } from 'recharts';
-import { fetchDemandScenarios, fetchDemandSectors, fetchDemandMap, fetchDemandBalance } from '../services/api';
+import { fetchDemandDashboard } from '../services/api';
 import { Users, Zap, BarChart3, AlertCircle, TrendingUp, AlertTriangle, Map as MapIcon } from 'lucide-react';
 import MetricCard from '../components/MetricCard';
 import FilterBar from '../components/FilterBar';
@@ -24,12 +24,8 @@ const Demanda: React.FC = () => {
         const loadData = async () => {
             try {
                 setLoading(true);
-                const [scenarios, sectors, map, balance] = await Promise.all([
-                    fetchDemandScenarios(),
-                    fetchDemandSectors(),
-                    fetchDemandMap(),
-                    fetchDemandBalance()
-                ]);
+                // Every widget in one request
+                const { scenarios, sectors, map, balance } = await fetchDemandDashboard();
                 
                 setScenariosData(scenarios);
                 setSectorsData(sectors);
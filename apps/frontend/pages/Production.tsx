@@ -2,7 +2,7 @@ import React, { useMemo, useEffect, useState } from 'react';
 import { 
     BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer, LineChart, Line, Cell, PieChart, Pie, ComposedChart, Area 
 } from 'recharts';
-import { fetchProductionKPIs, fetchProductionTrend, fetchProductionRanking } from '../services/api';
+import { fetchProductionDashboard } from '../services/api';
 import { ProductionFilters } from '../types';
 import { Factory, Flame, TrendingUp, AlertCircle, Building2 } from 'lucide-react';
 import MetricCard from '../components/MetricCard';
@@ -25,18 +25,13 @@ const Production: React.FC = () => {
         const loadData = async () => {
             try {
                 setLoading(true);
-                // Fetch all aggregated data in parallel
-                const [kpiData, trend, topOperators, topFields] = await Promise.all([
-                    fetchProductionKPIs(activeFilters),
-                    fetchProductionTrend(activeFilters),
-                    fetchProductionRanking('operadora', activeFilters),
-                    fetchProductionRanking('campo', activeFilters)
-                ]);
+                // Every widget in one request (one scan of the filtered rows)
+                const dashboard = await fetchProductionDashboard(activeFilters);
                 
-                setKpis(kpiData);
-                setTrendData(trend);
-                setOperatorRanking(topOperators);
-                setFieldRanking(topFields);
+                setKpis(dashboard.kpis);
+                setTrendData(dashboard.trend);
+                setOperatorRanking(dashboard.ranking.operadora);
+                setFieldRanking(dashboard.ranking.campo);
                 
                 console.log('Loaded aggregated data');
             } catch (err) {
@@ -3,7 +3,7 @@ import {
     BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer, Cell, AreaChart, Area,
     PieChart, Pie, Legend, LineChart, Line, ComposedChart
 } from 'recharts';
-import { fetchRoyaltiesKPIs, fetchRoyaltiesTrend, fetchRoyaltiesMap, fetchRoyaltiesDistribution, fetchRoyaltiesRanking } from '../services/api';
+import { fetchRoyaltiesDashboard } from '../services/api';
 import { adaptRoyalty } from '../adapters/adapters';
 import { RoyaltyRecord, MapData, RoyaltiesFilters } from '../types';
 import { Coins, DollarSign, TrendingUp, AlertCircle, Droplets, Flame, Activity } from 'lucide-react';
@@ -35,14 +35,9 @@ const Regalias: React.FC = () => {
         const loadData = async () => {
             try {
                 setLoading(true);
-                // Fetch all aggregated data in parallel
-                const [kpiData, trend, map, dist, ranking] = await Promise.all([
-                    fetchRoyaltiesKPIs(activeFilters),
-                    fetchRoyaltiesTrend(activeFilters),
-                    fetchRoyaltiesMap(activeFilters),
-                    fetchRoyaltiesDistribution(activeFilters),
-                    fetchRoyaltiesRanking(activeFilters)
-                ]);
+                // Every widget in one request (one scan of the filtered rows)
+                const { kpis: kpiData, trend, map, distribution: dist, ranking } =
+                    await fetchRoyaltiesDashboard(activeFilters);
 
                 setKpis(kpiData);
                 setTrendData(trend);
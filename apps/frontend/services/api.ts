@@ -28,8 +28,38 @@ export interface BackendDemand {
     fecha_carga: string;
 }
 
-export const fetchRoyalties = async (filters?: RoyaltiesFilters): Promise<RoyaltyBackend[]> => {
-    const params = new URLSearchParams();  // No limit - get ALL data
+export interface Page<T> {
+    items: T[];
+    next_cursor: string | null;
+}
+
+// Recorre las páginas de un endpoint paginado por cursor (keyset sobre id).
+// Permite consumir los resultados de forma perezosa, página por página.
+async function* iteratePages<T>(path: string, params: URLSearchParams, errorMessage: string): AsyncGenerator<T[]> {
+    let cursor: string | null = null;
+    do {
+        const pageParams = new URLSearchParams(params);
+        if (cursor) pageParams.set('cursor', cursor);
+        const response = await fetch(`${API_URL}${path}?${pageParams}`);
+        if (!response.ok) {
+            throw new Error(errorMessage);
+        }
+        const page: Page<T> = await response.json();
+        yield page.items;
+        cursor = page.next_cursor;
+    } while (cursor);
+}
+
+async function collectPages<T>(pages: AsyncGenerator<T[]>): Promise<T[]> {
+    const all: T[] = [];
+    for await (const items of pages) {
+        all.push(...items);
+    }
+    return all;
+}
+
+const royaltiesParams = (filters?: RoyaltiesFilters): URLSearchParams => {
+    const params = new URLSearchParams();
     
     if (filters) {
         if (filters.departamento) params.append('departamento', filters.departamento);
@@ -38,15 +68,15 @@ export const fetchRoyalties = async (filters?: RoyaltiesFilters): Promise<Royalt
         if (filters.anio_max) params.append('anio_max', filters.anio_max.toString());
         if (filters.tipo_hidrocarburo) params.append('tipo_hidrocarburo', filters.tipo_hidrocarburo);
     }
-    
-    const url = params.toString() ? `${API_URL}/royalties?${params}` : `${API_URL}/royalties`;
-    const response = await fetch(url);
-    if (!response.ok) {
-        throw new Error('Failed to fetch royalties');
-    }
-    return response.json();
+    return params;
 };
 
+export const iterateRoyalties = (filters?: RoyaltiesFilters): AsyncGenerator<RoyaltyBackend[]> =>
+    iteratePages<RoyaltyBackend>('/royalties', royaltiesParams(filters), 'Failed to fetch royalties');
+
+export const fetchRoyalties = async (filters?: RoyaltiesFilters): Promise<RoyaltyBackend[]> =>
+    collectPages(iterateRoyalties(filters));
+
 export const fetchRoyaltiesFilters = async (): Promise<RoyaltiesFilterOptions> => {
     const response = await fetch(`${API_URL}/royalties/filters`);
     if (!response.ok) {
@@ -55,8 +85,8 @@ export const fetchRoyaltiesFilters = async (): Promise<RoyaltiesFilterOptions> =
     return response.json();
 };
 
-export const fetchProduction = async (filters?: ProductionFilters): Promise<BackendProduction[]> => {
-    const params = new URLSearchParams();  // No limit - get ALL data
+const productionParams = (filters?: ProductionFilters): URLSearchParams => {
+    const params = new URLSearchParams();
     
     if (filters) {
         if (filters.departamento) params.append('departamento', filters.departamento);
@@ -65,15 +95,15 @@ export const fetchProduction = async (filters?: ProductionFilters): Promise<Back
         if (filters.anio_min) params.append('anio_min', filters.anio_min.toString());
         if (filters.anio_max) params.append('anio_max', filters.anio_max.toString());
     }
-    
-    const url = params.toString() ? `${API_URL}/production?${params}` : `${API_URL}/production`;
-    const response = await fetch(url);
-    if (!response.ok) {
-        throw new Error('Failed to fetch production');
-    }
-    return response.json();
+    return params;
 };
 
+export const iterateProduction = (filters?: ProductionFilters): AsyncGenerator<BackendProduction[]> =>
+    iteratePages<BackendProduction>('/production', productionParams(filters), 'Failed to fetch production');
+
+export const fetchProduction = async (filters?: ProductionFilters): Promise<BackendProduction[]> =>
+    collectPages(iterateProduction(filters));
+
 // --- Aggregation Services (Low RAM Strategy) ---
 
 export const fetchProductionKPIs = async (filters?: ProductionFilters): Promise<any> => {
@@ -133,6 +163,14 @@ export const fetchProductionMap = async (filters?: ProductionFilters): Promise<a
     return response.json();
 };
 
+export const fetchProductionDashboard = async (filters?: ProductionFilters): Promise<{
+    kpis: any, trend: any[], ranking: { operadora: any[], campo: any[] }, map: any[]
+}> => {
+    const response = await fetch(`${API_URL}/production/dashboard?${productionParams(filters)}`);
+    if (!response.ok) throw new Error('Failed to fetch production dashboard');
+    return response.json();
+};
+
 export const fetchRoyaltiesKPIs = async (filters?: RoyaltiesFilters): Promise<any> => {
     const params = new URLSearchParams();
     if (filters) {
@@ -203,6 +241,14 @@ export const fetchRoyaltiesRanking = async (filters?: RoyaltiesFilters): Promise
     return response.json();
 };
 
+export const fetchRoyaltiesDashboard = async (filters?: RoyaltiesFilters): Promise<{
+    kpis: any, trend: any[], map: any[], distribution: any[], ranking: any[]
+}> => {
+    const response = await fetch(`${API_URL}/royalties/dashboard?${royaltiesParams(filters)}`);
+    if (!response.ok) throw new Error('Failed to fetch royalties dashboard');
+    return response.json();
+};
+
 // --- Demand Aggregation ---
 
 export const fetchDemandKPIs = async (): Promise<{ totalReal: number, totalProjected: number, deviation: number }> => {
@@ -253,6 +299,12 @@ export const fetchDemandBalance = async () => {
     return response.json();
 };
 
+export const fetchDemandDashboard = async () => {
+    const response = await fetch(`${API_URL}/demand/dashboard`);
+    if (!response.ok) throw new Error('Failed to fetch demand dashboard');
+    return response.json();
+};
+
 // --- Statistics / Strategic Dashboard ---
 
 export const fetchStatsKpis = async () => {